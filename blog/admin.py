@@ -6,4 +6,4 @@ class BlogPostAdmin(admin.ModelAdmin):
     list_display = ("title", "created_at", "is_published", "views_count")
     list_filter = ("is_published", "created_at")
     search_fields = ("title", "content")
-    readonly_fields = ("views_count", "created_at")
\ No newline at end of file
+    readonly_fields = ("views_count", "created_at", "word_count", "reading_time")
\ No newline at end of file
@@ -0,0 +1,21 @@
+from django import forms
+from catalog.moderation import contains_banned_word
+from .models import BlogPost
+
+
+class BlogPostForm(forms.ModelForm):
+    class Meta:
+        model = BlogPost
+        fields = ["title", "content", "preview", "is_published"]
+
+    def clean_title(self):
+        title = self.cleaned_data.get("title")
+        if title and contains_banned_word(title):
+            raise forms.ValidationError("Заголовок содержит запрещённые слова.")
+        return title
+
+    def clean_content(self):
+        content = self.cleaned_data.get("content")
+        if content and contains_banned_word(content):
+            raise forms.ValidationError("Текст записи содержит запрещённые слова.")
+        return content
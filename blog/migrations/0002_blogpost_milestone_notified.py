@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="milestone_notified",
+            field=models.BooleanField(
+                default=False, verbose_name="Уведомление о 100 просмотрах отправлено"
+            ),
+        ),
+    ]
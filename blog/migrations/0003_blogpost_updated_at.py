@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0002_blogpost_milestone_notified"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата изменения",
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:52
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+EXCERPT_LENGTH = 100
+WORDS_PER_MINUTE = 200
+
+
+def fill_summaries(apps, schema_editor):
+    BlogPost = apps.get_model("blog", "BlogPost")
+    batch = []
+    for post in BlogPost.objects.only("content").iterator(chunk_size=1000):
+        text = strip_tags(post.content or "")
+        post.excerpt = Truncator(text).chars(EXCERPT_LENGTH)
+        post.word_count = len(text.split())
+        post.reading_time = max(1, round(post.word_count / WORDS_PER_MINUTE))
+        batch.append(post)
+        if len(batch) >= 1000:
+            BlogPost.objects.bulk_update(
+                batch, ["excerpt", "word_count", "reading_time"]
+            )
+            batch = []
+    if batch:
+        BlogPost.objects.bulk_update(batch, ["excerpt", "word_count", "reading_time"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0003_blogpost_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="excerpt",
+            field=models.CharField(
+                blank=True, editable=False, max_length=100, verbose_name="Анонс"
+            ),
+        ),
+        migrations.AddField(
+            model_name="blogpost",
+            name="reading_time",
+            field=models.PositiveSmallIntegerField(
+                default=1, editable=False, verbose_name="Время чтения, мин"
+            ),
+        ),
+        migrations.AddField(
+            model_name="blogpost",
+            name="word_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Слов"
+            ),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="blogpost",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["-created_at", "-id"],
+                name="blogpost_feed_idx",
+            ),
+        ),
+    ]
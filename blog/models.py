@@ -1,17 +1,59 @@
 from django.db import models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# Длина анонса в списке статей (символов, как у прежнего truncatechars:100)
+EXCERPT_LENGTH = 100
+# Скорость чтения для оценки времени, слов в минуту
+WORDS_PER_MINUTE = 200
+
 
 class BlogPost(models.Model):
     title = models.CharField(max_length=200, verbose_name="Заголовок")
     content = models.TextField(verbose_name="Содержимое")
+    # Анонс и данные о чтении считаются при сохранении: список статей не загружает content
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False, verbose_name="Анонс")
+    word_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Слов")
+    reading_time = models.PositiveSmallIntegerField(default=1, editable=False, verbose_name="Время чтения, мин")
     preview = models.ImageField(upload_to="blog/previews/", null=True, blank=True, verbose_name="Превью")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
     is_published = models.BooleanField(default=True, verbose_name="Опубликовано")
     views_count = models.PositiveIntegerField(default=0, verbose_name="Просмотры")
+    milestone_notified = models.BooleanField(default=False, verbose_name="Уведомление о 100 просмотрах отправлено")
+
+    # Поля, которые пересчитываются из content
+    SUMMARY_FIELDS = ("excerpt", "word_count", "reading_time")
 
     class Meta:
         verbose_name = "Блоговая запись"
         verbose_name_plural = "Блоговые записи"
         ordering = ["-created_at"]
+        indexes = [
+            # Лента блога: WHERE is_published ORDER BY created_at DESC, id DESC.
+            # Частичный индекс, как у каталога: на SQLite условие по булеву полю
+            # записывается без «= 1» и не использует ведущую колонку is_published
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(is_published=True),
+                name="blogpost_feed_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+    def refresh_summary(self):
+        """Пересчитывает анонс, число слов и время чтения по ``content``."""
+        text = strip_tags(self.content or "")
+        self.excerpt = Truncator(text).chars(EXCERPT_LENGTH)
+        self.word_count = len(text.split())
+        self.reading_time = max(1, round(self.word_count / WORDS_PER_MINUTE))
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "content" in update_fields:
+            self.refresh_summary()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *self.SUMMARY_FIELDS}
+        super().save(*args, **kwargs)
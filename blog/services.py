@@ -0,0 +1,132 @@
+"""
+Лента блога: постранично по ключу ``(created_at, id)`` от новых к старым.
+
+Страница выбирается без ``content`` (анонс хранится в модели) и кешируется
+в виде кортежей полей ``LIST_FIELDS``, а не экземпляров модели, под
+поколением блога (``config.generations``), которое увеличивается при
+сохранении и удалении статей. Счётчик просмотров меняется через
+``update()`` и поколение не трогает — в ленте он может отставать на
+``BLOG_PAGE_CACHE_TIMEOUT``.
+"""
+import hashlib
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Q
+
+from blog.models import BlogPost
+from catalog.pagination import BACKWARD, FORWARD, KeysetPage
+from config.db_router import use_primary
+from config.generations import get_generation
+
+PAGE_SIZE = getattr(settings, 'BLOG_PAGE_SIZE', 12)
+PAGE_TIMEOUT = getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 5 * 60)
+GENERATION_KEY = 'blog:gen'
+
+# Колонки ленты: всё, что выводит шаблон списка
+LIST_FIELDS = ('pk', 'title', 'excerpt', 'reading_time', 'preview', 'created_at', 'views_count')
+# Меняется вместе с LIST_FIELDS, чтобы не читать строки прежнего вида
+ROWS_VERSION = 1
+
+
+class PostRow:
+    """Строка ленты блога. ``preview_srcset`` заполняет представление."""
+
+    __slots__ = LIST_FIELDS + ('preview_srcset',)
+
+    def __init__(self, pk, title, excerpt, reading_time, preview, created_at, views_count):
+        self.pk = pk
+        self.title = title
+        self.excerpt = excerpt
+        self.reading_time = reading_time
+        # Имя файла в хранилище (или пустая строка)
+        self.preview = preview
+        self.created_at = created_at
+        self.views_count = views_count
+        self.preview_srcset = None
+
+    def __repr__(self):
+        return f'<PostRow {self.pk}: {self.title}>'
+
+    @property
+    def preview_url(self):
+        return default_storage.url(self.preview) if self.preview else ''
+
+
+def _signer():
+    return signing.Signer(salt='blog.cursor')
+
+
+def encode_cursor(direction, post):
+    return _signer().sign_object([direction, post.created_at.isoformat(), post.pk], compress=True)
+
+
+def decode_cursor(cursor):
+    """Возвращает (направление, created_at, id) или None для пустого/битого курсора."""
+    if not cursor:
+        return None
+    try:
+        direction, created_at, pk = _signer().unsign_object(cursor)
+        created_at = datetime.fromisoformat(created_at)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    if direction not in (FORWARD, BACKWARD):
+        return None
+    return direction, created_at, pk
+
+
+def _cursor_key(decoded):
+    return 'first' if decoded is None else hashlib.md5(repr(decoded).encode()).hexdigest()
+
+
+def _fetch_page(decoded, page_size):
+    queryset = BlogPost.objects.filter(is_published=True)
+    if decoded is None:
+        queryset = queryset.order_by('-created_at', '-pk')
+    else:
+        direction, created_at, pk = decoded
+        # Условие по одной дате — граница диапазона индекса ленты, как в
+        # catalog.pagination.keyset_queryset: без неё дальние страницы
+        # читают индекс с начала
+        if direction == FORWARD:
+            older = Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+            queryset = queryset.filter(older).order_by('-created_at', '-pk')
+        else:
+            newer = Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+            queryset = queryset.filter(newer).order_by('created_at', 'pk')
+    return list(queryset.values_list(*LIST_FIELDS)[:page_size + 1])
+
+
+def get_posts_page(cursor=None, page_size=PAGE_SIZE):
+    """Страница опубликованных статей после (или до) курсора (KeysetPage из PostRow)."""
+    decoded = decode_cursor(cursor)
+    rows = None
+    if settings.CACHE_ENABLED:
+        key = f'blog:posts:{get_generation(GENERATION_KEY)}:r{ROWS_VERSION}:{page_size}:{_cursor_key(decoded)}'
+        rows = cache.get(key)
+    if rows is None:
+        # Страница кешируется до смены поколения — читаем не с реплики
+        with use_primary():
+            rows = _fetch_page(decoded, page_size)
+        if settings.CACHE_ENABLED:
+            cache.set(key, rows, PAGE_TIMEOUT)
+    posts = [PostRow(*values) for values in rows]
+
+    direction = decoded[0] if decoded else None
+    has_more = len(posts) > page_size
+    posts = posts[:page_size]
+    if direction == BACKWARD:
+        posts.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, direction == FORWARD
+    if not posts:
+        return KeysetPage(posts)
+    return KeysetPage(
+        posts,
+        next_cursor=encode_cursor(FORWARD, posts[-1]) if has_next else None,
+        prev_cursor=encode_cursor(BACKWARD, posts[0]) if has_prev else None,
+    )
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from blog.models import BlogPost
+from blog.services import GENERATION_KEY
+from config.generations import bump_generation
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_blog_pages(sender, instance, **kwargs):
+    """Новая, изменённая или удалённая статья — закешированные страницы ленты устарели."""
+    # После фиксации: иначе параллельный запрос закеширует старую ленту под новым поколением
+    transaction.on_commit(lambda: bump_generation(GENERATION_KEY))
@@ -1,3 +1,240 @@
-from django.test import TestCase
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import EXCERPT_LENGTH, BlogPost
+from blog.services import GENERATION_KEY, ROWS_VERSION, get_posts_page
+from blog.views import VIEWS_MILESTONE
+from config import benchmark, db_router
+from config.generations import get_generation
+from outbox.models import OutboxEmail
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Вторая SQLite-база есть в config.settings_bench
+HAS_REPLICA = 'replica' in settings.DATABASES
+
+
+@skipUnless(HAS_REPLICA, 'нужна база replica (config.settings_bench)')
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_STICKY_SECONDS=30)
+class ReplicaRoutingTest(TestCase):
+    """Чтения — с реплики, после правки статьи — из основной базы."""
+
+    databases = {'default', 'replica'} if HAS_REPLICA else {'default'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = BlogPost.objects.create(title='Старый заголовок', content='Текст', is_published=True)
+        # Реплика отстаёт: правки из основной базы в неё не попадают
+        BlogPost.objects.using('replica').create(
+            pk=cls.post.pk, title='Старый заголовок', content='Текст', is_published=True
+        )
+
+    def setUp(self):
+        db_router.health.reset()
+        self.url = reverse('blog:post_detail', args=[self.post.pk])
+
+    def edit(self):
+        response = self.client.post(reverse('blog:post_update', args=[self.post.pk]), {
+            'title': 'Новый заголовок', 'content': 'Текст', 'is_published': 'on',
+        })
+        self.assertEqual(response.status_code, 302)
+        return response
+
+    def test_reads_go_to_replica(self):
+        BlogPost.objects.filter(pk=self.post.pk).update(title='Новый заголовок')
+        self.assertContains(self.client.get(self.url), 'Старый заголовок')
+
+    def test_reads_stick_to_primary_after_write(self):
+        response = self.edit()
+        self.assertIn('db_primary_until', response.cookies)
+        self.assertContains(self.client.get(self.url), 'Новый заголовок')
+
+        # Окно закончилось — снова реплика
+        self.client.cookies['db_primary_until'] = '0'
+        self.assertContains(self.client.get(self.url), 'Старый заголовок')
+
+    def test_view_counter_does_not_stick(self):
+        # Запись счётчика просмотров в GET не делает пользователя «липким»
+        response = self.client.get(self.url)
+        self.assertNotIn('db_primary_until', response.cookies)
+
+    def test_unhealthy_replica_is_dropped(self):
+        BlogPost.objects.filter(pk=self.post.pk).update(title='Новый заголовок')
+        with mock.patch.object(db_router.health, 'check', return_value=False), \
+                self.assertLogs('config.db_router', 'WARNING') as logs:
+            self.assertContains(self.client.get(self.url), 'Новый заголовок')
+        self.assertEqual(logs.output, ['WARNING:config.db_router:Реплика replica исключена до следующей проверки'])
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(db_router.PrimaryReplicaRouter().db_for_read(BlogPost), 'default')
+
+
+class ReplicaChoiceTest(SimpleTestCase):
+    """Реплика выбирается один раз на запрос."""
+
+    def test_replica_chosen_once_per_request(self):
+        router = db_router.PrimaryReplicaRouter()
+        with mock.patch.object(db_router.health, 'healthy', return_value=['replica', 'replica_2']) as healthy:
+            for _ in range(5):
+                with db_router.routing(True):
+                    aliases = {router.db_for_read(BlogPost) for _ in range(20)}
+                    self.assertEqual(len(aliases), 1)
+                    self.assertIn(aliases.pop(), {'replica', 'replica_2'})
+        # Исправность проверяется на первом чтении запроса, а не на каждом
+        self.assertEqual(healthy.call_count, 5)
+
+        # Без исправных реплик запрос целиком читает из основной базы
+        with mock.patch.object(db_router.health, 'healthy', return_value=[]), db_router.routing(True):
+            self.assertEqual({router.db_for_read(BlogPost) for _ in range(3)}, {'default'})
+
+
+class ReplicaMigrateTest(SimpleTestCase):
+    """Миграции идут только в основную базу, реплики их не получают."""
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_migrations_skip_replicas(self):
+        router = db_router.PrimaryReplicaRouter()
+        self.assertTrue(router.allow_migrate('default', 'blog', model_name='blogpost'))
+        self.assertFalse(router.allow_migrate('replica_1', 'blog', model_name='blogpost'))
+
+
+class ViewsMilestoneTest(TestCase):
+    """Поздравление с порогом просмотров ставится в очередь ровно один раз."""
+
+    def test_milestone_email_enqueued_once(self):
+        post = BlogPost.objects.create(
+            title='Статья', content='Текст', is_published=True, views_count=VIEWS_MILESTONE - 2
+        )
+        url = reverse('blog:post_detail', args=[post.pk])
+        for _ in range(4):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        post.refresh_from_db()
+        self.assertEqual(post.views_count, VIEWS_MILESTONE + 2)
+        self.assertTrue(post.milestone_notified)
+        self.assertEqual(list(OutboxEmail.objects.values_list('subject', flat=True)), [
+            f"🎉 Поздравляем! Статья 'Статья' достигла {VIEWS_MILESTONE} просмотров!",
+        ])
+
+
+class BlogConditionalGetTest(TestCase):
+    """ETag/Last-Modified статьи: 304, новые валидаторы после правки, просмотр при 304."""
+
+    def test_304_and_new_etag_after_edit(self):
+        post = BlogPost.objects.create(title='Статья', content='Текст', is_published=True)
+        url = reverse('blog:post_detail', args=[post.pk])
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Показ из кеша браузера — тоже просмотр (см. catalog/conditional.py)
+        post.refresh_from_db()
+        self.assertEqual(post.views_count, 2)
+
+        post.title = 'Новый заголовок'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Новый заголовок')
+
+
+class BlogSummaryTest(TestCase):
+    """Анонс, число слов и время чтения пересчитываются из текста статьи."""
+
+    def test_save_fills_summary(self):
+        post = BlogPost.objects.create(title='Статья', content='<p>Слово</p> ' * 450, is_published=True)
+        post.refresh_from_db()
+        self.assertEqual(post.word_count, 450)
+        self.assertEqual(post.reading_time, 2)
+        self.assertEqual(len(post.excerpt), EXCERPT_LENGTH)
+        self.assertNotIn('<p>', post.excerpt)
+
+        post.content = 'Короткий текст'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual((post.excerpt, post.word_count, post.reading_time), ('Короткий текст', 2, 1))
+
+    def test_migration_backfills_existing_posts(self):
+        post = BlogPost.objects.create(title='Статья', content='Текст старой статьи', is_published=True)
+        BlogPost.objects.filter(pk=post.pk).update(excerpt='', word_count=0, reading_time=1)
+
+        migration = import_module('blog.migrations.0004_blogpost_summary_feed_idx')
+        migration.fill_summaries(apps, None)
+
+        post.refresh_from_db()
+        self.assertEqual((post.excerpt, post.word_count), ('Текст старой статьи', 3))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CACHE_ENABLED=True)
+class BlogFeedPagingTest(TestCase):
+    """Лента по курсору (created_at, id): статьи с одинаковым временем не теряются и не повторяются."""
+
+    @classmethod
+    def setUpTestData(cls):
+        BlogPost.objects.bulk_create(
+            BlogPost(title=f'Статья {i}', content='Текст', is_published=True) for i in range(11)
+        )
+        # Половина статей создана в одну и ту же секунду
+        same_time = timezone.now() - timedelta(days=1)
+        pks = list(BlogPost.objects.order_by('pk').values_list('pk', flat=True))
+        BlogPost.objects.filter(pk__in=pks[2:9]).update(created_at=same_time)
+        cls.expected = list(
+            BlogPost.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, page_size):
+        pages = [get_posts_page(None, page_size)]
+        while pages[-1].has_next:
+            pages.append(get_posts_page(pages[-1].next_cursor, page_size))
+        return pages
+
+    def test_forward_and_back(self):
+        pages = self.walk(page_size=3)
+        self.assertEqual([post.pk for page in pages for post in page], self.expected)
+
+        back = [pages[-1]]
+        while back[-1].has_previous:
+            back.append(get_posts_page(back[-1].prev_cursor, 3))
+        self.assertEqual([[post.pk for post in page] for page in reversed(back)],
+                         [[post.pk for post in page] for page in pages])
+
+    def test_cursor_bounds_index_range(self):
+        first = get_posts_page(None, 3)
+        with CaptureQueriesContext(connection) as queries:
+            get_posts_page(first.next_cursor, 3)
+        self.assertIn('"blog_blogpost"."created_at" <=', queries[0]['sql'])
+
+    def test_cached_page_holds_rows_not_models(self):
+        self.walk(page_size=3)
+        with self.assertNumQueries(0):
+            pages = self.walk(page_size=3)
+        self.assertEqual([post.pk for page in pages for post in page], self.expected)
+
+        key = f'blog:posts:{get_generation(GENERATION_KEY)}:r{ROWS_VERSION}:3:first'
+        rows = cache.get(key)
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(type(row) is tuple for row in rows))
+
+
+class BlogUrlBudgetSmallTest(benchmark.UrlBudgetTestCase):
+    app_label = 'blog'
+    size = 'small'
+
+
+class BlogUrlBudgetLargeTest(benchmark.UrlBudgetTestCase):
+    app_label = 'blog'
+    size = 'large'
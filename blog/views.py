@@ -7,9 +7,18 @@ from django.views.generic import (
     DeleteView,
 )
 from django.urls import reverse_lazy, reverse
+from django.db import transaction
+from django.db.models import F
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from .forms import BlogPostForm
 from .models import BlogPost
-from django.core.mail import send_mail
-from django.conf import settings
+from .services import get_posts_page
+from outbox.services import enqueue_email
+from renditions.services import get_srcsets
+
+# Порог просмотров, после которого автору уходит поздравление
+VIEWS_MILESTONE = 100
 
 
 class BlogPostListView(ListView):
@@ -17,9 +26,69 @@ class BlogPostListView(ListView):
     template_name = "blog/post_list.html"
     context_object_name = "posts"
 
-    # 🔹 Фильтрация: только опубликованные статьи
+    # 🔹 Только опубликованные статьи, страница по курсору, без текста статей
     def get_queryset(self):
-        return BlogPost.objects.filter(is_published=True)
+        self.page = get_posts_page(self.request.GET.get("cursor"))
+        return self.page.rows
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["page"] = self.page
+        # Копии превью для всей страницы — одним запросом, а не на каждую запись
+        srcsets = get_srcsets(post.preview for post in context["posts"])
+        for post in context["posts"]:
+            post.preview_srcset = srcsets.get(post.preview)
+        return context
+
+
+def record_post_view(pk, post=None):
+    """
+    Учитывает просмотр статьи. ``post`` — уже загруженная статья (если есть):
+    по ней видно, что порог ещё не достигнут, и лишний UPDATE не нужен.
+    """
+    # Атомарное приращение вместо сохранения всей строки
+    BlogPost.objects.filter(pk=pk).update(views_count=F("views_count") + 1)
+    if post is not None:
+        post.views_count += 1
+        if post.views_count < VIEWS_MILESTONE or post.milestone_notified:
+            return
+
+    # 🔔 Уведомление о 100 просмотрах: флаг «забирает» ровно один запрос,
+    # даже если порог одновременно перешагнули несколько
+    with transaction.atomic():
+        claimed = BlogPost.objects.filter(
+            pk=pk, milestone_notified=False, views_count__gte=VIEWS_MILESTONE
+        ).update(milestone_notified=True)
+        if claimed:
+            post = post or BlogPost.objects.get(pk=pk)
+            enqueue_email(
+                subject=f"🎉 Поздравляем! Статья '{post.title}' достигла {VIEWS_MILESTONE} просмотров!",
+                message=(
+                    f"Ваша статья '{post.title}' успешно набрала {VIEWS_MILESTONE} просмотров.\n"
+                    f"Дата: {post.created_at.strftime('%d.%m.%Y')}\n"
+                    f"Спасибо за качественный контент!"
+                ),
+                recipient_list=['your-email@example.com'],  # ← Замените на свою почту
+            )
+
+
+def _post_meta(request, pk):
+    # ETag, Last-Modified и учёт просмотра при 304 берут одну выборку без текста статьи
+    if getattr(request, "_post_meta", (None,))[0] != pk:
+        post = BlogPost.objects.only("updated_at", "views_count", "milestone_notified").filter(pk=pk).first()
+        request._post_meta = (pk, post)
+    return request._post_meta[1]
+
+
+def post_last_modified(request, pk):
+    post = _post_meta(request, pk)
+    return post.updated_at if post else None
+
+
+def post_etag(request, pk):
+    # Last-Modified точен до секунды, ETag различает и более частые правки
+    updated_at = post_last_modified(request, pk)
+    return f"{pk}-{updated_at.timestamp()}" if updated_at else None
 
 
 class BlogPostDetailView(DetailView):
@@ -27,37 +96,34 @@ class BlogPostDetailView(DetailView):
     template_name = "blog/post_detail.html"
     context_object_name = "post"
 
+    # 🔹 Если статья не менялась, браузер получает 304 без выборки и рендера
+    @method_decorator(condition(etag_func=post_etag, last_modified_func=post_last_modified))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if request.method == "GET" and response.status_code == 304:
+            # Статью показали из кеша браузера — это тоже просмотр
+            record_post_view(kwargs["pk"], _post_meta(request, kwargs["pk"]))
+        return response
+
     # 🔹 Увеличение счётчика просмотров
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
-        obj.views_count += 1
-        obj.save()
-
-        # 🔔 Отправка уведомления на почту при достижении 100 просмотров
-        if obj.views_count == 100:
-            send_mail(
-                subject=f"🎉 Поздравляем! Статья '{obj.title}' достигла 100 просмотров!",
-                message=(
-                    f"Ваша статья '{obj.title}' успешно набрала 100 просмотров.\n"
-                    f"Дата: {obj.created_at.strftime('%d.%m.%Y')}\n"
-                    f"Спасибо за качественный контент!"
-                ),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=['your-email@example.com'],  # ← Замените на свою почту
-                fail_silently=False,
-            )
+        record_post_view(obj.pk, obj)
         return obj
 
 class BlogPostCreateView(CreateView):
     model = BlogPost
-    fields = ["title", "content", "preview", "is_published"]
+    form_class = BlogPostForm
     template_name = "blog/post_form.html"
     success_url = reverse_lazy("blog:post_list")
 
 
 class BlogPostUpdateView(UpdateView):
     model = BlogPost
-    fields = ["title", "content", "preview", "is_published"]
+    form_class = BlogPostForm
     template_name = "blog/post_form.html"
 
     # 🔹 Перенаправление на страницу статьи после редактирования
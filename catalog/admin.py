@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product
+from .models import BannedWord, Category, Product
 
 
 @admin.register(Category)
@@ -7,9 +7,10 @@ class CategoryAdmin(admin.ModelAdmin):
     """
     Настройка отображения модели Category в админке.
     """
-    list_display = ("id", "name")  # Поля, отображаемые в списке
-    search_fields = ("name",)      # Поиск по имени категории
-    ordering = ("name",)           # Сортировка по имени
+    list_display = ("id", "name", "slug")  # Поля, отображаемые в списке
+    search_fields = ("name", "slug")       # Поиск по имени категории
+    ordering = ("name",)                   # Сортировка по имени
+    prepopulated_fields = {"slug": ("name",)}
 
 
 @admin.register(Product)
@@ -23,3 +24,12 @@ class ProductAdmin(admin.ModelAdmin):
     ordering = ("-created_at",)                        # Сортировка по дате создания (сверху новые)from django.contrib import admin
 
 # Register your models here.
+
+
+@admin.register(BannedWord)
+class BannedWordAdmin(admin.ModelAdmin):
+    """
+    Запрещённые слова для проверки продуктов и записей блога.
+    """
+    list_display = ("word",)
+    search_fields = ("word",)
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CatalogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "catalog"
+
+    def ready(self):
+        # Подключаем обработчики сигналов для инвалидации кеша каталога
+        from catalog import signals  # noqa: F401
+        from catalog.search import create_search_table
+
+        post_migrate.connect(create_search_table, sender=self)
+
+        # Буфер просмотров в памяти процесса (без Redis) сбрасывает фоновый поток;
+        # включается настройкой VIEW_COUNTER_LOCAL_FLUSH_INTERVAL
+        from catalog.counters import start_local_flush
+
+        start_local_flush()
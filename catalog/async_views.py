@@ -0,0 +1,121 @@
+"""
+Асинхронные представления каталога для ASGI: список, главная, продукт, категория.
+
+Подключаются в ``catalog/urls.py`` при ``CATALOG_ASYNC_VIEWS`` (его включает
+``config/asgi.py``); под WSGI работают синхронные представления из
+``catalog/views.py``. Кеш читается через ``catalog.caching.acache`` (пакетно,
+в пуле потоков), БД — через async ORM (``aget``, ``async for``). Независимые обращения идут одним
+``asyncio.gather``. Редкие пути с синхронными зависимостями (рендер
+страницы продукта при промахе кеша — тег ``picture`` ищет копии картинки,
+редирект со старого адреса категории) выполняются через ``sync_to_async``.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.views import View
+
+from catalog import page_cache
+from catalog.counters import aattach_views_total, apending_views
+from catalog.fragments import CSRF_MARK, VIEWS_MARK, aprerender_cards
+from catalog.models import Product
+from catalog.permissions import aload_permissions, aload_user, annotate_permissions
+from catalog.services import aget_category_page, aget_published_page, aresolve_category
+from catalog.views import HomeView, LegacyCategoryRedirectView, ProductDetailView, ProductListView
+from config.db_router import use_primary
+
+LIST_CARD_TEMPLATE = 'catalog/includes/inc_product_card.html'
+CATEGORY_CARD_TEMPLATE = 'catalog/includes/inc_product_card_compact.html'
+
+
+class AsyncProductListView(View):
+    template_name = ProductListView.template_name
+
+    async def get(self, request):
+        user = await aload_user(request)
+        # Страница из кеша и права пользователя — одновременно
+        page, _ = await asyncio.gather(aget_published_page(request.GET.get('cursor')), aload_permissions(user))
+        products = annotate_permissions(user, page.rows)
+        await aprerender_cards(request, products, LIST_CARD_TEMPLATE)
+        return render(request, self.template_name, {'object_list': products, 'page': page, 'view': self})
+
+
+class AsyncHomeView(View):
+    template_name = HomeView.template_name
+
+    async def get(self, request):
+        user = await aload_user(request)
+        page, _ = await asyncio.gather(aget_published_page(request.GET.get('cursor')), aload_permissions(user))
+        return render(request, self.template_name, {
+            'page': page,
+            'object_list': annotate_permissions(user, page.rows),
+            'view': self,
+        })
+
+
+class AsyncProductDetailView(View):
+    template_name = ProductDetailView.template_name
+
+    async def get(self, request, pk):
+        user = await aload_user(request)
+        entry, views_base = await page_cache.aget_page(request, pk)
+        if entry is not None:
+            await self._load_permissions(user, entry['owner_id'])
+            return await page_cache.apage_response(request, pk, entry, views_base)
+
+        try:
+            with use_primary():
+                product = await Product.objects.select_related('category').aget(pk=pk)
+        except Product.DoesNotExist:
+            raise Http404("Продукт не найден.")
+        if not product.is_published:
+            if not await user.ahas_perm('catalog.can_unpublish_product'):
+                raise Http404("Продукт не опубликован и недоступен.")
+            # Неопубликованный продукт видят только модераторы — не кешируем
+            context = self._context(product)
+            context.update(
+                views_total=product.views_counter + await apending_views(pk),
+                actions=mark_safe(page_cache.render_actions(request, pk, product.owner_id)),
+            )
+            return await sync_to_async(render)(request, self.template_name, context)
+
+        context = self._context(product)
+        context.update(
+            actions=page_cache.ACTIONS_MARK,
+            views_total=VIEWS_MARK,
+            csrf_token=CSRF_MARK,
+        )
+        body = await sync_to_async(render_to_string)(self.template_name, context, request)
+        entry = await page_cache.astore_page(request, product, user, body)
+        await self._load_permissions(user, product.owner_id)
+        return await page_cache.apage_response(request, pk, entry, product.views_counter)
+
+    def _context(self, product):
+        return {'object': product, 'product': product, 'view': self}
+
+    async def _load_permissions(self, user, owner_id):
+        # Кнопки владельца от прав не зависят, у остальных «Удалить» решает право
+        if owner_id != user.pk:
+            await aload_permissions(user)
+
+
+class AsyncProductCategoryView(View):
+    template_name = 'catalog/product_category.html'
+
+    async def get(self, request, slug):
+        # Пользователь и категория из кеша — одновременно
+        _, category = await asyncio.gather(aload_user(request), aresolve_category(slug))
+        if category is None:
+            # Латинское имя категории тоже похоже на слаг — пробуем старый адрес
+            return await sync_to_async(LegacyCategoryRedirectView.as_view())(request, category_name=slug)
+        page = await aget_category_page(category['id'], request.GET.get('cursor'))
+        products = await aattach_views_total(page.rows)
+        await aprerender_cards(request, products, CATEGORY_CARD_TEMPLATE)
+        return render(request, self.template_name, {
+            'page': page,
+            'products': products,
+            'category_name': category['name'],
+        })
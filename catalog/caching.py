@@ -0,0 +1,267 @@
+"""
+Ключи и поколения кеша каталога.
+
+Каждая закешированная выборка каталога хранится под ключом, в который входит
+номер поколения: общего для всего каталога или отдельного для категории.
+Изменение продукта или категории не удаляет ключи, а увеличивает поколение —
+старые записи просто перестают читаться и вытесняются по TTL. Поэтому TTL
+можно делать длинным, не рискуя отдать устаревший каталог.
+
+Выборки заполняются через ``get_or_compute``: при промахе выборку считает
+один процесс (блокировка ``cache.add``), остальные ждут его результат.
+Запись хранится дольше своего срока на ``CATALOG_STALE_TIMEOUT``: после
+срока её пересчитывает один процесс, а остальные пока получают прежнее
+значение. Пересчёт начинается с вероятностью, растущей к концу срока
+(XFetch), поэтому одновременно записанные ключи не истекают разом.
+"""
+import asyncio
+import math
+import random
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+
+from config import generations
+
+# Общий префикс всех ключей каталога; смена версии сбрасывает весь кеш
+NAMESPACE = 'catalog:v1'
+
+# Время жизни выборок каталога: инвалидация идёт через поколения
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60 * 24)
+
+# Сколько запись отдаётся устаревшей после срока, пока один процесс её пересчитывает
+CATALOG_STALE_TIMEOUT = getattr(settings, 'CATALOG_STALE_TIMEOUT', 5 * 60)
+# Время жизни блокировки пересчёта; столько же остальные ждут результат при промахе
+RECOMPUTE_LOCK_TIMEOUT = getattr(settings, 'CATALOG_RECOMPUTE_LOCK_TIMEOUT', 10)
+RECOMPUTE_POLL_INTERVAL = 0.02
+# Чем больше, тем раньше начинается пересчёт до истечения срока
+EARLY_EXPIRY_BETA = 1.0
+# Блокировки — вне NAMESPACE: их незачем держать в памяти процесса (config.tiered_cache)
+LOCK_PREFIX = 'catalog:lock:'
+
+GLOBAL_GENERATION = 'global'
+# Слаги и названия категорий (и страницы продуктов, где выводится категория):
+# меняются только при сохранении категорий, поэтому не зависят от общего
+# поколения, которое растёт с каждым продуктом
+CATEGORIES_GENERATION = 'categories'
+
+
+class PooledAsyncCache:
+    """
+    Асинхронный доступ к кешу по умолчанию для async-представлений.
+
+    ``cache.aget`` и остальные async-методы Django выполняют вызов в общем
+    потоке синхронного кода, где он стоит в очереди вместе с middleware и
+    ORM, а ``aget_many``/``aset_many`` делают по вызову на каждый ключ.
+    Клиенты кеша (Redis, locmem) потокобезопасны, поэтому здесь вызов
+    целиком уходит в пул потоков и не ждёт остальных.
+    """
+
+    def _call(self, name, *args):
+        return sync_to_async(getattr(cache, name), thread_sensitive=False)(*args)
+
+    def get(self, key, default=None):
+        return self._call('get', key, default)
+
+    def get_many(self, keys):
+        return self._call('get_many', keys)
+
+    def set(self, key, value, timeout):
+        return self._call('set', key, value, timeout)
+
+    def set_many(self, mapping, timeout):
+        return self._call('set_many', mapping, timeout)
+
+    def add(self, key, value, timeout):
+        return self._call('add', key, value, timeout)
+
+    def delete(self, key):
+        return self._call('delete', key)
+
+
+acache = PooledAsyncCache()
+
+
+def make_key(*parts):
+    """Собирает ключ в пространстве имён каталога: ``catalog:v1:<part>:<part>``."""
+    return ':'.join([NAMESPACE, *map(str, parts)])
+
+
+def generation_key(scope):
+    return make_key('gen', scope)
+
+
+def category_scope(category_id):
+    return f'category:{category_id}'
+
+
+def get_generation(scope=GLOBAL_GENERATION):
+    """Текущее поколение области (``global`` или ``category:<id>``)."""
+    return generations.get_generation(generation_key(scope))
+
+
+async def aget_generation(scope=GLOBAL_GENERATION):
+    """Асинхронный ``get_generation`` для async-представлений."""
+    key = generation_key(scope)
+    generation = await acache.get(key)
+    if generation is None:
+        generation = generations.initial_generation()
+        if not await acache.add(key, generation, None):
+            generation = await acache.get(key, generation)
+    return generation
+
+
+def _lock_key(key):
+    return LOCK_PREFIX + key
+
+
+def _lock_token():
+    # Своя метка в блокировке: если пересчёт шёл дольше RECOMPUTE_LOCK_TIMEOUT
+    # и блокировку уже взял другой процесс, снимать её нельзя
+    return uuid.uuid4().hex
+
+
+# Снимает блокировку, только если в ней наша метка: сравнение и удаление — одна операция Redis
+RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+def _release(key, token):
+    # Двухуровневый кеш (config.tiered_cache) держит блокировки в Redis
+    backend = caches['default']
+    backend = getattr(backend, 'remote', backend)
+    if isinstance(backend, RedisCache):
+        client = backend._cache.get_client(write=True)
+        full_key = backend.make_and_validate_key(_lock_key(key))
+        client.eval(RELEASE_SCRIPT, 1, full_key, backend._cache._serializer.dumps(token))
+        return
+    # Кеш в памяти процесса (locmem): get и delete не атомарны, но блокировка
+    # истекает через RECOMPUTE_LOCK_TIMEOUT, а окно между ними — доли миллисекунды
+    if cache.get(_lock_key(key)) == token:
+        cache.delete(_lock_key(key))
+
+
+async def _arelease(key, token):
+    await sync_to_async(_release, thread_sensitive=False)(key, token)
+
+
+def _unwrap(entry):
+    """Возвращает (значение, срок, время пересчёта) или None для промаха и записи прежнего вида."""
+    if isinstance(entry, tuple) and len(entry) == 3:
+        return entry
+    return None
+
+
+def _expired(expires_at, delta):
+    # XFetch: вероятность пересчёта растёт к концу срока и с длительностью пересчёта
+    return time.time() - delta * EARLY_EXPIRY_BETA * math.log(1.0 - random.random()) >= expires_at
+
+
+def _entry(value, started, timeout):
+    finished = time.time()
+    return (value, finished + timeout, finished - started)
+
+
+def compute_and_store(key, compute, timeout=CATALOG_CACHE_TIMEOUT):
+    """Считает значение и кладёт его в кеш под ``key`` без блокировки."""
+    started = time.time()
+    value = compute()
+    cache.set(key, _entry(value, started, timeout), timeout + CATALOG_STALE_TIMEOUT)
+    return value
+
+
+def _compute_locked(key, compute, timeout, token):
+    try:
+        return compute_and_store(key, compute, timeout)
+    finally:
+        _release(key, token)
+
+
+def get_or_compute(key, compute, timeout=CATALOG_CACHE_TIMEOUT):
+    """
+    Значение из кеша или ``compute()``; одновременные промахи считаются один раз.
+
+    После срока ``timeout`` значение пересчитывает тот, кто взял блокировку,
+    остальные получают прежнее. При полном промахе остальные ждут результат
+    до ``RECOMPUTE_LOCK_TIMEOUT`` секунд, затем считают сами.
+    """
+    token = _lock_token()
+    entry = _unwrap(cache.get(key))
+    if entry is not None:
+        value, expires_at, delta = entry
+        if _expired(expires_at, delta) and cache.add(_lock_key(key), token, RECOMPUTE_LOCK_TIMEOUT):
+            return _compute_locked(key, compute, timeout, token)
+        return value
+
+    if cache.add(_lock_key(key), token, RECOMPUTE_LOCK_TIMEOUT):
+        return _compute_locked(key, compute, timeout, token)
+    deadline = time.monotonic() + RECOMPUTE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(RECOMPUTE_POLL_INTERVAL)
+        entry = _unwrap(cache.get(key))
+        if entry is not None:
+            return entry[0]
+    # Считавший процесс упал или завис — не ждём дальше
+    return compute_and_store(key, compute, timeout)
+
+
+async def acompute_and_store(key, acompute, timeout=CATALOG_CACHE_TIMEOUT):
+    """Асинхронный ``compute_and_store``: ``acompute`` — корутинная функция."""
+    started = time.time()
+    value = await acompute()
+    await acache.set(key, _entry(value, started, timeout), timeout + CATALOG_STALE_TIMEOUT)
+    return value
+
+
+async def aget_or_compute(key, acompute, timeout=CATALOG_CACHE_TIMEOUT):
+    """Асинхронный ``get_or_compute``: ``acompute`` — корутинная функция."""
+
+    token = _lock_token()
+
+    async def compute_locked():
+        try:
+            return await acompute_and_store(key, acompute, timeout)
+        finally:
+            await _arelease(key, token)
+
+    entry = _unwrap(await acache.get(key))
+    if entry is not None:
+        value, expires_at, delta = entry
+        if _expired(expires_at, delta) and await acache.add(_lock_key(key), token, RECOMPUTE_LOCK_TIMEOUT):
+            return await compute_locked()
+        return value
+
+    if await acache.add(_lock_key(key), token, RECOMPUTE_LOCK_TIMEOUT):
+        return await compute_locked()
+    deadline = time.monotonic() + RECOMPUTE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(RECOMPUTE_POLL_INTERVAL)
+        entry = _unwrap(await acache.get(key))
+        if entry is not None:
+            return entry[0]
+    return await acompute_and_store(key, acompute, timeout)
+
+
+def bump_generation(scope=GLOBAL_GENERATION):
+    return generations.bump_generation(generation_key(scope))
+
+
+def invalidate_catalog(category_ids=()):
+    """
+    Делает неактуальными общие выборки каталога и выборки указанных категорий.
+
+    Поколения увеличиваются после фиксации транзакции: иначе параллельный
+    запрос успел бы закешировать старые данные уже под новым поколением.
+    """
+    scopes = [GLOBAL_GENERATION]
+    scopes += [category_scope(pk) for pk in set(category_ids) if pk is not None]
+
+    def bump():
+        for scope in scopes:
+            bump_generation(scope)
+
+    transaction.on_commit(bump)
@@ -0,0 +1,163 @@
+"""
+Валидаторы условного GET (ETag/Last-Modified) для страниц каталога.
+
+Они строятся из дешёвых метаданных — ``updated_at`` продукта (из кеша
+страницы, если он там есть) и поколений кеша каталога, — поэтому ответ
+``304`` отдаётся без основной выборки и рендера шаблона. В ETag входит
+пользователь: кнопки на странице у каждого свои. Last-Modified от
+пользователя не зависит, поэтому отдаётся только анонимам — иначе запрос с
+одним If-Modified-Since получил бы 304 на страницу, сохранённую до входа.
+Ответы с такими валидаторами помечаются ``Vary: Cookie`` (``urls.py``).
+
+Счётчик просмотров в валидаторы не входит, иначе страница менялась бы на
+каждый запрос; при ``304`` браузер покажет значение из своего кеша.
+Ответ ``304`` при этом учитывается как просмотр (``count_views`` в
+``urls.py``, ``BlogPostDetailView.dispatch``): страницу открыли и показали,
+просто из кеша браузера. Так счётчик не зависит от того, хранит ли браузер
+копию страницы.
+
+Для асинхронных представлений (``catalog/async_views.py``) есть те же
+валидаторы с префиксом ``a`` и декоратор ``acondition``.
+"""
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from catalog import page_cache
+from catalog.caching import aget_generation, category_scope, get_generation
+from catalog.models import Product
+from catalog.pagination import cursor_cache_key
+from catalog.permissions import aload_user
+from catalog.services import aresolve_category, resolve_category
+
+# Меняется при выкатке новых шаблонов, чтобы браузеры не получили 304 на старую разметку
+ETAG_VERSION = getattr(settings, 'CATALOG_ETAG_VERSION', 1)
+
+
+def _etag(request, *parts):
+    viewer = request.user.pk if request.user.is_authenticated else 'anon'
+    raw = ':'.join(map(str, (ETAG_VERSION, viewer, *parts)))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def product_last_modified(request, pk):
+    """``updated_at`` опубликованного продукта для анонима; иначе None (без Last-Modified)."""
+    if request.user.is_authenticated:
+        return None
+    return _product_updated_at(request, pk)
+
+
+def _product_updated_at(request, pk):
+    """``updated_at`` опубликованного продукта; для остальных — None (без 304)."""
+    entry, _ = page_cache.get_page(request, pk)
+    if entry is not None and entry.get('updated_at'):
+        return entry['updated_at']
+    # ETag и Last-Modified считаются по одному значению — запрос в БД один
+    if getattr(request, '_product_updated_at', (None,))[0] != pk:
+        # order_by(): иначе Meta.ordering добавит JOIN категории и сортировку
+        updated_at = (
+            Product.objects.filter(pk=pk, is_published=True).order_by()
+            .values_list('updated_at', flat=True).first()
+        )
+        request._product_updated_at = (pk, updated_at)
+    return request._product_updated_at[1]
+
+
+def product_etag(request, pk):
+    updated_at = _product_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    return _etag(request, 'product', pk, updated_at.isoformat())
+
+
+def product_list_etag(request):
+    return _etag(request, 'list', get_generation(), cursor_cache_key(request.GET.get('cursor')))
+
+
+def category_etag(request, slug):
+    category = resolve_category(slug)
+    if category is None:
+        # Старый адрес по имени — представление ответит редиректом
+        return None
+    return _etag(
+        request, 'category', category['id'],
+        get_generation(category_scope(category['id'])),
+        cursor_cache_key(request.GET.get('cursor')),
+    )
+
+
+# --- Асинхронные варианты ----------------------------------------------------
+
+
+async def aproduct_last_modified(request, pk):
+    if request.user.is_authenticated:
+        return None
+    return await _aproduct_updated_at(request, pk)
+
+
+async def _aproduct_updated_at(request, pk):
+    entry, _ = await page_cache.aget_page(request, pk)
+    if entry is not None and entry.get('updated_at'):
+        return entry['updated_at']
+    if getattr(request, '_product_updated_at', (None,))[0] != pk:
+        updated_at = await (
+            Product.objects.filter(pk=pk, is_published=True).order_by()
+            .values_list('updated_at', flat=True).afirst()
+        )
+        request._product_updated_at = (pk, updated_at)
+    return request._product_updated_at[1]
+
+
+async def aproduct_etag(request, pk):
+    updated_at = await _aproduct_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    return _etag(request, 'product', pk, updated_at.isoformat())
+
+
+async def aproduct_list_etag(request):
+    return _etag(request, 'list', await aget_generation(), cursor_cache_key(request.GET.get('cursor')))
+
+
+async def acategory_etag(request, slug):
+    category = await aresolve_category(slug)
+    if category is None:
+        return None
+    return _etag(
+        request, 'category', category['id'],
+        await aget_generation(category_scope(category['id'])),
+        cursor_cache_key(request.GET.get('cursor')),
+    )
+
+
+def acondition(etag_func=None, last_modified_func=None):
+    """
+    ``django.views.decorators.http.condition`` для асинхронных представлений
+    и валидаторов. Пользователь загружается заранее — он входит в ETag.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await func(request, *args, **kwargs)
+            await aload_user(request)
+            etag = await etag_func(request, *args, **kwargs) if etag_func else None
+            etag = quote_etag(etag) if etag else None
+            last_modified = await last_modified_func(request, *args, **kwargs) if last_modified_func else None
+            last_modified = timegm(last_modified.utctimetuple()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await func(request, *args, **kwargs)
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault('ETag', etag)
+            return response
+
+        return inner
+    return decorator
@@ -0,0 +1,310 @@
+"""
+Отложенная запись счётчика просмотров продуктов (write-behind).
+
+Просмотр страницы продукта больше не сохраняет строку целиком: приращение
+копится в буфере (хеш в Redis или словарь в памяти процесса), а команда
+``manage.py flush_view_counters`` периодически переносит накопленное в БД
+пакетными ``UPDATE ... SET views_counter = views_counter + ...``.
+``updated_at`` при этом не меняется, потому что ``QuerySet.update`` не
+трогает поля с ``auto_now``.
+
+Буфер в памяти процесса (без Redis) команде не виден, его раз в
+``VIEW_COUNTER_LOCAL_FLUSH_INTERVAL`` секунд сбрасывает фоновый поток
+процесса — не запрос пользователя. Поток запускает ``CatalogConfig.ready``,
+только если интервал задан (по умолчанию 0 — выключено).
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import connections, transaction
+from django.db.models import Case, F, Value, When
+
+from catalog.models import Product
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'catalog:views:pending'
+FLUSHING_KEY = 'catalog:views:flushing'
+FLUSH_LOCK_KEY = 'catalog:views:flush_lock'
+# Значение счётчика из БД для закешированной страницы продукта (catalog.page_cache)
+VIEWS_BASE_KEY = 'catalog:views:base:{}'
+
+# Сколько продуктов обновлять одним UPDATE
+FLUSH_BATCH_SIZE = getattr(settings, 'VIEW_COUNTER_FLUSH_BATCH_SIZE', 500)
+# Как часто фоновый поток сбрасывает буфер в памяти процесса в БД (секунды; 0 — не сбрасывать)
+LOCAL_FLUSH_INTERVAL = getattr(settings, 'VIEW_COUNTER_LOCAL_FLUSH_INTERVAL', 0)
+# Время жизни блокировки сброса: снимается после фиксации, а если внешняя
+# транзакция откатилась — по истечении этого срока
+FLUSH_LOCK_TIMEOUT = 300
+
+
+class LocalViewBuffer:
+    """
+    Буфер просмотров в памяти процесса — замена Redis для locmem-кеша и тестов.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._flushing = Counter()
+
+    def incr(self, pk, amount=1):
+        with self._lock:
+            self._pending[pk] += amount
+
+    def pending_many(self, pks):
+        with self._lock:
+            return {pk: self._pending[pk] + self._flushing[pk] for pk in pks}
+
+    def drain(self):
+        """Переносит накопленное в «сбрасываемую» часть и возвращает её."""
+        with self._lock:
+            # Незавершённый прошлый сброс обрабатываем первым
+            if not self._flushing:
+                self._flushing, self._pending = self._pending, Counter()
+            return dict(self._flushing)
+
+    def ack(self):
+        """Подтверждает, что сброшенные приращения записаны в БД."""
+        with self._lock:
+            self._flushing = Counter()
+
+
+class RedisViewBuffer:
+    """
+    Буфер просмотров в Redis: общий для всех воркеров, HINCRBY атомарен.
+    """
+
+    shared = True
+
+    def __init__(self, client, pending_key, flushing_key):
+        self.client = client
+        self.pending_key = pending_key
+        self.flushing_key = flushing_key
+
+    def incr(self, pk, amount=1):
+        self.client.hincrby(self.pending_key, pk, amount)
+
+    def pending_many(self, pks):
+        pks = list(pks)
+        if not pks:
+            return {}
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hmget(self.pending_key, pks)
+        pipe.hmget(self.flushing_key, pks)
+        pending, flushing = pipe.execute()
+        return {
+            pk: int(p or 0) + int(f or 0)
+            for pk, p, f in zip(pks, pending, flushing)
+        }
+
+    def drain(self):
+        """Атомарно переименовывает хеш накопленных просмотров и читает его."""
+        import redis
+
+        try:
+            # RENAMENX не затирает незавершённый прошлый сброс
+            self.client.renamenx(self.pending_key, self.flushing_key)
+        except redis.ResponseError:
+            pass  # Новых просмотров нет
+        raw = self.client.hgetall(self.flushing_key)
+        return {int(pk): int(delta) for pk, delta in raw.items()}
+
+    def ack(self):
+        self.client.delete(self.flushing_key)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_view_buffer():
+    """Возвращает буфер, подходящий для настроенного кеша (Redis или память)."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                backend = caches['default']
+                # Двухуровневый кеш (config.tiered_cache) хранит общие данные в Redis
+                backend = getattr(backend, 'remote', backend)
+                if isinstance(backend, RedisCache):
+                    _buffer = RedisViewBuffer(
+                        backend._cache.get_client(write=True),
+                        backend.make_key(PENDING_KEY),
+                        backend.make_key(FLUSHING_KEY),
+                    )
+                else:
+                    _buffer = LocalViewBuffer()
+    return _buffer
+
+
+def start_local_flush():
+    """
+    Запускает фоновый сброс буфера в памяти процесса (из ``CatalogConfig.ready``).
+    Для буфера в Redis и при ``LOCAL_FLUSH_INTERVAL = 0`` ничего не делает.
+    """
+    if not LOCAL_FLUSH_INTERVAL or get_view_buffer().shared:
+        return None
+    thread = threading.Thread(
+        target=_flush_periodically, args=(LOCAL_FLUSH_INTERVAL,),
+        name='view-counter-flush', daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def _flush_periodically(interval):
+    """Фоновый сброс буфера в памяти процесса (его не видит команда сброса)."""
+    while True:
+        time.sleep(interval)
+        try:
+            flush_views()
+        except Exception:
+            logger.exception('Сброс просмотров не удался, повтор через %s с', interval)
+        finally:
+            # Соединения потока сброса не должны висеть до следующего прохода
+            connections.close_all()
+
+
+def record_view(pk):
+    """Учитывает один просмотр продукта без обращения к БД."""
+    get_view_buffer().incr(pk)
+
+
+async def arecord_view(pk):
+    """Асинхронный ``record_view``: Redis — в пуле потоков, не в цикле событий."""
+    buffer = get_view_buffer()
+    if buffer.shared:
+        await sync_to_async(buffer.incr, thread_sensitive=False)(pk)
+    else:
+        buffer.incr(pk)
+
+
+def views_base_key(pk):
+    return VIEWS_BASE_KEY.format(pk)
+
+
+def _shift_views_base(pending):
+    """Сдвигает закешированные значения из БД на только что записанные приращения."""
+    for pk, delta in pending:
+        try:
+            cache.incr(views_base_key(pk), delta)
+        except ValueError:
+            pass  # Страница не закеширована
+
+
+def pending_views(pk):
+    """Количество просмотров продукта, ещё не записанных в БД."""
+    return get_view_buffer().pending_many([pk])[pk]
+
+
+async def apending_many(pks):
+    """Асинхронный ``pending_many``: буфер в памяти читается сразу, Redis — в пуле потоков."""
+    buffer = get_view_buffer()
+    if buffer.shared:
+        return await sync_to_async(buffer.pending_many, thread_sensitive=False)(list(pks))
+    return buffer.pending_many(pks)
+
+
+async def apending_views(pk):
+    return (await apending_many([pk]))[pk]
+
+
+def attach_views_total(products):
+    """
+    Проставляет каждому продукту ``views_total`` — значение из БД плюс буфер.
+    """
+    products = list(products)
+    pending = get_view_buffer().pending_many(p.pk for p in products)
+    for product in products:
+        product.views_total = product.views_counter + pending.get(product.pk, 0)
+    return products
+
+
+async def aattach_views_total(products):
+    """Асинхронный ``attach_views_total``."""
+    products = list(products)
+    pending = await apending_many([p.pk for p in products])
+    for product in products:
+        product.views_total = product.views_counter + pending.get(product.pk, 0)
+    return products
+
+
+def flush_views(batch_size=None):
+    """
+    Переносит накопленные просмотры в БД. Возвращает число учтённых просмотров.
+
+    Буфер подтверждается только после фиксации транзакции: если запись
+    в БД упала или откатилась, те же приращения будут записаны при
+    следующем сбросе. Блокировка сброса держится до подтверждения — иначе
+    сброс внутри внешней транзакции отпустил бы её раньше, и следующий
+    записал бы те же приращения второй раз.
+    """
+    batch_size = batch_size or FLUSH_BATCH_SIZE
+    # Два одновременных сброса посчитали бы одни и те же просмотры дважды
+    if not cache.add(FLUSH_LOCK_KEY, 1, FLUSH_LOCK_TIMEOUT):
+        return 0
+    try:
+        buffer = get_view_buffer()
+        pending = [(pk, delta) for pk, delta in buffer.drain().items() if delta]
+        with transaction.atomic():
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                Product.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                    views_counter=F('views_counter') + Case(
+                        *[When(pk=pk, then=Value(delta)) for pk, delta in batch],
+                        default=Value(0),
+                    )
+                )
+
+            def committed():
+                try:
+                    buffer.ack()
+                    _shift_views_base(pending)
+                finally:
+                    cache.delete(FLUSH_LOCK_KEY)
+
+            transaction.on_commit(committed)
+    except BaseException:
+        # Запись не удалась — приращения остались в буфере, блокировка не нужна
+        cache.delete(FLUSH_LOCK_KEY)
+        raise
+    return sum(delta for _, delta in pending)
+
+
+def count_views(view_func):
+    """
+    Декоратор для URL страницы продукта: считает каждый успешный просмотр.
+
+    Оборачивает представление снаружи, поэтому просмотры, отданные из кеша
+    страницы (``catalog.page_cache``), тоже учитываются. Асинхронное
+    представление оборачивается асинхронно.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            response = await view_func(request, *args, **kwargs)
+            if request.method == 'GET' and response.status_code in (200, 304):
+                await arecord_view(kwargs['pk'])
+            return response
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        # 304 — тоже просмотр: страницу показали из кеша браузера
+        if request.method == 'GET' and response.status_code in (200, 304):
+            record_view(kwargs['pk'])
+        return response
+
+    return wrapper
@@ -0,0 +1,192 @@
+"""
+Просмотр каталога с фильтрами и счётчиками по ним (фасетами).
+
+Фильтры: несколько категорий (по слагам), диапазон цен, владелец. Все
+счётчики считаются одним запросом: ``GROUP BY`` по категориям опубликованных
+продуктов владельца с условными ``COUNT(...) FILTER (WHERE ...)`` — число
+продуктов в диапазоне цен и по одному на каждый ценовой интервал. Из этих
+строк собираются оба фасета. Каждый фасет не учитывает собственный фильтр:
+у категорий — число продуктов с учётом цены, у цен — с учётом выбранных
+категорий, чтобы было видно, что даст другой выбор.
+
+Запрос читает только ``category_id``, ``price`` и ``owner_id`` и целиком покрывается
+индексами ``product_browse_category_idx`` и ``product_browse_owner_idx``.
+Кеширование — в ``catalog.services.get_browse_facets``.
+"""
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Q
+from django.http import QueryDict
+
+from catalog.models import Product
+
+# Границы ценовых интервалов: [0, 500), [500, 1000), ..., [10000, ∞)
+PRICE_BOUNDS = (Decimal('0'), Decimal('500'), Decimal('1000'), Decimal('5000'), Decimal('10000'))
+# Шаг цены (DecimalField с двумя знаками): верхняя граница интервала в фильтре включительная
+PRICE_STEP = Decimal('0.01')
+# Сколько категорий можно выбрать разом
+MAX_CATEGORIES = 20
+
+
+def _price(value):
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    if not price.is_finite() or price < 0:
+        return None
+    return price.quantize(PRICE_STEP)
+
+
+def _owner(value):
+    try:
+        owner_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return owner_id if owner_id > 0 else None
+
+
+class BrowseFilters:
+    """Фильтры просмотра каталога; неверные значения из адреса отбрасываются."""
+
+    def __init__(self, category_slugs=(), price_min=None, price_max=None, owner_id=None):
+        self.category_slugs = tuple(sorted(set(category_slugs)))[:MAX_CATEGORIES]
+        self.price_min = price_min
+        self.price_max = price_max
+        self.owner_id = owner_id
+
+    @classmethod
+    def from_query(cls, query):
+        return cls(
+            category_slugs=[slug for slug in query.getlist('category') if slug],
+            price_min=_price(query.get('price_min')),
+            price_max=_price(query.get('price_max')),
+            owner_id=_owner(query.get('owner')),
+        )
+
+    def signature(self):
+        """Часть ключа кеша: одинаковые фильтры в любом порядке — один ключ."""
+        values = (self.category_slugs, self.price_min, self.price_max, self.owner_id)
+        return hashlib.md5(repr(values).encode()).hexdigest()
+
+    def rows_signature(self):
+        """Часть ключа кеша строк фасетов: от выбранных категорий они не зависят."""
+        return hashlib.md5(repr((self.price_min, self.price_max, self.owner_id)).encode()).hexdigest()
+
+    def price_q(self):
+        q = Q()
+        if self.price_min is not None:
+            q &= Q(price__gte=self.price_min)
+        if self.price_max is not None:
+            q &= Q(price__lte=self.price_max)
+        return q
+
+    def base_queryset(self):
+        """Опубликованные продукты с фильтром владельца — общий для всех фасетов."""
+        queryset = Product.objects.filter(is_published=True)
+        if self.owner_id is not None:
+            queryset = queryset.filter(owner_id=self.owner_id)
+        return queryset
+
+    def products(self, category_ids):
+        """Продукты, подходящие под все фильтры; ``category_ids`` — id выбранных слагов."""
+        queryset = self.base_queryset().filter(self.price_q())
+        if self.category_slugs:
+            queryset = queryset.filter(category_id__in=category_ids)
+        return queryset
+
+    def querystring(self, **changes):
+        """Строка запроса с изменёнными фильтрами (для ссылок фасетов), без курсора."""
+        values = {
+            'category': list(self.category_slugs),
+            'price_min': self.price_min,
+            'price_max': self.price_max,
+            'owner': self.owner_id,
+        }
+        values.update(changes)
+        query = QueryDict(mutable=True)
+        for name, value in values.items():
+            if isinstance(value, (list, tuple)):
+                query.setlist(name, value)
+            elif value is not None:
+                query[name] = str(value)
+        return query.urlencode()
+
+
+def price_buckets():
+    """[(нижняя граница, верхняя или None)] для PRICE_BOUNDS."""
+    return list(zip(PRICE_BOUNDS, [*PRICE_BOUNDS[1:], None]))
+
+
+def _bucket_q(low, high):
+    q = Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lt=high)
+    return q
+
+
+def facet_queryset(filters):
+    """
+    Один агрегатный запрос: по строке на категорию с числом продуктов в
+    диапазоне цен (``matching``) и в каждом ценовом интервале (``bucket_<n>``).
+    """
+    # COUNT(price), а не COUNT(id): цена есть в покрывающем индексе, а
+    # COUNT(*) Django не сочетает с FILTER
+    counts = {'matching': Count('price', filter=filters.price_q() or None)}
+    for number, (low, high) in enumerate(price_buckets()):
+        counts[f'bucket_{number}'] = Count('price', filter=_bucket_q(low, high))
+    return (
+        filters.base_queryset()
+        .order_by()
+        .values('category_id', 'category__name', 'category__slug')
+        .annotate(**counts)
+    )
+
+
+def facet_rows(filters):
+    return list(facet_queryset(filters))
+
+
+def build_facets(filters, rows):
+    """Фасеты и число найденных продуктов из строк ``facet_rows``."""
+    selected = set(filters.category_slugs)
+    category_ids = [row['category_id'] for row in rows if row['category__slug'] in selected]
+    # Без выбранных категорий в счёт идут все, в том числе продукты без категории
+    chosen = [row for row in rows if not selected or row['category__slug'] in selected]
+
+    categories = []
+    for row in sorted((row for row in rows if row['category_id'] is not None), key=lambda row: row['category__name']):
+        slug = row['category__slug']
+        # Без подходящих продуктов категорию показываем, только если она уже выбрана
+        if not row['matching'] and slug not in selected:
+            continue
+        categories.append({
+            'id': row['category_id'],
+            'name': row['category__name'],
+            'slug': slug,
+            'count': row['matching'],
+            'selected': slug in selected,
+            # Ссылка, которая добавляет категорию к выбору или убирает её
+            'query': filters.querystring(category=sorted(selected ^ {slug})),
+        })
+
+    prices = []
+    for number, (low, high) in enumerate(price_buckets()):
+        price_max = high - PRICE_STEP if high is not None else None
+        is_selected = (filters.price_min, filters.price_max) == (low, price_max)
+        prices.append({
+            'min': low,
+            'max': price_max,
+            'count': sum(row[f'bucket_{number}'] for row in chosen),
+            'selected': is_selected,
+            'query': filters.querystring(
+                price_min=None if is_selected else low, price_max=None if is_selected else price_max,
+            ),
+        })
+    return {
+        'categories': categories,
+        'prices': prices,
+        'category_ids': category_ids,
+        'total': sum(row['matching'] for row in chosen),
+    }
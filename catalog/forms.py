@@ -1,16 +1,10 @@
 from django import forms
 from .models import Product
+from .moderation import contains_banned_word
 from django.core.exceptions import ValidationError
 import os
 
 
-
-# Список запрещённых слов (в любом регистре)
-BANNED_WORDS = [
-    'казино', 'криптовалюта', 'крипта', 'биржа',
-    'дешево', 'бесплатно', 'обман', 'полиция', 'радар'
-]
-
 # Максимальный размер файла: 5 МБ = 5 * 1024 * 1024 байт
 MAX_UPLOAD_SIZE = 5 * 1024 * 1024  # 5 МБ
 ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/png', 'image/jpg']
@@ -82,5 +76,4 @@ class ProductForm(forms.ModelForm):
 
     def contains_banned_word(self, text):
         """Проверяет, содержит ли текст запрещённые слова (без учёта регистра)"""
-        text_lower = text.lower()
-        return any(word in text_lower for word in BANNED_WORDS)
\ No newline at end of file
+        return contains_banned_word(text)
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Кеш HTML-карточек продуктов.
+
+Карточка рендерится один раз на ключ ``(шаблон, pk, updated_at, класс прав)``
+и дальше берётся из кеша: страница из 1000 продуктов собирается из готовых
+фрагментов одним ``get_many``, а рендерятся только изменившиеся карточки.
+
+Класс прав (``viewer``/``moderator``/``owner``) определяет набор кнопок.
+То, что у каждого пользователя своё — CSRF-токен в форме снятия с
+публикации и счётчик просмотров, — в кеш не попадает: при рендере вместо
+них подставляются метки, которые заменяются при сборке страницы.
+"""
+import logging
+
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import get_template
+
+from catalog.caching import CATALOG_CACHE_TIMEOUT, acache, make_key
+
+logger = logging.getLogger(__name__)
+
+# Меняется при изменении шаблонов карточек
+FRAGMENT_VERSION = 1
+
+CSRF_MARK = 'card-csrf-token-mark'
+VIEWS_MARK = 'card-views-total-mark'
+
+# Попадания и промахи с момента запуска процесса
+stats = {'hits': 0, 'misses': 0}
+
+
+def permission_class(product):
+    """Набор кнопок карточки по флагам ``can_edit``/``can_delete``."""
+    if product.can_edit:
+        return 'owner'
+    if product.can_delete:
+        return 'moderator'
+    return 'viewer'
+
+
+def fragment_key(template_name, product, options=''):
+    return make_key(
+        'card', FRAGMENT_VERSION, template_name, options,
+        product.pk, product.updated_at,
+        # Готовые копии картинки меняют разметку, но не updated_at
+        'r' if product.preview_srcset else 'o',
+        permission_class(product),
+    )
+
+
+def options_key(options):
+    return ','.join(f'{name}={value}' for name, value in sorted(options.items()))
+
+
+def render_cards(request, products, template_name, **options):
+    """
+    Возвращает HTML карточек ``products`` (строк ``ProductRow`` с флагами прав).
+
+    ``options`` передаются в шаблон карточки и входят в ключ кеша.
+    Статистика попаданий копится в ``stats`` и в ``request.card_cache_stats``.
+    """
+    products = list(products)
+    if not products:
+        return ''
+    keys = [fragment_key(template_name, product, options_key(options)) for product in products]
+    cached = cache.get_many(keys)
+    missing = _render_missing(keys, products, cached, template_name, options)
+    if missing:
+        cache.set_many(missing, CATALOG_CACHE_TIMEOUT)
+    return _assemble(request, keys, products, cached, missing, template_name)
+
+
+async def arender_cards(request, products, template_name, **options):
+    """Асинхронный ``render_cards``: кеш читается одним вызовом в пуле потоков."""
+    products = list(products)
+    if not products:
+        return ''
+    keys = [fragment_key(template_name, product, options_key(options)) for product in products]
+    cached = await acache.get_many(keys)
+    missing = _render_missing(keys, products, cached, template_name, options)
+    if missing:
+        await acache.set_many(missing, CATALOG_CACHE_TIMEOUT)
+    return _assemble(request, keys, products, cached, missing, template_name)
+
+
+async def aprerender_cards(request, products, template_name, **options):
+    """
+    Готовит карточки для асинхронного представления: тег ``product_cards``
+    возьмёт их с запроса вместо синхронного обращения к кешу.
+    """
+    html = await arender_cards(request, products, template_name, **options)
+    prerendered = getattr(request, 'prerendered_cards', None) or {}
+    prerendered[template_name, options_key(options)] = html
+    request.prerendered_cards = prerendered
+    return html
+
+
+def _render_missing(keys, products, cached, template_name, options):
+    missing = {}
+    template = None
+    for key, product in zip(keys, products):
+        if key in cached or key in missing:
+            continue
+        template = template or get_template(template_name)
+        missing[key] = template.render({
+            'product': product,
+            'csrf_token': CSRF_MARK,
+            'views_total': VIEWS_MARK,
+            **options,
+        })
+    return missing
+
+
+def _assemble(request, keys, products, cached, missing, template_name):
+    hits, misses = len(products) - len(missing), len(missing)
+    stats['hits'] += hits
+    stats['misses'] += misses
+    if request is not None:
+        request_stats = getattr(request, 'card_cache_stats', None) or {'hits': 0, 'misses': 0}
+        request_stats['hits'] += hits
+        request_stats['misses'] += misses
+        request.card_cache_stats = request_stats
+    logger.debug('Карточки %s: попаданий %d, промахов %d', template_name, hits, misses)
+
+    fragments = {**cached, **missing}
+    token = None
+    parts = []
+    for key, product in zip(keys, products):
+        html = fragments[key].replace(VIEWS_MARK, str(product.views_total))
+        if CSRF_MARK in html:
+            # Токен запрашивается только если на странице есть формы
+            token = token or (get_token(request) if request is not None else '')
+            html = html.replace(CSRF_MARK, token)
+        parts.append(html)
+    return ''.join(parts)
@@ -0,0 +1,146 @@
+"""
+Реестр горячих запросов каталога для ``manage.py explain_hot_queries``.
+
+Каждая функция возвращает queryset в том виде, в каком его выполняет код
+каталога. Команда выводит их планы и сообщает о последовательных
+сканированиях, сортировках и чтении индекса без границы диапазона — так
+изменение запроса или набора индексов проверяется до выкатки. Запросы с
+курсором берут его с последней страницы: на первой странице индекс,
+прочитанный с начала, не отличить от правильного. Новый горячий запрос
+регистрируется здесь же.
+"""
+from decimal import Decimal
+
+from catalog.facets import BrowseFilters, facet_queryset
+from catalog.models import Category, CategorySummary, Product
+from catalog.pagination import BACKWARD, FORWARD, PAGE_SIZE, encode_cursor, keyset_queryset
+
+HOT_QUERIES = {}
+
+
+def hot_query(name, allow=None, index_cond=()):
+    """
+    Регистрирует запрос. ``allow`` — {СУБД: находки}, которые для этого
+    запроса ожидаемы (например, сортировка маленькой таблицы).
+    ``index_cond`` — столбцы, которые должны ограничивать диапазон чтения
+    индекса (Index Cond в PostgreSQL, ``SEARCH ... (столбец>?)`` в SQLite).
+    """
+    def decorator(func):
+        HOT_QUERIES[name] = (func, allow or {}, tuple(index_cond))
+        return func
+    return decorator
+
+
+class _Row:
+    """Строка-образец для курсора: реальные значения не важны для плана."""
+    name = 'м'
+    pk = 1
+
+
+def _category_id():
+    return Category.objects.order_by('pk').values_list('pk', flat=True).first() or 1
+
+
+def _deep_cursor(queryset, direction=FORWARD):
+    """
+    Курсор последней страницы: без границы диапазона по индексу такой
+    запрос читает почти всю таблицу, а первая страница этого не покажет.
+    """
+    row = queryset.order_by('-name', '-pk').only('name')[PAGE_SIZE:PAGE_SIZE + 1].first()
+    return encode_cursor(direction, row or _Row)
+
+
+def _published():
+    return Product.objects.filter(is_published=True)
+
+
+def _in_category():
+    return Product.objects.filter(category_id=_category_id(), is_published=True)
+
+
+@hot_query('published_page')
+def published_page():
+    return keyset_queryset(_published(), None)
+
+
+@hot_query('published_page_next', index_cond=['name'])
+def published_page_next():
+    return keyset_queryset(_published(), encode_cursor(FORWARD, _Row))
+
+
+@hot_query('published_page_deep', index_cond=['name'])
+def published_page_deep():
+    return keyset_queryset(_published(), _deep_cursor(_published()))
+
+
+@hot_query('published_page_deep_back', index_cond=['name'])
+def published_page_deep_back():
+    return keyset_queryset(_published(), _deep_cursor(_published(), BACKWARD))
+
+
+@hot_query('category_by_slug', index_cond=['slug'])
+def category_by_slug():
+    return Category.objects.filter(slug='rassylki').order_by().values('id', 'name')[:1]
+
+
+@hot_query('category_by_name', allow={
+    # Старые адреса по имени; на SQLite iexact — это LIKE, индекс по UPPER(name) ему не помогает
+    'sqlite': {'scan'},
+})
+def category_by_name():
+    return Category.objects.filter(name__iexact='рассылки').order_by('pk').values_list('slug', flat=True)[:1]
+
+
+@hot_query('category_page', index_cond=['category_id'])
+def category_page():
+    return keyset_queryset(_in_category(), None)
+
+
+@hot_query('category_page_deep', index_cond=['category_id', 'name'])
+def category_page_deep():
+    return keyset_queryset(_in_category(), _deep_cursor(_in_category()))
+
+
+@hot_query('category_summaries', allow={
+    # Сводок — по одной на категорию, сортировка по имени дешёвая
+    'postgresql': {'scan', 'sort'},
+    'sqlite': {'scan', 'sort'},
+})
+def category_summaries():
+    return (
+        CategorySummary.objects.filter(published_count__gt=0)
+        .select_related('category')
+        .order_by('category__name')
+    )
+
+
+@hot_query('product_detail')
+def product_detail():
+    # QuerySet.get() сбрасывает сортировку
+    return Product.objects.filter(pk=1).order_by()
+
+
+@hot_query('product_updated_at')
+def product_updated_at():
+    # Валидатор условного GET (catalog/conditional.py)
+    return Product.objects.filter(pk=1, is_published=True).order_by().values_list('updated_at', flat=True)[:1]
+
+
+@hot_query('browse_facets', allow={
+    # Группировка по полям категории (их десятки) — сортировка маленькая,
+    # продукты читаются только из индекса product_browse_category_idx;
+    # агрегату нужен весь индекс, поэтому фильтр цены по его строкам ожидаем
+    'postgresql': {'sort', 'filter'},
+    'sqlite': {'sort'},
+})
+def browse_facets():
+    return facet_queryset(BrowseFilters(price_min=Decimal('500'), price_max=Decimal('4999.99')))
+
+
+@hot_query('browse_page', allow={
+    # Порядок страницы — по имени, а цена фильтруется по строкам индекса:
+    # узкий диапазон цен дочитывает индекс дальше, зато без сортировки
+    'postgresql': {'filter'},
+})
+def browse_page():
+    return keyset_queryset(BrowseFilters(price_min=Decimal('500')).products([_category_id()]), None)
@@ -0,0 +1,143 @@
+"""
+Компактные строки для карточек каталога.
+
+В кеш кладутся не QuerySet и не экземпляры модели, а только поля, которые
+нужны шаблонам карточек. Список строк сериализуется msgpack и, если
+установлен ``zstandard``, сжимается.
+"""
+import msgpack
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils.text import Truncator
+
+from renditions.services import get_srcsets
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard необязателен
+    zstandard = None
+
+# Меняется при любом изменении состава полей строки
+PAYLOAD_VERSION = 3
+
+# Сжимать ли payload (если установлен zstandard) и начиная с какого размера
+COMPRESS = getattr(settings, 'CATALOG_CACHE_COMPRESS', True) and zstandard is not None
+COMPRESS_MIN_SIZE = 1024
+ZSTD_LEVEL = 3
+
+# Первый байт payload: 0 — без сжатия, 1 — zstd
+_RAW, _ZSTD = b'\x00', b'\x01'
+
+_DECODE_ERRORS = (ValueError, TypeError, msgpack.UnpackException)
+if zstandard is not None:
+    _DECODE_ERRORS += (zstandard.ZstdError,)
+
+# Карточки показывают не больше 12 слов описания
+DESCRIPTION_WORDS = 12
+
+ROW_FIELDS = (
+    'pk', 'name', 'description', 'price', 'preview_url', 'preview_srcset', 'owner_id', 'views_counter', 'updated_at',
+)
+QUERY_FIELDS = ('pk', 'name', 'description', 'price', 'preview', 'image', 'owner_id', 'views_counter', 'updated_at')
+
+
+class ProductRow:
+    """
+    Строка карточки продукта. Последние слоты заполняют представления.
+    """
+
+    __slots__ = ROW_FIELDS + ('views_total', 'can_edit', 'can_delete')
+
+    def __init__(self, pk, name, description, price, preview_url, preview_srcset, owner_id, views_counter,
+                 updated_at):
+        self.pk = pk
+        self.name = name
+        self.description = description
+        self.price = price
+        self.preview_url = preview_url
+        # srcset уменьшенных копий по форматам или None, пока их нет
+        self.preview_srcset = preview_srcset
+        self.owner_id = owner_id
+        self.views_counter = views_counter
+        # Строка ISO; входит в ключ кеша HTML-карточки
+        self.updated_at = updated_at
+        self.views_total = views_counter
+        self.can_edit = False
+        self.can_delete = False
+
+    def __repr__(self):
+        return f'<ProductRow {self.pk}: {self.name}>'
+
+    def as_tuple(self):
+        return tuple(getattr(self, field) for field in ROW_FIELDS)
+
+
+def _file_url(name):
+    return default_storage.url(name) if name else ''
+
+
+def make_row(values, srcsets=None):
+    """Строка карточки из значений ``QUERY_FIELDS`` (лишние значения в конце игнорируются)."""
+    pk, name, description, price, preview, image, owner_id, views, updated_at = values[:len(QUERY_FIELDS)]
+    source = preview or image
+    return ProductRow(
+        pk,
+        name,
+        Truncator(description or '').words(DESCRIPTION_WORDS),
+        str(price),
+        _file_url(source),
+        srcsets.get(source) if srcsets else None,
+        owner_id,
+        views,
+        updated_at.isoformat() if updated_at else '',
+    )
+
+
+def make_rows(values_list):
+    """Строки карточек; копии изображений всех строк ищутся одним запросом."""
+    values_list = list(values_list)
+    srcsets = get_srcsets(values[4] or values[5] for values in values_list)
+    return [make_row(values, srcsets) for values in values_list]
+
+
+def build_rows(queryset):
+    """Выбирает из БД только поля карточек и собирает из них строки."""
+    return make_rows(queryset.values_list(*QUERY_FIELDS))
+
+
+async def abuild_rows(queryset):
+    """Асинхронный ``build_rows``: выборка — через async ORM, srcset — в пуле потоков."""
+    values_list = [values async for values in queryset.values_list(*QUERY_FIELDS)]
+    return await sync_to_async(make_rows)(values_list)
+
+
+def pack_rows(rows):
+    """Сериализует строки в версионированный payload."""
+    data = msgpack.packb([PAYLOAD_VERSION, [row.as_tuple() for row in rows]], use_bin_type=True)
+    if COMPRESS and len(data) >= COMPRESS_MIN_SIZE:
+        return _ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return _RAW + data
+
+
+def unpack_rows(payload):
+    """
+    Восстанавливает строки из payload. Возвращает None, если payload
+    другой версии или не читается — вызывающий код считает это промахом.
+    """
+    if not isinstance(payload, bytes) or not payload:
+        return None
+    flag, data = payload[:1], payload[1:]
+    try:
+        if flag == _ZSTD:
+            if zstandard is None:
+                return None
+            data = zstandard.ZstdDecompressor().decompress(data)
+        elif flag != _RAW:
+            return None
+        version, tuples = msgpack.unpackb(data, raw=False, use_list=False)
+    except _DECODE_ERRORS:
+        return None
+    if version != PAYLOAD_VERSION:
+        return None
+    return [ProductRow(*values) for values in tuples]
@@ -1,56 +1,284 @@
 # catalog/management/commands/add_test_products.py
-from django.core.management.base import BaseCommand
-from catalog.models import Category, Product
+import csv
+import io
+import itertools
+import math
 import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from blog.models import BlogPost
+from blog.services import GENERATION_KEY as BLOG_GENERATION_KEY
+from catalog.caching import invalidate_catalog
+from catalog.models import Category, CategorySummary, Product
+from catalog.search import rebuild_index
+from catalog.slugs import make_slug
+from config.generations import bump_generation
+from users.models import User
+
+# Словарь для названий и описаний
+ADJECTIVES = [
+    'Быстрый', 'Умный', 'Надёжный', 'Простой', 'Облачный', 'Гибкий', 'Лёгкий', 'Мощный',
+    'Точный', 'Удобный', 'Безопасный', 'Компактный', 'Открытый', 'Личный', 'Командный',
+]
+NOUNS = [
+    'бот', 'парсер', 'логгер', 'планировщик', 'конвертер', 'мониторинг', 'каталог', 'трекер',
+    'агрегатор', 'генератор', 'помощник', 'сканер', 'архиватор', 'редактор', 'шаблон',
+]
+TOPICS = [
+    'заказов', 'новостей', 'рассылок', 'отчётов', 'платежей', 'задач', 'файлов', 'клиентов',
+    'расписаний', 'уведомлений', 'документов', 'логов', 'курсов валют', 'опросов', 'складов',
+]
+WORDS = (
+    'автоматизация интеграция сервис данные отчёт поддержка настройка сервер клиент запрос '
+    'обновление уведомление аналитика шаблон пользователь доступ API модуль процесс скорость '
+    'надёжность удобство лицензия установка документация команда проект задача результат'
+).split()
+CATEGORY_ROOTS = [
+    'Рассылки', 'Телеграм боты', 'Полезные утилиты', 'Веб-приложения', 'Микросервисы',
+    'Парсеры', 'Интеграции', 'Аналитика', 'Безопасность', 'Мониторинг',
+]
+
+PLACEHOLDER_COLORS = ['#4e79a7', '#f28e2b', '#e15759', '#76b7b2', '#59a14f', '#edc948', '#b07aa1']
 
 
 class Command(BaseCommand):
-    help = 'Добавляет тестовые категории и продукты в базу данных'
-
-    def handle(self, *args, **kwargs):
-        # Очистка всех данных перед добавлением новых
-        Product.objects.all().delete()
-        Category.objects.all().delete()
-
-        self.stdout.write("✅ Все данные удалены из базы.")
-
-        # Создание тестовых категорий
-        categories = [
-            {"name": "Рассылки", "description": "Автоматические рассылки"},
-            {"name": "Телеграм боты", "description": "Боты для Telegram"},
-            {"name": "Полезные утилиты", "description": "Различные полезные инструменты"},
-        ]
-
-        created_categories = []
-        for cat in categories:
-            category = Category.objects.create(**cat)
-            created_categories.append(category)
-
-        self.stdout.write(f"➕ Добавлено {len(created_categories)} категорий.")
-
-        # Создание тестовых продуктов
-        products_data = [
-            {
-                "name": "Рассылка новостей",
-                "description": "Ежедневная рассылка новостей",
-                "price": round(random.uniform(50, 300), 2),
-                "category": created_categories[0],
-            },
-            {
-                "name": "Telegram-бот заказов",
-                "description": "Бот для автоматизации заказов",
-                "price": round(random.uniform(50, 300), 2),
-                "category": created_categories[1],
-            },
-            {
-                "name": "Логгер активности",
-                "description": "Утилита для логирования действий пользователей",
-                "price": round(random.uniform(50, 300), 2),
-                "category": created_categories[2],
-            },
-        ]
-
-        for prod in products_data:
-            Product.objects.create(**prod)
-
-        self.stdout.write(f"➕ Добавлено {len(products_data)} продуктов.")
\ No newline at end of file
+    help = ('Генерирует синтетические данные для нагрузочного тестирования: пользователей, '
+            'категории, продукты и статьи блога с реалистичными распределениями')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000, help='Сколько продуктов создать')
+        parser.add_argument('--categories', type=int, default=20, help='Сколько категорий создать')
+        parser.add_argument('--users', type=int, default=50, help='Сколько владельцев продуктов создать')
+        parser.add_argument('--posts', type=int, default=100, help='Сколько статей блога создать')
+        parser.add_argument('--images', type=int, default=0,
+                            help='Сколько картинок-заглушек создать и раздать продуктам (0 — без картинок)')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора: одинаковое зерно — одинаковые данные')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Сколько строк вставлять за раз')
+        parser.add_argument('--clear', action='store_true',
+                            help='Удалить существующие продукты, категории, статьи и созданных ранее пользователей')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        self.use_copy = connection.vendor == 'postgresql'
+        started = time.monotonic()
+
+        if options['clear']:
+            self._clear()
+        elif User.objects.filter(email__startswith=self._email_prefix()).exists():
+            raise CommandError(
+                f"Данные с зерном {self.seed} уже есть. Запустите с --clear или с другим --seed."
+            )
+
+        owner_ids = self._create_users(options['users'])
+        category_ids = self._create_categories(options['categories'])
+        images = self._create_images(options['images'])
+        self._create_products(options['products'], category_ids, owner_ids, images)
+        self._create_posts(options['posts'])
+
+        # Массовая вставка идёт мимо сигналов и ProductQuerySet: производные
+        # данные строятся один раз в конце, а не на каждый пакет
+        self._step('Поисковый индекс', rebuild_index)
+        self._step('Сводки категорий', CategorySummary.rebuild)
+        invalidate_catalog(category_ids)
+        bump_generation(BLOG_GENERATION_KEY)
+        if images:
+            from renditions.services import enqueue
+
+            enqueue(images)
+        self.stdout.write(f"✅ Готово за {time.monotonic() - started:.1f} с.")
+
+    # --- Вспомогательное ---------------------------------------------------
+
+    def _email_prefix(self):
+        return f'loadtest-{self.seed}-'
+
+    def _step(self, title, func):
+        started = time.monotonic()
+        func()
+        self.stdout.write(f"➕ {title}: {time.monotonic() - started:.1f} с.")
+
+    def _progress(self, title, done, total, started):
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0
+        eta = (total - done) / rate if rate else 0
+        self.stdout.write(f"   {title}: {done}/{total} ({rate:,.0f} строк/с, осталось ~{eta:.0f} с)")
+
+    def _zipf_weights(self, count, exponent=1.1):
+        """
+        Накопленные веса «длинного хвоста»: несколько крупных категорий/продавцов
+        и много мелких. Накопленные — чтобы ``choices`` искал делением пополам.
+        """
+        weights = [1 / (rank ** exponent) for rank in range(1, count + 1)]
+        self.rng.shuffle(weights)
+        return list(itertools.accumulate(weights))
+
+    def _sentence(self, low, high):
+        length = max(low, min(high, int(self.rng.lognormvariate(math.log((low + high) / 2), 0.5))))
+        return ' '.join(self.rng.choices(WORDS, k=length)).capitalize() + '.'
+
+    def _clear(self):
+        with transaction.atomic():
+            # Одним DELETE: удаление через ORM загрузило бы каждый продукт ради сигналов
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(Product._meta.db_table)}')
+            Category.objects.all().delete()
+            BlogPost.objects.all().delete()
+            User.objects.filter(email__startswith='loadtest-').delete()
+        self.stdout.write("✅ Прежние данные удалены.")
+
+    def _insert(self, title, model, objects, total, columns=None):
+        """
+        Вставляет объекты пакетами. На PostgreSQL — через COPY (``columns``
+        задают порядок колонок), на остальных СУБД — через ``bulk_create``
+        обычного QuerySet, минуя массовые хуки ``ProductQuerySet``.
+        """
+        started = time.monotonic()
+        done = 0
+        batch = []
+        report_every = max(self.batch_size, total // 20)
+        next_report = report_every
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                self._flush(model, batch, columns)
+                done += len(batch)
+                batch = []
+                if done >= next_report:
+                    self._progress(title, done, total, started)
+                    next_report += report_every
+        if batch:
+            self._flush(model, batch, columns)
+            done += len(batch)
+            self._progress(title, done, total, started)
+
+    def _flush(self, model, batch, columns):
+        with transaction.atomic():
+            if self.use_copy and columns:
+                self._copy(model, batch, columns)
+            else:
+                models.QuerySet(model).bulk_create(batch, batch_size=self.batch_size)
+
+    def _copy(self, model, batch, columns):
+        buffer = io.StringIO()
+        # Все значения в кавычках: пустая строка без кавычек в CSV означает NULL
+        writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+        for obj in batch:
+            writer.writerow([getattr(obj, column) for column in columns])
+        buffer.seek(0)
+        sql = (
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+            f'({", ".join(connection.ops.quote_name(c) for c in columns)}) FROM STDIN WITH (FORMAT csv)'
+        )
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                raw.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    # --- Данные ------------------------------------------------------------
+
+    def _create_users(self, count):
+        # Хешировать пароль для каждого пользователя слишком долго — хеш один на всех
+        password = make_password('loadtest')
+        prefix = self._email_prefix()
+        users = (
+            User(email=f'{prefix}{i}@example.com', password=password, is_active=True)
+            for i in range(count)
+        )
+        self._insert('Пользователи', User, users, count)
+        return list(User.objects.filter(email__startswith=prefix).values_list('pk', flat=True))
+
+    def _create_categories(self, count):
+        slugs = []
+
+        def categories():
+            for i in range(count):
+                name = f'{CATEGORY_ROOTS[i % len(CATEGORY_ROOTS)]} {i // len(CATEGORY_ROOTS) + 1}'
+                # bulk_create не вызывает save(), слаг задаётся здесь; зерно — чтобы не пересечься с чужими
+                slugs.append(f'{make_slug(name)}-{self.seed}')
+                yield Category(name=name, slug=slugs[-1], description=self._sentence(4, 12))
+
+        self._insert('Категории', Category, categories(), count)
+        # Созданные категории находим по их слагам, как пользователей — по префиксу почты
+        return list(Category.objects.filter(slug__in=slugs).order_by('pk').values_list('pk', flat=True))
+
+    def _create_images(self, count):
+        if not count:
+            return []
+        from PIL import Image, ImageDraw
+
+        names = []
+        for i in range(count):
+            image = Image.new('RGB', (1200, 900), PLACEHOLDER_COLORS[i % len(PLACEHOLDER_COLORS)])
+            ImageDraw.Draw(image).text((40, 40), f'#{i}', fill='white')
+            buffer = io.BytesIO()
+            image.save(buffer, format='JPEG', quality=80)
+            name = f'catalog/previews/loadtest_{self.seed}_{i}.jpg'
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            names.append(default_storage.save(name, ContentFile(buffer.getvalue())))
+        self.stdout.write(f"➕ Картинок-заглушек: {len(names)}")
+        return names
+
+    def _create_products(self, count, category_ids, owner_ids, images):
+        if not count:
+            return
+        if not category_ids or not owner_ids:
+            raise CommandError('Для продуктов нужны хотя бы одна категория и один пользователь.')
+        rng = self.rng
+        category_weights = self._zipf_weights(len(category_ids))
+        owner_weights = self._zipf_weights(len(owner_ids))
+        now = timezone.now()
+
+        def products():
+            for i in range(count):
+                created_at = now - timedelta(seconds=rng.randint(0, 2 * 365 * 24 * 3600))
+                yield Product(
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(TOPICS)} №{i}',
+                    description=self._sentence(8, 80),
+                    preview=rng.choice(images) if images and rng.random() < 0.7 else '',
+                    category_id=rng.choices(category_ids, cum_weights=category_weights)[0],
+                    # Цены логнормальные: в основном сотни рублей, изредка десятки тысяч
+                    price=Decimal(min(rng.lognormvariate(6.5, 1.0), 99_999_999)).quantize(Decimal('0.01')),
+                    created_at=created_at,
+                    updated_at=created_at,
+                    # Просмотры — распределение Парето: у немногих продуктов почти все просмотры
+                    views_counter=int(rng.paretovariate(1.2)) - 1,
+                    is_published=rng.random() < 0.9,
+                    owner_id=rng.choices(owner_ids, cum_weights=owner_weights)[0],
+                )
+
+        self._insert('Продукты', Product, products(), count, columns=[
+            'name', 'description', 'preview', 'image', 'category_id', 'price', 'created_at',
+            'updated_at', 'views_counter', 'is_published', 'owner_id',
+        ])
+
+    def _create_posts(self, count):
+        rng = self.rng
+
+        def posts():
+            for i in range(count):
+                post = BlogPost(
+                    title=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}: заметка №{i}',
+                    content='\n\n'.join(self._sentence(20, 120) for _ in range(rng.randint(2, 8))),
+                    is_published=rng.random() < 0.85,
+                    views_count=int(rng.paretovariate(1.2)) - 1,
+                )
+                # bulk_create не вызывает save() — анонс считаем сами
+                post.refresh_summary()
+                yield post
+
+        self._insert('Статьи блога', BlogPost, posts(), count)
@@ -0,0 +1,53 @@
+# catalog/management/commands/bench_banned_words.py
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.moderation import BANNED_WORDS, BannedWordMatcher
+
+# Слова для «чистого» текста описания
+FILLER_WORDS = [
+    'удобный', 'сервис', 'рассылок', 'бот', 'для', 'автоматизации', 'заказов',
+    'утилита', 'логирования', 'действий', 'пользователей', 'поддержка', 'установка',
+    'сервер', 'обновления', 'лицензия', 'интеграция', 'отчёты', 'настройка', 'каталог',
+]
+
+
+def loop_contains(text, words):
+    """Прежняя проверка из ProductForm: подстрока для каждого слова."""
+    text_lower = text.lower()
+    return any(word in text_lower for word in words)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость проверки запрещённых слов: цикл по списку против скомпилированного matcher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--text-words', type=int, default=20000,
+                            help='Длина описания в словах')
+        parser.add_argument('--extra-banned', type=int, default=500,
+                            help='Сколько синтетических слов добавить к списку')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _measure(self, func, text, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func(text)
+        return (time.perf_counter() - started) / repeat * 1000
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        # Худший случай: запрещённых слов в тексте нет, проверяется весь текст
+        text = ' '.join(rng.choice(FILLER_WORDS) for _ in range(options['text_words']))
+        synthetic = [f'запрет{i}слово' for i in range(options['extra_banned'])]
+
+        self.stdout.write(f"Описание: {len(text)} символов, повторов: {options['repeat']}")
+        self.stdout.write(f"{'Слов в списке':<16}{'Цикл, мс':>12}{'Matcher, мс':>14}{'Сборка, мс':>14}")
+        for words in (BANNED_WORDS, BANNED_WORDS + synthetic):
+            started = time.perf_counter()
+            matcher = BannedWordMatcher(words)
+            build = (time.perf_counter() - started) * 1000
+            loop = self._measure(lambda t: loop_contains(t, words), text, options['repeat'])
+            compiled = self._measure(matcher.contains, text, options['repeat'])
+            self.stdout.write(f"{len(words):<16}{loop:>12.3f}{compiled:>14.3f}{build:>14.3f}")
@@ -0,0 +1,91 @@
+# catalog/management/commands/bench_catalog_cache.py
+import pickle
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog import listing
+from catalog.models import Category, Product
+from users.models import User
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает размер и скорость чтения кеша каталога: '
+            'pickle QuerySet против компактных строк msgpack/zstd')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000,
+                            help='Сколько временных продуктов создать (0 — взять существующие)')
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Сколько раз повторять десериализацию')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['count']:
+                    self._create_products(options['count'])
+                self._run(options['repeat'])
+                # Временные данные не должны остаться в базе
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _create_products(self, count):
+        owner = User.objects.create_user(email='bench-cache@example.com', password=None)
+        category = Category.objects.create(name='Бенчмарк кеша')
+        description = 'Подробное описание продукта для проверки размера записи в кеше. ' * 5
+        Product.objects.bulk_create(
+            Product(
+                name=f'Продукт {i}',
+                description=description,
+                price=Decimal(i % 1000) + Decimal('0.99'),
+                preview=f'catalog/previews/product_{i}.png',
+                category=category,
+                owner=owner,
+                is_published=True,
+            )
+            for i in range(count)
+        )
+
+    def _time_loads(self, loads, payload, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            # Перебираем результат, как это делает шаблон
+            for _item in loads(payload):
+                pass
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000
+
+    def _run(self, repeat):
+        queryset = Product.objects.filter(is_published=True)
+        # Так кеш работал раньше: cache.set() pickle-ит вычисленный QuerySet
+        pickled = pickle.dumps(queryset.all(), pickle.HIGHEST_PROTOCOL)
+        rows = listing.build_rows(queryset)
+        raw = listing._RAW + listing.msgpack.packb(
+            [listing.PAYLOAD_VERSION, [row.as_tuple() for row in rows]], use_bin_type=True
+        )
+
+        results = [
+            ('pickle QuerySet', len(pickled), self._time_loads(pickle.loads, pickled, repeat)),
+            ('msgpack строки', len(raw), self._time_loads(listing.unpack_rows, raw, repeat)),
+        ]
+        if listing.zstandard is not None:
+            compressed = listing._ZSTD + listing.zstandard.ZstdCompressor(
+                level=listing.ZSTD_LEVEL
+            ).compress(raw[1:])
+            results.append(
+                ('msgpack + zstd', len(compressed), self._time_loads(listing.unpack_rows, compressed, repeat))
+            )
+
+        self.stdout.write(f"Продуктов: {len(rows)}, повторов: {repeat}")
+        self.stdout.write(f"{'Формат':<18}{'Размер, байт':>14}{'Чтение, мс':>14}")
+        for name, size, millis in results:
+            self.stdout.write(f"{name:<18}{size:>14}{millis:>14.3f}")
@@ -0,0 +1,90 @@
+# catalog/management/commands/bench_product_cards.py
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import get_template
+from django.test import RequestFactory
+
+from catalog import fragments
+from catalog.listing import build_rows
+from catalog.models import Category, Product
+from users.models import User
+
+CARD_TEMPLATE = 'catalog/includes/inc_product_card.html'
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает рендер страницы карточек целиком и сборку из кеша фрагментов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000,
+                            help='Сколько временных продуктов создать')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Сколько раз повторять рендер')
+        parser.add_argument('--changed', type=int, default=10,
+                            help='Сколько карточек «изменить» перед последним замером')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['count'], options['repeat'], options['changed'])
+                # Временные данные не должны остаться в базе
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000
+
+    def _run(self, count, repeat, changed):
+        owner = User.objects.create_user(email='bench-cards@example.com', password=None)
+        category = Category.objects.create(name='Бенчмарк карточек')
+        Product.objects.bulk_create(
+            Product(name=f'Продукт {i}', description='Описание продукта ' * 10,
+                    price=Decimal('9.99'), category=category, owner=owner, is_published=True)
+            for i in range(count)
+        )
+        rows = build_rows(Product.objects.filter(category=category).order_by('pk'))
+        for row in rows:
+            row.can_edit = row.can_delete = row.owner_id == owner.pk
+        request = RequestFactory().get('/')
+        template = get_template(CARD_TEMPLATE)
+
+        def render_all():
+            return ''.join(template.render({'product': row}, request) for row in rows)
+
+        def render_cached():
+            return fragments.render_cards(request, rows, CARD_TEMPLATE)
+
+        full = self._time(render_all, repeat)
+        cache.delete_many([fragments.fragment_key(CARD_TEMPLATE, row) for row in rows])
+        cold = self._time(render_cached, 1)
+        request.card_cache_stats = None
+        warm = self._time(render_cached, repeat)
+        warm_stats = request.card_cache_stats
+
+        for row in rows[:changed]:
+            row.updated_at += '-changed'
+        request.card_cache_stats = None
+        partial = self._time(render_cached, 1)
+        partial_stats = request.card_cache_stats
+
+        self.stdout.write(f"Карточек: {len(rows)}, повторов: {repeat}")
+        self.stdout.write(f"{'Вариант':<32}{'Время, мс':>12}")
+        self.stdout.write(f"{'Рендер всех карточек':<32}{full:>12.2f}")
+        self.stdout.write(f"{'Кеш фрагментов, холодный':<32}{cold:>12.2f}")
+        self.stdout.write(f"{'Кеш фрагментов, тёплый':<32}{warm:>12.2f}  {warm_stats}")
+        self.stdout.write(f"{f'Изменено {changed} карточек':<32}{partial:>12.2f}  {partial_stats}")
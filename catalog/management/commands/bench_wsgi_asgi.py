@@ -0,0 +1,179 @@
+# catalog/management/commands/bench_wsgi_asgi.py
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.models import Category, Product
+
+MODES = ('wsgi', 'asgi')
+
+
+def _default_urls():
+    product = Product.objects.filter(is_published=True).order_by('pk').values_list('pk', flat=True).first()
+    category = Category.objects.exclude(slug='').order_by('pk').values_list('slug', flat=True).first()
+    if product is None or category is None:
+        raise CommandError('Нет опубликованных продуктов — сначала выполните add_test_products.')
+    return ['/', f'/product/{product}/', f'/category/{category}/']
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность (запросов/с) и p99 страниц каталога под WSGI '
+            '(синхронные представления, пул потоков) и ASGI (асинхронные представления, цикл событий) '
+            'при высокой конкурентности')
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*',
+                            help='Адреса для обхода (по умолчанию список, продукт и категория)')
+        parser.add_argument('--concurrency', type=int, default=100,
+                            help='Сколько запросов выполняется одновременно')
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Сколько запросов выполнить на каждый адрес')
+        parser.add_argument('--warmup', type=int, default=50,
+                            help='Сколько запросов на адрес выполнить до замера (прогрев кеша)')
+        parser.add_argument('--mode', choices=MODES,
+                            help='Замерить только один вариант в этом процессе и вывести JSON')
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or _default_urls()
+        if options['mode']:
+            results = self._run_mode(options['mode'], urls, options)
+            self.stdout.write(json.dumps(results))
+            return
+
+        # Набор представлений выбирается при импорте urls.py — каждый вариант в своём процессе
+        results = {mode: self._spawn(mode, urls, options) for mode in MODES}
+        self.stdout.write(
+            f"Конкурентность: {options['concurrency']}, запросов на адрес: {options['requests']}"
+        )
+        self.stdout.write(f"{'Адрес':<32}{'Вариант':<8}{'Запросов/с':>12}{'p50, мс':>10}{'p99, мс':>10}{'Ошибок':>8}")
+        for url in urls:
+            for mode in MODES:
+                row = results[mode][url]
+                self.stdout.write(
+                    f"{url[:31]:<32}{mode:<8}{row['rps']:>12.1f}{row['p50']:>10.2f}{row['p99']:>10.2f}{row['errors']:>8}"
+                )
+
+    def _spawn(self, mode, urls, options):
+        env = {**os.environ, 'CATALOG_ASYNC_VIEWS': '1' if mode == 'asgi' else '0'}
+        command = [
+            sys.executable, sys.argv[0], 'bench_wsgi_asgi', *urls, '--mode', mode,
+            '--concurrency', str(options['concurrency']),
+            '--requests', str(options['requests']),
+            '--warmup', str(options['warmup']),
+        ]
+        if options.get('settings'):
+            command += ['--settings', options['settings']]
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            raise CommandError(f'{mode}: {completed.stderr.strip()}')
+        # Последняя строка — JSON; до неё могут быть строки логов
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def _run_mode(self, mode, urls, options):
+        from django.conf import settings
+
+        if settings.CATALOG_ASYNC_VIEWS != (mode == 'asgi'):
+            raise CommandError(f'{mode}: CATALOG_ASYNC_VIEWS должен быть {"1" if mode == "asgi" else "0"}')
+        run = self._run_wsgi if mode == 'wsgi' else self._run_asgi
+        results = {}
+        for url in urls:
+            run(url, options['warmup'], options['concurrency'])
+            started = time.perf_counter()
+            latencies, errors = run(url, options['requests'], options['concurrency'])
+            elapsed = time.perf_counter() - started
+            latencies.sort()
+            results[url] = {
+                'rps': len(latencies) / elapsed,
+                'p50': statistics.median(latencies) * 1000,
+                'p99': latencies[int(len(latencies) * 0.99) - 1 if len(latencies) > 1 else 0] * 1000,
+                'errors': errors,
+            }
+        return results
+
+    # --- WSGI: обработчик Django в пуле потоков, как у многопоточного сервера ---
+
+    def _run_wsgi(self, url, count, concurrency):
+        from django.core.handlers.wsgi import WSGIHandler
+
+        handler = WSGIHandler()
+        path, query = self._split(url)
+
+        def one(_):
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                # WSGI передаёт путь в latin-1
+                'PATH_INFO': path.encode().decode('iso-8859-1'),
+                'QUERY_STRING': query,
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'REMOTE_ADDR': '127.0.0.1',
+                'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+                'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            status = []
+            started = time.perf_counter()
+            response = handler(environ, lambda code, headers, exc_info=None: status.append(code))
+            try:
+                b''.join(response)
+            finally:
+                # Сигнал request_finished закрывает соединение с БД потока
+                response.close()
+            return time.perf_counter() - started, not status[0].startswith(('2', '3'))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(count)))
+        return [latency for latency, _ in results], sum(error for _, error in results)
+
+    # --- ASGI: обработчик Django в цикле событий, как у uvicorn ---
+
+    def _run_asgi(self, url, count, concurrency):
+        from django.core.handlers.asgi import ASGIHandler
+
+        handler = ASGIHandler()
+        path, query = self._split(url)
+
+        async def one(semaphore):
+            async with semaphore:
+                scope = {
+                    'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                    'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': quote(path).encode(),
+                    'query_string': query.encode(), 'headers': [(b'host', b'testserver')],
+                    'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+                }
+                body_sent = asyncio.Event()
+                status = []
+
+                async def receive():
+                    if body_sent.is_set():
+                        # Клиент не отключается: ждём, пока обработчик не отменит ожидание
+                        await asyncio.Event().wait()
+                    body_sent.set()
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        status.append(message['status'])
+
+                started = time.perf_counter()
+                await handler(scope, receive, send)
+                return time.perf_counter() - started, not 200 <= status[0] < 400
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(one(semaphore) for _ in range(count)))
+
+        results = asyncio.run(main())
+        return [latency for latency, _ in results], sum(error for _, error in results)
+
+    def _split(self, url):
+        parts = urlsplit(url)
+        return parts.path, parts.query
@@ -0,0 +1,151 @@
+# catalog/management/commands/explain_hot_queries.py
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from catalog.hot_queries import HOT_QUERIES
+
+# Признаки в планах: последовательное сканирование и сортировка
+PATTERNS = {
+    'postgresql': {
+        'scan': re.compile(r'Seq Scan on (\w+)'),
+        'sort': re.compile(r'(?:^|->\s*)((?:Incremental )?Sort)\b', re.MULTILINE),
+    },
+    'sqlite': {
+        'scan': re.compile(r'\bSCAN (\w+)\b(?! USING (?:COVERING )?INDEX)'),
+        'sort': re.compile(r'USE TEMP B-TREE FOR ([\w ]+)'),
+    },
+}
+
+# PostgreSQL: узел чтения индекса и строки его подробностей
+PG_INDEX_NODE = re.compile(r'(?:^|->\s*)(Index (?:Only )?Scan(?: Backward)?) using (\w+)')
+PG_NODE = re.compile(r'^\s*(?:->\s*)?[A-Z][\w ]*\(')
+PG_ROWS_REMOVED = re.compile(r'Rows Removed by Filter: (\d+)')
+# SQLite: поиск по индексу с условием — «SEARCH t USING INDEX i (name>?)»
+SQLITE_SEARCH = re.compile(r'\bSEARCH \w+ USING (?:COVERING )?INDEX \w+ \(([^)]*)\)')
+
+# Сколько строк узел чтения индекса может отбросить фильтром (EXPLAIN ANALYZE)
+MAX_ROWS_REMOVED = 100
+
+LABELS = {
+    'scan': 'последовательное сканирование',
+    'sort': 'сортировка',
+    'filter': 'индекс читается без границы, строки отбрасываются фильтром',
+    'index_cond': 'нет условия индекса по',
+}
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для горячих запросов каталога (catalog/hot_queries.py) и сообщает '
+            'о последовательных сканированиях, сортировках и чтении индекса без границы диапазона')
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help='Имена запросов (по умолчанию все)')
+        parser.add_argument('--analyze', action='store_true',
+                            help='EXPLAIN ANALYZE: выполнить запросы, показать фактическое время и '
+                                 'проверить, сколько строк отброшено фильтром')
+        parser.add_argument('--max-rows-removed', type=int, default=MAX_ROWS_REMOVED,
+                            help='PostgreSQL, --analyze: сколько строк узел чтения индекса '
+                                 f'может отбросить фильтром (по умолчанию {MAX_ROWS_REMOVED})')
+
+    def handle(self, *args, **options):
+        names = options['queries'] or list(HOT_QUERIES)
+        unknown = set(names) - set(HOT_QUERIES)
+        if unknown:
+            raise CommandError(f"Неизвестные запросы: {', '.join(sorted(unknown))}")
+
+        vendor = connection.vendor
+        patterns = PATTERNS.get(vendor)
+        if patterns is None:
+            self.stdout.write(f"⚠️ Для {vendor} планы только выводятся, без проверки.")
+
+        problems = 0
+        for name in names:
+            func, allow, index_cond = HOT_QUERIES[name]
+            plan = self._explain(func(), options)
+            findings = [] if patterns is None else self._findings(
+                plan, vendor, allow.get(vendor, set()), index_cond, options['max_rows_removed'],
+            )
+            if findings:
+                problems += 1
+                self.stdout.write(f"❌ {name}: {'; '.join(findings)}")
+            else:
+                self.stdout.write(f"✅ {name}")
+            if findings or options['verbosity'] > 1 or patterns is None:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if problems:
+            raise CommandError(
+                f"Запросов с неудачным планом: {problems}. "
+                f"Добавьте индекс или разрешите находку в hot_queries.py."
+            )
+
+    def _explain(self, queryset, options):
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        with transaction.atomic():
+            plan = queryset.explain(**explain_options)
+            # ANALYZE выполняет запрос — изменения (если они есть) не сохраняем
+            transaction.set_rollback(True)
+        return plan
+
+    def _findings(self, plan, vendor, allowed, index_cond, max_rows_removed):
+        findings = []
+        for kind, pattern in PATTERNS[vendor].items():
+            if kind in allowed:
+                continue
+            for match in pattern.finditer(plan):
+                findings.append(f"{LABELS[kind]} ({match.group(1).strip()})")
+
+        if vendor == 'postgresql':
+            nodes = self._pg_index_nodes(plan)
+            conditions = ' '.join(cond for node in nodes for cond in node['index_cond'])
+            if 'filter' not in allowed:
+                findings += self._pg_filter_findings(nodes, max_rows_removed)
+        else:
+            conditions = ' '.join(SQLITE_SEARCH.findall(plan))
+        if 'index_cond' not in allowed:
+            # Ведущий столбец должен ограничивать диапазон индекса: иначе
+            # дальняя страница читает индекс с начала
+            missing = [column for column in index_cond if not re.search(rf'\b{column}\b', conditions)]
+            if missing:
+                findings.append(f"{LABELS['index_cond']} {', '.join(missing)}")
+        return findings
+
+    def _pg_index_nodes(self, plan):
+        """Узлы Index Scan / Index Only Scan с их Index Cond, Filter и Rows Removed by Filter."""
+        nodes = []
+        current = None
+        for line in plan.splitlines():
+            match = PG_INDEX_NODE.search(line)
+            if match:
+                current = {'node': match.group(1), 'index': match.group(2),
+                           'index_cond': [], 'filter': [], 'rows_removed': 0}
+                nodes.append(current)
+                continue
+            if PG_NODE.match(line):
+                current = None
+                continue
+            if current is None:
+                continue
+            detail = line.strip()
+            if detail.startswith('Index Cond:'):
+                current['index_cond'].append(detail)
+            elif detail.startswith('Filter:'):
+                current['filter'].append(detail)
+            removed = PG_ROWS_REMOVED.search(detail)
+            if removed:
+                current['rows_removed'] += int(removed.group(1))
+        return nodes
+
+    def _pg_filter_findings(self, nodes, max_rows_removed):
+        findings = []
+        for node in nodes:
+            if node['filter'] and not node['index_cond']:
+                findings.append(f"{LABELS['filter']} ({node['node']} {node['index']})")
+            elif node['rows_removed'] > max_rows_removed:
+                findings.append(
+                    f"{LABELS['filter']} ({node['node']} {node['index']}: "
+                    f"отброшено {node['rows_removed']} строк)"
+                )
+        return findings
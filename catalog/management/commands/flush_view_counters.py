@@ -0,0 +1,24 @@
+# catalog/management/commands/flush_view_counters.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.counters import flush_views
+
+
+class Command(BaseCommand):
+    help = 'Переносит накопленные в кеше просмотры продуктов в базу данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Сколько продуктов обновлять одним запросом')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Повторять сброс каждые N секунд (0 — один раз)')
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = flush_views(batch_size=options['batch_size'])
+            self.stdout.write(f"✅ Записано просмотров: {flushed}")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,14 @@
+# catalog/management/commands/rebuild_category_summaries.py
+from django.core.management.base import BaseCommand
+
+from catalog.caching import invalidate_catalog
+from catalog.models import CategorySummary
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводки категорий (количество, цены, дата изменения) с нуля'
+
+    def handle(self, *args, **options):
+        filled = CategorySummary.rebuild()
+        invalidate_catalog()
+        self.stdout.write(f"✅ Сводки пересчитаны, категорий с опубликованными продуктами: {filled}")
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def fill_summaries(apps, schema_editor):
+    Category = apps.get_model("catalog", "Category")
+    Product = apps.get_model("catalog", "Product")
+    CategorySummary = apps.get_model("catalog", "CategorySummary")
+    stats = {
+        row.pop("category_id"): row
+        for row in Product.objects.filter(is_published=True, category__isnull=False)
+        .order_by()
+        .values("category_id")
+        .annotate(
+            published_count=Count("pk"),
+            min_price=Min("price"),
+            max_price=Max("price"),
+            last_updated=Max("updated_at"),
+        )
+    }
+    CategorySummary.objects.bulk_create(
+        CategorySummary(category_id=pk, **stats.get(pk, {}))
+        for pk in Category.objects.values_list("pk", flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0006_product_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategorySummary",
+            fields=[
+                (
+                    "category",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="catalog.category",
+                        verbose_name="Категория",
+                    ),
+                ),
+                (
+                    "published_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Опубликовано продуктов"
+                    ),
+                ),
+                (
+                    "min_price",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=10,
+                        null=True,
+                        verbose_name="Минимальная цена",
+                    ),
+                ),
+                (
+                    "max_price",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=10,
+                        null=True,
+                        verbose_name="Максимальная цена",
+                    ),
+                ),
+                (
+                    "last_updated",
+                    models.DateTimeField(
+                        blank=True,
+                        null=True,
+                        verbose_name="Последнее изменение продуктов",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сводка по категории",
+                "verbose_name_plural": "Сводки по категориям",
+            },
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
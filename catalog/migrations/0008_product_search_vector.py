@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:14
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# GIN-индекс нужен только на PostgreSQL, FTS5-таблица — только на SQLite,
+# поэтому они создаются здесь, а не через Meta.indexes.
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "UPDATE catalog_product SET search_vector = "
+            "setweight(to_tsvector('russian', COALESCE(name, '')), 'A') || "
+            "setweight(to_tsvector('russian', COALESCE(description, '')), 'B')"
+        )
+        schema_editor.execute(
+            "CREATE INDEX product_search_vector_idx ON catalog_product USING gin (search_vector)"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS catalog_product_fts '
+            'USING fts5(name, description, tokenize="unicode61")'
+        )
+        schema_editor.execute(
+            "INSERT INTO catalog_product_fts (rowid, name, description) "
+            "SELECT id, name, COALESCE(description, '') FROM catalog_product"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS product_search_vector_idx")
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS catalog_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0007_categorysummary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
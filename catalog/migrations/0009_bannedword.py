@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0008_product_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BannedWord",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "word",
+                    models.CharField(max_length=100, unique=True, verbose_name="Слово"),
+                ),
+            ],
+            options={
+                "verbose_name": "Запрещённое слово",
+                "verbose_name_plural": "Запрещённые слова",
+                "ordering": ["word"],
+            },
+        ),
+    ]
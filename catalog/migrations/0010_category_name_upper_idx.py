@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:34
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0009_bannedword"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                django.db.models.functions.text.Upper("name"),
+                name="category_name_upper_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+from catalog.slugs import unique_slug
+
+
+def fill_slugs(apps, schema_editor):
+    Category = apps.get_model("catalog", "Category")
+    for category in Category.objects.order_by("pk"):
+        category.slug = unique_slug(Category.objects.exclude(pk=category.pk), category.name)
+        category.save(update_fields=["slug"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0010_category_name_upper_idx"),
+    ]
+
+    operations = [
+        # Сначала без уникальности: у существующих категорий слага ещё нет
+        migrations.AddField(
+            model_name="category",
+            name="slug",
+            field=models.SlugField(blank=True, max_length=120, null=True),
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="category",
+            name="slug",
+            field=models.SlugField(
+                blank=True,
+                help_text="Латиницей; если оставить пустым, будет получен из названия",
+                max_length=120,
+                unique=True,
+                verbose_name="Слаг",
+            ),
+        ),
+    ]
@@ -1,7 +1,15 @@
+from collections import defaultdict
+
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Min, Value
+from django.db.models.functions import Coalesce, Greatest, Least, Upper
 from django.utils import timezone
 
+from catalog.caching import invalidate_catalog
+from catalog.slugs import SLUG_MAX_LENGTH, unique_slug
+
 
 class Category(models.Model):
     """
@@ -9,16 +17,105 @@ class Category(models.Model):
     """
 
     name = models.CharField(max_length=100, verbose_name="Наименование")
+    # Адрес страницы категории; при переименовании не меняется, чтобы не ломать ссылки
+    slug = models.SlugField(
+        max_length=SLUG_MAX_LENGTH, unique=True, blank=True, verbose_name="Слаг",
+        help_text="Латиницей; если оставить пустым, будет получен из названия",
+    )
     description = models.TextField(blank=True, null=True, verbose_name="Описание")
 
     class Meta:
         verbose_name = "Категория"
         verbose_name_plural = "Категории"
         ordering = ["name"]  # сортировка по имени
+        indexes = [
+            # Поиск категории по имени без учёта регистра: на PostgreSQL
+            # name__iexact — это UPPER(name) = UPPER(%s)
+            models.Index(Upper("name"), name="category_name_upper_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = unique_slug(Category.objects.exclude(pk=self.pk), self.name)
+        super().save(*args, **kwargs)
+
+
+# Поля продукта, от которых зависит сводка его категории
+SUMMARY_FIELDS = ("category_id", "is_published", "price", "updated_at")
+
+
+def _summary_entry(category_id, is_published, price, updated_at):
+    """Вклад продукта в сводку: (категория, цена, дата изменения) или None, если не учитывается."""
+    if not is_published or category_id is None:
+        return None
+    return (category_id, price, updated_at)
+
+
+def _summary_rows(queryset):
+    """{pk: (категория, вклад в сводку)} для продуктов выборки."""
+    return {
+        pk: (values[0], _summary_entry(*values))
+        for pk, *values in queryset.values_list("pk", *SUMMARY_FIELDS)
+    }
+
+
+def _reindex(product_ids):
+    # Импорт здесь: catalog.search сам импортирует модели
+    from catalog.search import reindex_products
+
+    reindex_products(list(product_ids))
+
+
+class ProductQuerySet(models.QuerySet):
+    """
+    Массовые операции не вызывают post_save, поэтому кеш каталога
+    сбрасывается здесь.
+    """
+
+    # Поля, изменение которых не влияет на закешированные выборки каталога
+    CACHE_NEUTRAL_FIELDS = {"views_counter", "search_vector"}
+    # Поля, от которых зависит поисковый индекс
+    SEARCH_FIELDS = {"name", "description"}
+
+    def update(self, **kwargs):
+        if set(kwargs) <= self.CACHE_NEUTRAL_FIELDS:
+            return super().update(**kwargs)
+        before = _summary_rows(self)
+        # auto_now не срабатывает при update(), а по updated_at кешируются карточки
+        kwargs.setdefault("updated_at", timezone.now())
+        rows = super().update(**kwargs)
+        # Состояние после — по ключам: фильтр выборки мог перестать ей соответствовать
+        after = _summary_rows(self.model._base_manager.using(self.db).filter(pk__in=list(before)))
+        category_ids = {category_id for category_id, _ in before.values()}
+        category_ids |= {category_id for category_id, _ in after.values()}
+        changes = [(entry, after.get(pk, (None, None))[1]) for pk, (_, entry) in before.items()]
+        products_changed(category_ids, list(before), changes)
+        if self.SEARCH_FIELDS & set(kwargs):
+            _reindex(list(before))
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        products_changed(
+            (obj.category_id for obj in objs),
+            changes=[(None, obj.summary_entry()) for obj in objs],
+        )
+        _reindex(obj.pk for obj in objs)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        # Кеш, сводки и поисковый индекс обновляет update(), которым пишет bulk_update
+        objs = list(objs)
+        if not set(fields) <= self.CACHE_NEUTRAL_FIELDS and "updated_at" not in fields:
+            now = timezone.now()
+            for obj in objs:
+                obj.updated_at = now
+            fields = [*fields, "updated_at"]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
 
 class Product(models.Model):
     """
@@ -34,6 +131,8 @@ class Product(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата последнего изменения")
     views_counter = models.PositiveIntegerField(verbose_name="Cчетчик просмотров", help_text="Укажите количество просмотров", default=0)
     is_published = models.BooleanField(default=False, verbose_name="Опубликовано")
+    # Поисковый вектор (PostgreSQL), обновляется catalog.search
+    search_vector = SearchVectorField(null=True, editable=False)
 
     # Поле владельца
     owner = models.ForeignKey(
@@ -45,6 +144,8 @@ class Product(models.Model):
         blank=False
     )
 
+    objects = ProductQuerySet.as_manager()
+
 
     class Meta:
         verbose_name = "Продукт"
@@ -53,6 +154,221 @@ class Product(models.Model):
         permissions = [
             ("can_unpublish_product", "Может отменять публикацию продукта"),
         ]
+        indexes = [
+            # Постраничный вывод каталога: WHERE is_published ORDER BY name, id
+            models.Index(
+                fields=["name", "id"],
+                condition=models.Q(is_published=True),
+                name="product_published_page_idx",
+            ),
+            # То же внутри категории
+            models.Index(
+                fields=["category", "name", "id"],
+                condition=models.Q(is_published=True),
+                name="product_category_page_idx",
+            ),
+            # Фасеты просмотра каталога (catalog/facets.py): агрегат по категориям
+            # и ценам читает только индекс, в том числе с фильтром владельца
+            models.Index(
+                fields=["category", "price", "owner"],
+                condition=models.Q(is_published=True),
+                name="product_browse_category_idx",
+            ),
+            # То же для продуктов одного владельца
+            models.Index(
+                fields=["owner", "price", "category"],
+                condition=models.Q(is_published=True),
+                name="product_browse_owner_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем категорию, чтобы при переносе сбросить кеш и прежней
+        instance._loaded_category_id = instance.__dict__.get("category_id")
+        # и вклад в сводку категории, чтобы применить к ней разницу
+        if all(field in instance.__dict__ for field in SUMMARY_FIELDS):
+            instance._loaded_summary = instance.summary_entry()
+        return instance
+
+    def summary_entry(self):
+        """Вклад продукта в сводку категории (см. ``CategorySummary.apply``)."""
+        return _summary_entry(*(getattr(self, field) for field in SUMMARY_FIELDS))
+
+
+class CategorySummary(models.Model):
+    """
+    Денормализованная сводка по опубликованным продуктам категории.
+
+    Изменения продуктов применяются к ней разницей (см. ``products_changed``),
+    полностью пересчитывается командой ``manage.py rebuild_category_summaries``.
+    """
+
+    category = models.OneToOneField(
+        Category, on_delete=models.CASCADE, primary_key=True, related_name="summary", verbose_name="Категория"
+    )
+    published_count = models.PositiveIntegerField(default=0, verbose_name="Опубликовано продуктов")
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Минимальная цена")
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Максимальная цена")
+    last_updated = models.DateTimeField(null=True, blank=True, verbose_name="Последнее изменение продуктов")
+
+    class Meta:
+        verbose_name = "Сводка по категории"
+        verbose_name_plural = "Сводки по категориям"
+
+    def __str__(self):
+        return f"{self.category_id}: {self.published_count}"
+
+    @staticmethod
+    def _aggregate(products):
+        """Один GROUP BY по категориям: количество, цены, время изменения."""
+        rows = (
+            products.filter(is_published=True, category__isnull=False)
+            .order_by()
+            .values("category_id")
+            .annotate(
+                published_count=Count("pk"),
+                min_price=Min("price"),
+                max_price=Max("price"),
+                last_updated=Max("updated_at"),
+            )
+        )
+        return {row.pop("category_id"): row for row in rows}
+
+    @classmethod
+    def refresh(cls, category_ids):
+        """Пересчитывает сводки указанных категорий (upsert)."""
+        category_ids = {pk for pk in category_ids if pk is not None}
+        if not category_ids:
+            return
+        with transaction.atomic(savepoint=False):
+            # Сначала блокируем строки сводок: агрегат увидит продукты транзакций,
+            # которые успели применить к ним разницу
+            list(cls.objects.select_for_update().filter(pk__in=category_ids).values_list("pk", flat=True))
+            stats = cls._aggregate(Product.objects.filter(category_id__in=category_ids))
+            # Удалённые категории пропускаем — их сводки удалены каскадом
+            existing = Category.objects.filter(pk__in=category_ids).values_list("pk", flat=True)
+            cls.objects.bulk_create(
+                [cls(category_id=pk, **stats.get(pk, {})) for pk in existing],
+                update_conflicts=True,
+                unique_fields=["category"],
+                update_fields=["published_count", "min_price", "max_price", "last_updated"],
+            )
+
+    @classmethod
+    def apply(cls, changes):
+        """
+        Применяет к сводкам изменения продуктов — пары (было, стало) вкладов
+        ``Product.summary_entry``. Счётчик меняется на разницу, цены и дата
+        только расширяются; категория пересчитывается целиком, лишь когда
+        уходит продукт, на котором держалась её граница.
+        """
+        removed, added = defaultdict(list), defaultdict(list)
+        for old, new in changes:
+            if old == new:
+                continue
+            if old is not None:
+                removed[old[0]].append(old)
+            if new is not None:
+                added[new[0]].append(new)
+        category_ids = set(removed) | set(added)
+        if not category_ids:
+            return
+        with transaction.atomic(savepoint=False):
+            # Строки сводок блокируются до конца транзакции: параллельные
+            # изменения одной категории применяются по очереди
+            summaries = cls.objects.select_for_update().in_bulk(category_ids)
+            recompute = category_ids - set(summaries)
+            for category_id, summary in summaries.items():
+                gone, came = removed[category_id], added[category_id]
+                if summary._loses_bound(gone, came):
+                    recompute.add(category_id)
+                    continue
+                values = {"published_count": F("published_count") + (len(came) - len(gone))}
+                if came:
+                    low = min(price for _, price, _ in came)
+                    high = max(price for _, price, _ in came)
+                    last = max(updated_at for _, _, updated_at in came)
+                    values.update(
+                        min_price=Least(Coalesce("min_price", Value(low)), Value(low)),
+                        max_price=Greatest(Coalesce("max_price", Value(high)), Value(high)),
+                        last_updated=Greatest(Coalesce("last_updated", Value(last)), Value(last)),
+                    )
+                cls.objects.filter(pk=category_id).update(**values)
+            cls.refresh(recompute)
+
+    def _loses_bound(self, gone, came):
+        """Уходит ли продукт, на котором держится минимум, максимум или дата, без замены среди пришедших."""
+        if not gone:
+            return False
+        if self.min_price is None or self.max_price is None or self.last_updated is None:
+            return True
+        prices = [price for _, price, _ in came]
+        dates = [updated_at for _, _, updated_at in came]
+        for _, price, updated_at in gone:
+            if price <= self.min_price and not any(p <= self.min_price for p in prices):
+                return True
+            if price >= self.max_price and not any(p >= self.max_price for p in prices):
+                return True
+            if updated_at >= self.last_updated and not any(d >= self.last_updated for d in dates):
+                return True
+        return False
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Полный пересчёт всех сводок с нуля."""
+        stats = cls._aggregate(Product.objects.all())
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                (cls(category_id=pk, **stats.get(pk, {})) for pk in Category.objects.values_list("pk", flat=True)),
+                batch_size=batch_size,
+            )
+        return len(stats)
+
+
+class BannedWord(models.Model):
+    """
+    Запрещённое слово, добавленное через админку (дополняет встроенный список).
+    """
+
+    word = models.CharField(max_length=100, unique=True, verbose_name="Слово")
+
+    class Meta:
+        verbose_name = "Запрещённое слово"
+        verbose_name_plural = "Запрещённые слова"
+        ordering = ["word"]
+
+    def __str__(self):
+        return self.word
+
+
+def _purge_pages(product_ids):
+    # Импорт здесь: catalog.page_cache через счётчики импортирует модели
+    from catalog.page_cache import purge_product_pages
+
+    purge_product_pages(product_ids)
+
+
+def products_changed(category_ids, product_ids=(), changes=None):
+    """
+    Продукты указанных категорий изменились: сбрасываем кеш каталога,
+    обновляем сводки категорий и после фиксации транзакции удаляем
+    закешированные страницы самих продуктов.
+
+    ``changes`` — пары (было, стало) вкладов продуктов в сводки (см.
+    ``CategorySummary.apply``); без них сводки категорий пересчитываются.
+    """
+    category_ids = set(category_ids)
+    product_ids = set(product_ids)
+    invalidate_catalog(category_ids)
+    if changes is None:
+        CategorySummary.refresh(category_ids)
+    else:
+        CategorySummary.apply(changes)
+    if product_ids:
+        transaction.on_commit(lambda: _purge_pages(product_ids))
@@ -0,0 +1,174 @@
+"""
+Проверка текстов на запрещённые слова.
+
+Основы всех слов собираются в одно регулярное выражение в виде префиксного
+дерева (``(?:к(?:азин|рипт)|бирж...)``), поэтому текст просматривается за
+один проход, и время проверки почти не зависит от длины списка. Слова ищутся
+целиком (по границам слов) с учётом окончаний: «крипта» находит «крипту» и
+«крипты», но не срабатывает внутри чужих слов. Латинские буквы-двойники
+(«кaзинo» с латинскими «a» и «o») и «ё» учитываются прямо в выражении.
+
+Список слов складывается из встроенного ``BANNED_WORDS``, файла
+``settings.BANNED_WORDS_FILE`` (по слову в строке) и таблицы ``BannedWord``.
+Изменения файла и таблицы подхватываются без перезапуска.
+"""
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+
+# Список запрещённых слов (в любом регистре)
+BANNED_WORDS = [
+    'казино', 'криптовалюта', 'крипта', 'биржа',
+    'дешево', 'бесплатно', 'обман', 'полиция', 'радар'
+]
+
+BANNED_WORDS_FILE = getattr(settings, 'BANNED_WORDS_FILE', None)
+# Как часто проверять, не изменился ли список (секунды)
+RELOAD_CHECK_INTERVAL = getattr(settings, 'BANNED_WORDS_RELOAD_INTERVAL', 10)
+
+# Область поколения в кеше каталога, которую увеличивает изменение BannedWord
+GENERATION_SCOPE = 'banned_words'
+
+# Сколько букв окончания допускается после основы слова
+MAX_SUFFIX = 3
+
+# Окончания, которые отбрасываются при построении основы (длинные — первыми)
+_ENDINGS = sorted([
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ой', 'ей', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ую', 'юю', 'ая', 'яя',
+    'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ов', 'ев', 'ия',
+    'а', 'я', 'ы', 'и', 'у', 'ю', 'е', 'о', 'ь', 'й',
+], key=len, reverse=True)
+MIN_STEM = 4
+
+# Латинские буквы, которыми подменяют кириллицу, чтобы обойти фильтр
+_HOMOGLYPHS = {
+    'а': 'a', 'с': 'c', 'е': 'eё', 'о': 'o', 'р': 'p', 'х': 'x', 'у': 'y',
+    'к': 'k', 'м': 'm', 'т': 't', 'н': 'h', 'в': 'b',
+}
+_TO_CYRILLIC = str.maketrans({
+    latin: cyrillic for cyrillic, variants in _HOMOGLYPHS.items() for latin in variants
+})
+
+
+def normalize(word):
+    """Приводит слово из списка к нижнему регистру и кириллице."""
+    return word.lower().translate(_TO_CYRILLIC)
+
+
+def stem(word):
+    """Грубая основа русского слова: отбрасывает одно окончание."""
+    word = normalize(word.strip())
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def _char_pattern(char):
+    variants = _HOMOGLYPHS.get(char)
+    return f'[{char}{variants}]' if variants else re.escape(char)
+
+
+def _trie_pattern(words):
+    """Регулярное выражение-дерево: общие префиксы проверяются один раз."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [_char_pattern(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f'(?:{"|".join(branches)})'
+        # Слово может закончиться здесь, а может продолжиться дальше по дереву
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class BannedWordMatcher:
+    """Скомпилированный поиск любого из запрещённых слов."""
+
+    def __init__(self, words):
+        stems = {stem(word) for word in words if word.strip()}
+        self.words = tuple(words)
+        if stems:
+            self._regex = re.compile(rf'\b{_trie_pattern(stems)}\w{{0,{MAX_SUFFIX}}}\b')
+        else:
+            self._regex = None
+
+    def find(self, text):
+        """Первое найденное запрещённое слово или None."""
+        if not text or self._regex is None:
+            return None
+        match = self._regex.search(text.lower())
+        return match.group(0) if match else None
+
+    def contains(self, text):
+        return self.find(text) is not None
+
+
+def _read_file_words(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def _file_version():
+    if not BANNED_WORDS_FILE:
+        return None
+    try:
+        return os.stat(BANNED_WORDS_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _db_version():
+    from catalog.caching import get_generation
+
+    return get_generation(GENERATION_SCOPE)
+
+
+def _load_words(include_db=True):
+    words = list(BANNED_WORDS)
+    if _file_version() is not None:
+        words += _read_file_words(BANNED_WORDS_FILE)
+    if include_db:
+        from catalog.models import BannedWord
+
+        words += list(BannedWord.objects.values_list('word', flat=True))
+    return words
+
+
+# Строится при импорте из встроенного списка и файла; таблица подгружается
+# при первой проверке, когда приложения уже готовы
+_matcher = BannedWordMatcher(_load_words(include_db=False))
+_version = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_matcher():
+    """Текущий matcher; пересобирается, если изменились файл или таблица слов."""
+    global _matcher, _version, _checked_at
+    now = time.monotonic()
+    if _version is not None and now - _checked_at < RELOAD_CHECK_INTERVAL:
+        return _matcher
+    with _lock:
+        version = (_file_version(), _db_version())
+        if version != _version:
+            _matcher = BannedWordMatcher(_load_words())
+            _version = version
+        _checked_at = now
+    return _matcher
+
+
+def contains_banned_word(text):
+    """Проверяет, содержит ли текст запрещённые слова (без учёта регистра)"""
+    return get_matcher().contains(text)
@@ -0,0 +1,149 @@
+"""
+Кеш страницы продукта с учётом пользователя.
+
+``cache_page`` хранил одну страницу на URL: кнопки и CSRF-токен первого
+посетителя минуту видели все. Здесь в кеш попадает только общее для всех:
+тело страницы в двух вариантах — для анонимов и для вошедших (у них в меню
+форма выхода). Вместо личных частей при рендере ставятся метки:
+
+* ``ACTIONS_MARK`` — блок кнопок; для вошедших он рендерится на каждый
+  запрос по ``owner_id`` из записи кеша и правам пользователя;
+* ``fragments.CSRF_MARK`` — CSRF-токен;
+* ``fragments.VIEWS_MARK`` — счётчик просмотров: значение из БД хранится
+  отдельным ключом (его сдвигает ``flush_views``), буфер читается как обычно.
+
+Запись удаляется при сохранении продукта и появлении уменьшенных копий
+картинки. Переименование и удаление категорий увеличивают поколение
+``CATEGORIES_GENERATION``: оно читается тем же ``get_many``, и записи
+прежнего поколения считаются промахом. Неопубликованные продукты не кешируются.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.http import HttpResponse
+
+from catalog.caching import CATEGORIES_GENERATION, acache, aget_generation, generation_key, get_generation, make_key
+from catalog.counters import apending_views, pending_views, views_base_key
+from catalog.fragments import CSRF_MARK, VIEWS_MARK
+
+PAGE_TIMEOUT = getattr(settings, 'PRODUCT_PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+ACTIONS_MARK = 'page-actions-mark'
+ACTIONS_TEMPLATE = 'catalog/includes/inc_product_actions.html'
+AUDIENCES = ('anon', 'auth')
+
+
+def audience(user):
+    return 'auth' if user.is_authenticated else 'anon'
+
+
+def page_key(pk, audience_name):
+    return make_key('page', 'product', pk, audience_name)
+
+
+def get_page(request, pk):
+    """
+    Запись кеша страницы и значение счётчика из БД (или None, если чего-то
+    нет). Результат запоминается на запросе: им пользуются и валидаторы
+    условного GET, и само представление.
+    """
+    memo = getattr(request, '_product_page', None)
+    if memo is not None and memo[0] == pk:
+        return memo[1]
+    keys = _page_keys(request, pk)
+    return _remember_page(request, pk, keys, cache.get_many(keys))
+
+
+async def aget_page(request, pk):
+    """Асинхронный ``get_page``."""
+    memo = getattr(request, '_product_page', None)
+    if memo is not None and memo[0] == pk:
+        return memo[1]
+    keys = _page_keys(request, pk)
+    return _remember_page(request, pk, keys, await acache.get_many(keys))
+
+
+def _page_keys(request, pk):
+    return [page_key(pk, audience(request.user)), views_base_key(pk), generation_key(CATEGORIES_GENERATION)]
+
+
+def _remember_page(request, pk, keys, cached):
+    entry, generation = cached.get(keys[0]), cached.get(keys[2])
+    if entry is None or keys[1] not in cached or generation is None or entry.get('generation') != generation:
+        result = (None, None)
+    else:
+        result = (entry, cached[keys[1]])
+    # Поколение запоминается до рендера: запись, отрисованная до смены категории, устареет
+    request._product_page = (pk, result, generation)
+    return result
+
+
+def _remembered_generation(request, pk):
+    memo = getattr(request, '_product_page', None)
+    return memo[2] if memo is not None and memo[0] == pk else None
+
+
+def store_page(request, product, user, body):
+    """Кладёт страницу в кеш и возвращает её запись."""
+    generation = _remembered_generation(request, product.pk) or get_generation(CATEGORIES_GENERATION)
+    entry = make_entry(product, body, generation)
+    cache.set_many(_page_values(product, user, entry), PAGE_TIMEOUT)
+    return entry
+
+
+async def astore_page(request, product, user, body):
+    generation = _remembered_generation(request, product.pk) or await aget_generation(CATEGORIES_GENERATION)
+    entry = make_entry(product, body, generation)
+    await acache.set_many(_page_values(product, user, entry), PAGE_TIMEOUT)
+    return entry
+
+
+def _page_values(product, user, entry):
+    return {
+        page_key(product.pk, audience(user)): entry,
+        views_base_key(product.pk): product.views_counter,
+    }
+
+
+def make_entry(product, body, generation):
+    return {'body': body, 'owner_id': product.owner_id, 'updated_at': product.updated_at, 'generation': generation}
+
+
+def purge_product_pages(pks):
+    """Удаляет закешированные страницы продуктов во всех вариантах."""
+    keys = [page_key(pk, name) for pk in set(pks) if pk is not None for name in AUDIENCES]
+    if keys:
+        cache.delete_many(keys)
+
+
+def render_actions(request, pk, owner_id):
+    user = request.user
+    can_edit = user.is_authenticated and owner_id == user.pk
+    can_delete = can_edit or user.has_perm('catalog.delete_product')
+    return render_to_string(ACTIONS_TEMPLATE, {
+        'pk': pk, 'can_edit': can_edit, 'can_delete': can_delete,
+    }, request)
+
+
+def page_response(request, pk, entry, views_base):
+    """Собирает ответ из записи кеша и личных частей страницы."""
+    return _assemble(request, pk, entry, views_base + pending_views(pk))
+
+
+async def apage_response(request, pk, entry, views_base):
+    """Асинхронный ``page_response``: буфер просмотров читается через async API."""
+    return _assemble(request, pk, entry, views_base + await apending_views(pk))
+
+
+def _assemble(request, pk, entry, views_total):
+    body = entry['body']
+    body = body.replace(ACTIONS_MARK, render_actions(request, pk, entry['owner_id']), 1)
+    body = body.replace(VIEWS_MARK, str(views_total))
+    if CSRF_MARK in body:
+        body = body.replace(CSRF_MARK, get_token(request))
+    response = HttpResponse(body)
+    patch_vary_headers(response, ('Cookie',))
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True)
+    return response
@@ -0,0 +1,113 @@
+"""
+Постраничный вывод каталога по ключу (keyset/seek), без OFFSET и COUNT(*).
+
+Порядок задаётся парой ``(name, id)``: имя — для пользователя, id — чтобы
+ключ был уникальным. Курсор хранит ключ крайней строки страницы и
+направление; он подписан, поэтому его нельзя подделать вручную.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+
+PAGE_SIZE = getattr(settings, 'CATALOG_PAGE_SIZE', 24)
+ORDERING = ('name', 'pk')
+
+FORWARD, BACKWARD = 'f', 'b'
+
+
+def _signer():
+    # Signer без метки времени: один и тот же курсор — один и тот же URL
+    return signing.Signer(salt='catalog.cursor')
+
+
+def encode_cursor(direction, row):
+    return _signer().sign_object([direction, row.name, row.pk], compress=True)
+
+
+def decode_cursor(cursor):
+    """Возвращает (направление, имя, id) или None для пустого/битого курсора."""
+    if not cursor:
+        return None
+    try:
+        direction, name, pk = _signer().unsign_object(cursor)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    if direction not in (FORWARD, BACKWARD):
+        return None
+    return direction, name, pk
+
+
+def cursor_cache_key(cursor):
+    """Часть ключа кеша для страницы: не зависит от формы записи курсора."""
+    decoded = decode_cursor(cursor)
+    if decoded is None:
+        return 'first'
+    return hashlib.md5(repr(decoded).encode()).hexdigest()
+
+
+class KeysetPage:
+    """Страница строк каталога со ссылками на соседние страницы."""
+
+    def __init__(self, rows, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+def keyset_queryset(queryset, cursor, page_size=PAGE_SIZE):
+    """
+    Ограничивает queryset одной страницей после (или до) курсора.
+
+    Выбирается на одну строку больше — по ней понятно, есть ли следующая
+    страница, без отдельного COUNT(*).
+    """
+    decoded = decode_cursor(cursor)
+    if decoded is None:
+        return queryset.order_by(*ORDERING)[:page_size + 1]
+    direction, name, pk = decoded
+    # Лишнее на вид условие по одному имени — граница диапазона индекса
+    # (name, id): по одному OR планировщик читает индекс с начала и
+    # отбрасывает строки фильтром, и дальние страницы становятся дороже первой
+    if direction == FORWARD:
+        after = Q(name__gte=name) & (Q(name__gt=name) | Q(name=name, pk__gt=pk))
+        return queryset.filter(after).order_by(*ORDERING)[:page_size + 1]
+    before = Q(name__lte=name) & (Q(name__lt=name) | Q(name=name, pk__lt=pk))
+    return queryset.filter(before).order_by('-name', '-pk')[:page_size + 1]
+
+
+def make_page(rows, cursor, page_size=PAGE_SIZE):
+    """
+    Собирает KeysetPage из строк, выбранных по ``keyset_queryset``.
+    """
+    decoded = decode_cursor(cursor)
+    direction = decoded[0] if decoded else None
+    has_more = len(rows) > page_size
+    rows = list(rows[:page_size])
+    if direction == BACKWARD:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, direction == FORWARD
+    if not rows:
+        return KeysetPage(rows)
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(FORWARD, rows[-1]) if has_next else None,
+        prev_cursor=encode_cursor(BACKWARD, rows[0]) if has_prev else None,
+    )
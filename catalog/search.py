@@ -0,0 +1,192 @@
+"""
+Полнотекстовый поиск по продуктам.
+
+На PostgreSQL используется поле ``search_vector`` (конфигурация ``russian``,
+название весит больше описания) с GIN-индексом. На SQLite тот же API
+работает через виртуальную таблицу FTS5, чтобы поиск можно было проверить
+локально без сервера Postgres. Таблицу создаёт миграция 0008, а в базах,
+схема которых строится по моделям без миграций (тесты, бенчмарки), —
+``create_search_table`` по сигналу ``post_migrate``. Индекс поддерживают
+сигналы и массовые операции ``ProductQuerySet``.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core import signing
+from django.db import connection, connections
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+from django.db.models.expressions import RawSQL
+
+from catalog.listing import QUERY_FIELDS, make_rows
+from catalog.models import Product
+from catalog.pagination import PAGE_SIZE, KeysetPage
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'catalog_product_fts'
+CREATE_FTS_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+    f'USING fts5(name, description, tokenize="unicode61")'
+)
+# Веса колонок FTS5 для bm25: название важнее описания
+FTS_WEIGHTS = (10.0, 1.0)
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_vector():
+    """Выражение для ``search_vector``: название с весом A, описание — B."""
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+class PostgresSearchBackend:
+    def reindex(self, product_ids):
+        Product.objects.filter(pk__in=product_ids).update(search_vector=search_vector())
+
+    def remove(self, product_ids):
+        pass  # Вектор хранится в самой строке продукта
+
+    def rebuild(self):
+        Product.objects.update(search_vector=search_vector())
+
+    def ranked(self, text):
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        # ts_rank возвращает real; double precision нужен, чтобы курсор
+        # сравнивался с тем же значением, что попало в Python
+        return Product.objects.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        )
+
+
+class SQLiteSearchBackend:
+    def reindex(self, product_ids):
+        product_ids = list(product_ids)
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', product_ids)
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description) '
+                f'SELECT id, name, COALESCE(description, \'\') FROM {Product._meta.db_table} '
+                f'WHERE id IN ({placeholders})',
+                product_ids,
+            )
+
+    def remove(self, product_ids):
+        product_ids = list(product_ids)
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', product_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description) '
+                f'SELECT id, name, COALESCE(description, \'\') FROM {Product._meta.db_table}'
+            )
+
+    @staticmethod
+    def _match_expression(text):
+        # Каждое слово — отдельная фраза с префиксным поиском; спецсимволы FTS5 отбрасываются
+        return ' '.join(f'"{word}"*' for word in _WORD_RE.findall(text))
+
+    def ranked(self, text):
+        match = self._match_expression(text)
+        if not match:
+            return Product.objects.none()
+        table = Product._meta.db_table
+        # Продукты соединяются с результатом MATCH, bm25 считается по строке
+        # этого результата, а не отдельным подзапросом на каждый продукт.
+        # bm25 тем меньше, чем лучше совпадение, поэтому берём его со знаком минус
+        return Product.objects.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+        ).annotate(rank=RawSQL(f'-bm25({FTS_TABLE}, %s, %s)', FTS_WEIGHTS, output_field=FloatField()))
+
+
+class NullSearchBackend:
+    """Прочие СУБД: индекс не ведётся, поиск по подстроке."""
+
+    def reindex(self, product_ids):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def ranked(self, text):
+        return Product.objects.filter(
+            Q(name__icontains=text) | Q(description__icontains=text)
+        ).annotate(rank=RawSQL('0', (), output_field=FloatField()))
+
+
+_BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_backend():
+    return _BACKENDS.get(connection.vendor, NullSearchBackend)()
+
+
+def create_search_table(using, **kwargs):
+    """Обработчик ``post_migrate``: FTS5-таблица для SQLite-базы без миграций."""
+    db = connections[using]
+    if db.vendor == 'sqlite':
+        with db.cursor() as cursor:
+            cursor.execute(CREATE_FTS_SQL)
+
+
+def reindex_products(product_ids):
+    product_ids = [pk for pk in product_ids if pk is not None]
+    if product_ids:
+        get_backend().reindex(product_ids)
+
+
+def remove_products(product_ids):
+    product_ids = [pk for pk in product_ids if pk is not None]
+    if product_ids:
+        get_backend().remove(product_ids)
+
+
+def rebuild_index():
+    """Строит поисковый индекс всех продуктов заново (после массовой загрузки)."""
+    get_backend().rebuild()
+
+
+def _signer():
+    return signing.Signer(salt='catalog.search.cursor')
+
+
+def search_products(text, cursor=None, page_size=PAGE_SIZE):
+    """
+    Ищет опубликованные продукты и возвращает страницу строк (KeysetPage),
+    отсортированную по релевантности. Следующая страница выбирается по
+    курсору ``(rank, id)`` — без OFFSET.
+    """
+    text = (text or '').strip()
+    if not text:
+        return KeysetPage([])
+
+    queryset = get_backend().ranked(text).filter(is_published=True)
+    if cursor:
+        try:
+            rank, pk = _signer().unsign_object(cursor)
+            queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, pk__gt=pk))
+        except (signing.BadSignature, ValueError, TypeError):
+            pass  # Битый курсор — показываем первую страницу
+
+    values = list(queryset.order_by('-rank', 'pk').values_list(*QUERY_FIELDS, 'rank')[:page_size + 1])
+    rows = make_rows(values[:page_size])
+    next_cursor = None
+    if len(values) > page_size:
+        last = values[page_size - 1]
+        next_cursor = _signer().sign_object([last[-1], last[0]])
+    return KeysetPage(rows, next_cursor=next_cursor)
@@ -1,41 +1,233 @@
+import hashlib
+
 from django.core.cache import cache
 
+from config.db_router import use_primary
 from config.settings import CACHE_ENABLED
-from catalog.models import Product
+from catalog.caching import (
+    CATALOG_CACHE_TIMEOUT,
+    CATEGORIES_GENERATION,
+    acache,
+    acompute_and_store,
+    aget_generation,
+    aget_or_compute,
+    category_scope,
+    compute_and_store,
+    get_generation,
+    get_or_compute,
+    make_key,
+)
+from catalog.facets import build_facets, facet_rows
+from catalog.listing import PAYLOAD_VERSION, abuild_rows, build_rows, pack_rows, unpack_rows
+from catalog.models import Category, CategorySummary, Product
+from catalog.pagination import PAGE_SIZE, cursor_cache_key, keyset_queryset, make_page
+
+
+# Меняется вместе с набором полей сводки, чтобы не читать записи прежнего вида
+SUMMARIES_VERSION = 2
+# То же для строк фасетов (catalog.facets.facet_rows)
+FACETS_VERSION = 1
+
+_MISSING = object()
+
+
+def _name_digest(category_name):
+    """Ключ по имени категории не должен зависеть от регистра и сырого ввода."""
+    return hashlib.md5(category_name.strip().casefold().encode()).hexdigest()
+
+
+def _cached_rows(key, queryset):
+    """
+    Строки карточек из кеша; при промахе — из БД с записью в кеш.
+    Одновременные промахи и пересчёты после срока идут в БД один раз.
+    """
+    # Разные версии формата не вытесняют друг друга при выкатке
+    key = f'{key}:p{PAYLOAD_VERSION}'
+
+    def compute():
+        # Запись живёт до смены поколения — отстающая реплика закрепила бы устаревшее
+        with use_primary():
+            return pack_rows(build_rows(queryset))
+
+    rows = unpack_rows(get_or_compute(key, compute))
+    if rows is None:
+        # Payload не читается — перезаписываем
+        rows = unpack_rows(compute_and_store(key, compute))
+    return rows
+
+
+async def _acached_rows(key, queryset):
+    key = f'{key}:p{PAYLOAD_VERSION}'
+
+    async def compute():
+        with use_primary():
+            return pack_rows(await abuild_rows(queryset))
 
-def get_products_from_cache():
+    rows = unpack_rows(await aget_or_compute(key, compute))
+    if rows is None:
+        rows = unpack_rows(await acompute_and_store(key, compute))
+    return rows
+
+
+def get_published_page(cursor=None, page_size=PAGE_SIZE):
+    """
+    Возвращает страницу опубликованных продуктов после курсора (KeysetPage).
+    """
+    queryset = keyset_queryset(Product.objects.filter(is_published=True), cursor, page_size)
+    if not CACHE_ENABLED:
+        return make_page(build_rows(queryset), cursor, page_size)
+    key = make_key('products', 'published', get_generation(), 'page', page_size, cursor_cache_key(cursor))
+    return make_page(_cached_rows(key, queryset), cursor, page_size)
+
+
+async def aget_published_page(cursor=None, page_size=PAGE_SIZE):
+    """Асинхронный ``get_published_page``."""
+    queryset = keyset_queryset(Product.objects.filter(is_published=True), cursor, page_size)
     if not CACHE_ENABLED:
-        return Product.objects.all()
-    key = 'products_list'
-    products = cache.get(key)
-    if products is not None:
-        return products
-    products = Product.objects.all()
-    cache.set(key, products)
-    return products
+        return make_page(await abuild_rows(queryset), cursor, page_size)
+    key = make_key('products', 'published', await aget_generation(), 'page', page_size, cursor_cache_key(cursor))
+    return make_page(await _acached_rows(key, queryset), cursor, page_size)
 
-def get_products_by_category(category_name, use_cache=True):
+
+def resolve_category(slug, use_cache=True):
     """
-    Возвращает список продуктов в указанной категории (по имени категории, без учёта регистра).
+    Возвращает ``{'id': ..., 'name': ...}`` категории по слагу или None.
+
+    Слаг уникален и проиндексирован; результат, в том числе отсутствие
+    категории, кешируется до сохранения любой категории.
     """
-    if not category_name:
-        return Product.objects.none()
+    queryset = Category.objects.filter(slug=slug).order_by().values('id', 'name')
+    if not (use_cache and CACHE_ENABLED):
+        return queryset.first()
+
+    key = make_key('category_slug', slug, get_generation(CATEGORIES_GENERATION))
+    category = cache.get(key, _MISSING)
+    if category is _MISSING:
+        with use_primary():
+            category = queryset.first()
+        cache.set(key, category, CATALOG_CACHE_TIMEOUT)
+    return category
+
 
-    cache_key = f'products_category_{category_name.lower()}'
+async def aresolve_category(slug, use_cache=True):
+    """Асинхронный ``resolve_category``."""
+    queryset = Category.objects.filter(slug=slug).order_by().values('id', 'name')
+    if not (use_cache and CACHE_ENABLED):
+        return await queryset.afirst()
 
-    if use_cache:
-        products = cache.get(cache_key)
-        if products is not None:
-            return products
+    key = make_key('category_slug', slug, await aget_generation(CATEGORIES_GENERATION))
+    category = await acache.get(key, _MISSING)
+    if category is _MISSING:
+        with use_primary():
+            category = await queryset.afirst()
+        await acache.set(key, category, CATALOG_CACHE_TIMEOUT)
+    return category
 
-    # Фильтруем по полю `name` в модели Category, без учёта регистра
-    products = Product.objects.filter(
-        category__name__iexact=category_name,
-        is_published=True
+
+def get_category_slug_by_name(category_name):
+    """
+    Слаг категории для старых адресов вида ``/category/<имя>/`` или None.
+    Из одноимённых категорий берётся созданная первой.
+    """
+    queryset = (
+        Category.objects.filter(name__iexact=category_name.strip())
+        .order_by('pk').values_list('slug', flat=True)
     )
+    if not CACHE_ENABLED:
+        return queryset.first()
+
+    key = make_key('category_name_slug', _name_digest(category_name), get_generation(CATEGORIES_GENERATION))
+    slug = cache.get(key, _MISSING)
+    if slug is _MISSING:
+        with use_primary():
+            slug = queryset.first()
+        cache.set(key, slug, CATALOG_CACHE_TIMEOUT)
+    return slug
+
+
+def get_category_page(category_id, cursor=None, page_size=PAGE_SIZE):
+    """
+    Возвращает страницу продуктов категории после курсора (KeysetPage).
+    """
+    queryset = keyset_queryset(
+        Product.objects.filter(category_id=category_id, is_published=True), cursor, page_size
+    )
+    if not CACHE_ENABLED:
+        return make_page(build_rows(queryset), cursor, page_size)
+    generation = get_generation(category_scope(category_id))
+    key = make_key('products', 'category_id', category_id, generation, 'page', page_size, cursor_cache_key(cursor))
+    return make_page(_cached_rows(key, queryset), cursor, page_size)
+
+
+async def aget_category_page(category_id, cursor=None, page_size=PAGE_SIZE):
+    """Асинхронный ``get_category_page``."""
+    queryset = keyset_queryset(
+        Product.objects.filter(category_id=category_id, is_published=True), cursor, page_size
+    )
+    if not CACHE_ENABLED:
+        return make_page(await abuild_rows(queryset), cursor, page_size)
+    generation = await aget_generation(category_scope(category_id))
+    key = make_key('products', 'category_id', category_id, generation, 'page', page_size, cursor_cache_key(cursor))
+    return make_page(await _acached_rows(key, queryset), cursor, page_size)
+
+
+def get_category_summaries():
+    """
+    Возвращает сводки категорий, в которых есть опубликованные продукты.
+    """
+    summaries = CategorySummary.objects.filter(published_count__gt=0).select_related('category')
+    if CACHE_ENABLED:
+        key = make_key('category_summaries', SUMMARIES_VERSION, get_generation())
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    with use_primary():
+        result = [
+            {
+                'name': summary.category.name,
+                'slug': summary.category.slug,
+                'published_count': summary.published_count,
+                'min_price': summary.min_price,
+                'max_price': summary.max_price,
+                'last_updated': summary.last_updated,
+            }
+            for summary in summaries.order_by('category__name')
+        ]
+    if CACHE_ENABLED:
+        cache.set(key, result, CATALOG_CACHE_TIMEOUT)
+    return result
+
+
+def get_browse_facets(filters):
+    """
+    Фасеты просмотра каталога (``catalog.facets.build_facets``) для фильтров.
+
+    Строки агрегата кешируются по цене и владельцу (выбор категорий их не
+    меняет) до смены общего поколения.
+    """
+    if not CACHE_ENABLED:
+        return build_facets(filters, facet_rows(filters))
+
+    key = make_key('facets', FACETS_VERSION, get_generation(), filters.rows_signature())
 
-    if use_cache:
-        cache.set(cache_key, products, 60 * 15)  # 15 минут
+    def compute():
+        with use_primary():
+            return facet_rows(filters)
 
-    return products
+    return build_facets(filters, get_or_compute(key, compute))
 
+
+def get_browse_page(filters, facets, cursor=None, page_size=PAGE_SIZE):
+    """
+    Страница продуктов, подходящих под фильтры (KeysetPage);
+    ``facets`` — результат ``get_browse_facets`` для тех же фильтров.
+    """
+    if filters.category_slugs and not facets['category_ids']:
+        return make_page([], cursor, page_size)
+    queryset = keyset_queryset(filters.products(facets['category_ids']), cursor, page_size)
+    if not CACHE_ENABLED:
+        return make_page(build_rows(queryset), cursor, page_size)
+    key = make_key(
+        'products', 'browse', get_generation(), filters.signature(), 'page', page_size, cursor_cache_key(cursor),
+    )
+    return make_page(_cached_rows(key, queryset), cursor, page_size)
@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from catalog import moderation
+from catalog.caching import CATEGORIES_GENERATION, bump_generation, invalidate_catalog
+from catalog.models import BannedWord, Category, CategorySummary, Product, ProductQuerySet, products_changed
+from catalog.page_cache import purge_product_pages
+from catalog.search import remove_products, reindex_products
+from renditions.services import renditions_ready
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, signal, created=False, **kwargs):
+    """Сохранение/удаление продукта (в том числе из админки) сбрасывает его категории."""
+    entry = instance.summary_entry() if signal is post_save else None
+    if created:
+        changes = [(None, entry)]
+    elif hasattr(instance, '_loaded_summary'):
+        changes = [(instance._loaded_summary, entry)]
+    else:
+        # Прежнее состояние неизвестно — сводки категорий пересчитаются
+        changes = None
+    # Если продукт перенесли в другую категорию, устарела и прежняя
+    products_changed(
+        [instance.category_id, getattr(instance, '_loaded_category_id', None)], [instance.pk], changes,
+    )
+    instance._loaded_category_id = instance.category_id
+    instance._loaded_summary = entry
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance, update_fields=None, **kwargs):
+    """Обновляет поисковый индекс продукта."""
+    if update_fields is None or ProductQuerySet.SEARCH_FIELDS & set(update_fields):
+        reindex_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    """
+    Переименование или удаление категории меняет выборки по её имени
+    и страницы её продуктов (``catalog.page_cache`` сверяет поколение).
+    """
+    invalidate_catalog([instance.pk])
+    transaction.on_commit(lambda: bump_generation(CATEGORIES_GENERATION))
+    if kwargs.get('created'):
+        CategorySummary.refresh([instance.pk])
+
+
+@receiver(pre_delete, sender=Category)
+def touch_category_products(sender, instance, **kwargs):
+    """
+    SET_NULL не меняет ``updated_at`` продуктов удалённой категории: обновляем
+    его одним запросом, чтобы сменились ETag и Last-Modified их страниц.
+    Базовый менеджер — без пересчёта сводок и кеша в ``ProductQuerySet.update``:
+    это сделают сигналы самой категории.
+    """
+    Product._base_manager.filter(category_id=instance.pk).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=BannedWord)
+@receiver(post_delete, sender=BannedWord)
+def reload_banned_words(sender, instance, **kwargs):
+    """Все процессы пересоберут список запрещённых слов при следующей проверке."""
+    bump_generation(moderation.GENERATION_SCOPE)
+
+
+@receiver(renditions_ready)
+def use_product_renditions(sender, sources, **kwargs):
+    """Карточки с готовыми копиями картинок пересобираются с srcset."""
+    changed = list(Product.objects.filter(
+        Q(preview__in=sources) | Q(image__in=sources)
+    ).values_list('pk', 'category_id'))
+    invalidate_catalog(category_id for _, category_id in changed)
+    purge_product_pages(pk for pk, _ in changed)
@@ -0,0 +1,44 @@
+"""
+Слаги категорий: транслитерация кириллицы и уникальность.
+
+``slugify`` из Django отбрасывает кириллицу целиком («Рассылки» → «»),
+поэтому название сначала переводится в латиницу по таблице ниже.
+"""
+from django.utils.text import slugify
+
+SLUG_MAX_LENGTH = 120
+
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya',
+    # Украинские и белорусские буквы
+    'є': 'ye', 'і': 'i', 'ї': 'yi', 'ґ': 'g', 'ў': 'u',
+}
+
+
+def transliterate(text):
+    return ''.join(TRANSLIT.get(char, char) for char in text.lower())
+
+
+def make_slug(name, max_length=SLUG_MAX_LENGTH):
+    slug = slugify(transliterate(name))[:max_length].strip('-')
+    return slug or 'category'
+
+
+def unique_slug(queryset, name, max_length=SLUG_MAX_LENGTH):
+    """
+    Слаг, которого ещё нет в ``queryset``: ``rassylki``, ``rassylki-2``, …
+
+    Гонку двух одновременных сохранений ловит уникальный индекс.
+    """
+    base = make_slug(name, max_length)
+    taken = set(queryset.filter(slug__startswith=base).values_list('slug', flat=True))
+    slug, number = base, 2
+    while slug in taken:
+        suffix = f'-{number}'
+        slug = base[:max_length - len(suffix)].rstrip('-') + suffix
+        number += 1
+    return slug
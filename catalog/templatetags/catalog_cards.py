@@ -0,0 +1,24 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from catalog.fragments import options_key, render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def product_cards(context, products, template_name, **options):
+    """
+    Карточки продуктов из кеша фрагментов::
+
+        {% product_cards object_list 'catalog/includes/inc_product_card.html' %}
+
+    Асинхронные представления готовят карточки заранее (``aprerender_cards``).
+    """
+    request = context.get('request')
+    prerendered = getattr(request, 'prerendered_cards', None)
+    if prerendered:
+        html = prerendered.get((template_name, options_key(options)))
+        if html is not None:
+            return mark_safe(html)
+    return mark_safe(render_cards(request, products, template_name, **options))
@@ -1,3 +1,1454 @@
-from django.test import TestCase
+import gzip
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import msgpack
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.contrib.auth.models import AnonymousUser, Permission
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.template import Context, Template
+from django.test import (
+    AsyncRequestFactory, Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.templatetags.static import static
+from django.urls import reverse
+from django.views.decorators.vary import vary_on_cookie
+
+from blog.models import BlogPost
+from catalog.async_views import AsyncProductCategoryView, AsyncProductDetailView, AsyncProductListView
+from catalog.conditional import acondition, aproduct_etag, aproduct_last_modified
+from catalog import caching, counters, fragments, listing, moderation, page_cache, search, services
+from catalog.caching import bump_generation, category_scope, make_key
+from catalog.facets import BrowseFilters
+from catalog.fragments import CSRF_MARK, VIEWS_MARK
+from catalog.listing import PAYLOAD_VERSION
+from catalog.management.commands import explain_hot_queries
+from catalog.forms import ProductForm
+from catalog.models import BannedWord, Category, CategorySummary, Product
+from catalog.page_cache import AUDIENCES
+from catalog.pagination import PAGE_SIZE, decode_cursor, keyset_queryset, make_page
+from catalog.search import search_products
+from catalog.views import ProductCategoryView, ProductDetailView, ProductListView
+from config import benchmark, perf, tiered_cache
+from users.models import User
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductListPermissionsTest(TestCase):
+    """Флаги кнопок в списке продуктов не порождают запросов на каждый продукт."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@example.com', password='pass')
+        cls.other = User.objects.create_user(email='other@example.com', password='pass')
+        cls.moderator = User.objects.create_user(email='moderator@example.com', password='pass')
+        cls.moderator.user_permissions.add(
+            Permission.objects.get(codename='delete_product', content_type__app_label='catalog')
+        )
+        cls.category = Category.objects.create(name='Рассылки')
+
+    def setUp(self):
+        cache.clear()
+
+    def create_products(self, count, owner):
+        Product.objects.bulk_create(
+            Product(
+                name=f'Продукт {owner.pk}-{i}',
+                price=Decimal('100.00'),
+                category=self.category,
+                owner=owner,
+                is_published=True,
+            )
+            for i in range(count)
+        )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_is_constant(self):
+        for user in (self.owner, self.moderator):
+            self.client.force_login(user)
+            for url in (reverse('catalog:product_list'), reverse('catalog:home')):
+                with self.subTest(user=user.email, url=url):
+                    Product.objects.all().delete()
+                    self.create_products(2, self.owner)
+                    few, _ = self.count_queries(url)
+                    self.create_products(10, self.owner)
+                    self.create_products(10, self.other)
+                    many, _ = self.count_queries(url)
+                    self.assertEqual(few, many)
+
+    def test_flags_for_owner_and_moderator(self):
+        self.create_products(1, self.owner)
+        self.create_products(1, self.other)
+
+        self.client.force_login(self.owner)
+        _, response = self.count_queries(reverse('catalog:product_list'))
+        flags = {p.owner_id: (p.can_edit, p.can_delete) for p in response.context['object_list']}
+        self.assertEqual(flags, {self.owner.pk: (True, True), self.other.pk: (False, False)})
+
+        self.client.force_login(self.moderator)
+        _, response = self.count_queries(reverse('catalog:product_list'))
+        flags = {p.owner_id: (p.can_edit, p.can_delete) for p in response.context['object_list']}
+        self.assertEqual(flags, {self.owner.pk: (False, True), self.other.pk: (False, True)})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncViewsTest(TestCase):
+    """Асинхронные представления (ASGI) отдают то же, что синхронные (WSGI)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@example.com', password='pass')
+        cls.other = User.objects.create_user(email='other@example.com', password='pass')
+        cls.category = Category.objects.create(name='Рассылки')
+        Product.objects.bulk_create(
+            Product(name=f'Продукт {owner.pk}-{i}', price=Decimal('100.00'), category=cls.category,
+                    owner=owner, is_published=True)
+            for owner in (cls.owner, cls.other) for i in range(3)
+        )
+        cls.product = Product.objects.filter(owner=cls.owner).first()
+
+    def setUp(self):
+        cache.clear()
+
+    def sync_get(self, view, user, **kwargs):
+        request = RequestFactory().get('/')
+        request.user = user
+        return view.as_view()(request, **kwargs)
+
+    async def async_get(self, view, user, **kwargs):
+        request = AsyncRequestFactory().get('/')
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        return await view.as_view()(request, **kwargs)
+
+    def markup(self, response):
+        if hasattr(response, 'render'):
+            response.render()
+        html = response.content.decode()
+        return html.count('class="card'), html.count('Редактировать'), html.count('Удалить')
+
+    async def test_same_markup(self):
+        pages = [
+            (ProductListView, AsyncProductListView, {}),
+            (ProductDetailView, AsyncProductDetailView, {'pk': self.product.pk}),
+            (ProductCategoryView, AsyncProductCategoryView, {'slug': self.category.slug}),
+        ]
+        for sync_view, async_view, kwargs in pages:
+            # Дважды: промах и попадание в кеш
+            for attempt in range(2):
+                with self.subTest(view=async_view.__name__, attempt=attempt):
+                    response = await self.async_get(async_view, self.owner, **kwargs)
+                    expected = await sync_to_async(self.sync_get)(sync_view, self.owner, **kwargs)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(self.markup(response), self.markup(expected))
+                    self.assertTrue(self.markup(response)[0])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ViewCountersTest(TestCase):
+    """Сброс буфера просмотров: пакетный UPDATE, updated_at не меняется, буфер очищается после фиксации."""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(email='owner@example.com', password='pass')
+        category = Category.objects.create(name='Рассылки')
+        cls.first, cls.second, cls.third = Product.objects.bulk_create(
+            Product(name=f'Продукт {i}', price=Decimal('100.00'), category=category, owner=owner,
+                    is_published=True, views_counter=10)
+            for i in range(3)
+        )
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(counters, '_buffer', counters.LocalViewBuffer())
+        self.buffer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def views(self):
+        return dict(Product.objects.values_list('pk', 'views_counter'))
+
+    def test_flush_batches_and_keeps_updated_at(self):
+        updated_at = dict(Product.objects.values_list('pk', 'updated_at'))
+        for pk in (self.first.pk, self.first.pk, self.first.pk, self.second.pk):
+            counters.record_view(pk)
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            self.assertEqual(counters.flush_views(batch_size=1), 4)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertIn('CASE WHEN', updates[0])
+
+        self.assertEqual(self.views(), {self.first.pk: 13, self.second.pk: 11, self.third.pk: 10})
+        self.assertEqual(dict(Product.objects.values_list('pk', 'updated_at')), updated_at)
+        self.assertEqual(self.buffer.pending_many([self.first.pk, self.second.pk]), {self.first.pk: 0, self.second.pk: 0})
+        # Повторный сброс ничего не добавляет
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(counters.flush_views(), 0)
+        self.assertEqual(self.views()[self.first.pk], 13)
+
+    def test_buffer_cleared_only_after_commit(self):
+        counters.record_view(self.first.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(counters.flush_views(), 1)
+            # Внешняя транзакция не зафиксирована — второй сброс не берёт те же приращения
+            self.assertEqual(counters.flush_views(), 0)
+        # Транзакция ещё не зафиксирована — приращение остаётся в буфере
+        self.assertEqual(counters.pending_views(self.first.pk), 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(counters.pending_views(self.first.pk), 0)
+        self.assertEqual(self.views()[self.first.pk], 11)
+
+        # После подтверждения блокировка снята
+        counters.record_view(self.first.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(counters.flush_views(), 1)
+
+    def test_flush_thread_only_when_enabled(self):
+        with mock.patch('threading.Thread') as thread:
+            with mock.patch.object(counters, 'LOCAL_FLUSH_INTERVAL', 0):
+                self.assertIsNone(counters.start_local_flush())
+            thread.assert_not_called()
+            with mock.patch.object(counters, 'LOCAL_FLUSH_INTERVAL', 60):
+                counters.start_local_flush()
+            thread.assert_called_once()
+        # Сам буфер поток не запускает
+        with mock.patch('threading.Thread') as thread, mock.patch.object(counters, '_buffer', None):
+            counters.get_view_buffer()
+        thread.assert_not_called()
+
+    def test_failed_flush_keeps_buffer(self):
+        counters.record_view(self.first.pk)
+        with mock.patch.object(Product.objects, 'filter', side_effect=DatabaseError('нет соединения')):
+            with self.assertRaises(DatabaseError):
+                counters.flush_views()
+        self.assertEqual(counters.pending_views(self.first.pk), 1)
+
+        counters.record_view(self.first.pk)
+        # Сначала дописывается неподтверждённый сброс, затем новые просмотры
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(counters.flush_views(), 1)
+        self.assertEqual(self.views()[self.first.pk], 12)
+
+    def test_request_does_not_flush(self):
+        with mock.patch.object(counters, 'flush_views') as flush:
+            for _ in range(3):
+                self.assertEqual(self.client.get(reverse('catalog:product_detail', args=[self.first.pk])).status_code, 200)
+        flush.assert_not_called()
+        self.assertEqual(counters.pending_views(self.first.pk), 3)
+        self.assertEqual(self.views()[self.first.pk], 10)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CategoryDeleteTest(TestCase):
+    """Переименование и удаление категории сбрасывают страницы её продуктов одним поколением."""
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(email='owner@example.com', password='pass')
+        self.category = Category.objects.create(name='Рассылки')
+        self.product = Product.objects.create(
+            name='Продукт', price=Decimal('100.00'), category=self.category, owner=owner, is_published=True
+        )
+        self.url = reverse('catalog:product_detail', args=[self.product.pk])
+
+    def cached_page(self):
+        request = RequestFactory().get(self.url)
+        request.user = AnonymousUser()
+        return page_cache.get_page(request, self.product.pk)[0]
+
+    def test_products_of_deleted_category_are_purged(self):
+        self.assertContains(self.client.get(self.url), 'Рассылки')
+        self.assertIsNotNone(self.cached_page())
+        updated_at = Product.objects.get(pk=self.product.pk).updated_at
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+
+        self.assertIsNone(self.cached_page())
+        self.product.refresh_from_db()
+        self.assertIsNone(self.product.category_id)
+        # Новый updated_at — новые ключи карточек и новый ETag
+        self.assertGreater(self.product.updated_at, updated_at)
+        self.assertNotContains(self.client.get(self.url), 'Рассылки')
+
+    def test_rename_bumps_generation_without_purging_pages(self):
+        self.assertContains(self.client.get(self.url), 'Рассылки')
+        with mock.patch.object(page_cache, 'purge_product_pages') as purge, \
+                self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            self.category.name = 'Боты'
+            self.category.save()
+        purge.assert_not_called()
+
+        self.assertIsNone(self.cached_page())
+        self.assertContains(self.client.get(self.url), 'Боты')
+        self.assertIsNotNone(self.cached_page())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CategorySummaryTest(TestCase):
+    """Сводки категорий обновляются разницей и совпадают с полным пересчётом."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email='owner@example.com', password='pass')
+        self.bots = Category.objects.create(name='Боты')
+        self.mail = Category.objects.create(name='Рассылки')
+        self.products = [
+            self.create(f'Бот {price}', price, self.bots) for price in ('100.00', '200.00', '300.00')
+        ] + [self.create('Рассылка', '500.00', self.mail)]
+
+    def create(self, name, price, category, is_published=True):
+        return Product.objects.create(
+            name=name, price=Decimal(price), category=category, owner=self.owner, is_published=is_published
+        )
+
+    def summaries(self):
+        return {
+            row[0]: row[1:]
+            for row in CategorySummary.objects.values_list(
+                'category_id', 'published_count', 'min_price', 'max_price', 'last_updated'
+            )
+        }
+
+    def assertSummary(self, category, count, min_price=None, max_price=None):
+        summary = CategorySummary.objects.get(pk=category.pk)
+        self.assertEqual(
+            (summary.published_count, summary.min_price, summary.max_price),
+            (count, min_price and Decimal(min_price), max_price and Decimal(max_price)),
+        )
+        # Сводка, которую вели разницей, совпадает с полным пересчётом
+        kept = self.summaries()
+        CategorySummary.rebuild()
+        self.assertEqual(self.summaries(), kept)
+
+    def test_create_and_delete(self):
+        self.assertSummary(self.bots, 3, '100.00', '300.00')
+        self.products[0].delete()
+        self.assertSummary(self.bots, 2, '200.00', '300.00')
+        for product in self.products[1:3]:
+            product.delete()
+        self.assertSummary(self.bots, 0)
+
+    def test_publish_and_unpublish(self):
+        middle = Product.objects.get(pk=self.products[1].pk)
+        middle.is_published = False
+        middle.save()
+        self.assertSummary(self.bots, 2, '100.00', '300.00')
+
+        self.create('Бот 50', '50.00', self.bots, is_published=False)
+        Product.objects.filter(name='Бот 50').update(is_published=True)
+        self.assertSummary(self.bots, 3, '50.00', '300.00')
+
+    def test_category_move(self):
+        product = Product.objects.get(pk=self.products[2].pk)
+        product.category = self.mail
+        product.save()
+        self.assertSummary(self.bots, 2, '100.00', '200.00')
+        self.assertSummary(self.mail, 2, '300.00', '500.00')
+
+        Product.objects.filter(category=self.mail).update(category=self.bots)
+        self.assertSummary(self.bots, 4, '100.00', '500.00')
+        self.assertSummary(self.mail, 0)
+
+    def test_bulk_update(self):
+        products = list(Product.objects.filter(category=self.bots))
+        for product in products:
+            product.price += 1000
+        products[0].category = self.mail
+        Product.objects.bulk_update(products, ['price', 'category'])
+        self.assertSummary(self.bots, 2, '1200.00', '1300.00')
+        self.assertSummary(self.mail, 2, '500.00', '1100.00')
+
+    def test_recompute_only_when_bound_leaves(self):
+        aggregate = mock.patch.object(CategorySummary, '_aggregate', wraps=CategorySummary._aggregate)
+
+        # Средняя цена и новые крайние цены — только разница
+        with aggregate as spy:
+            product = Product.objects.get(pk=self.products[1].pk)
+            product.price = Decimal('250.00')
+            product.save()
+            self.create('Бот 10', '10.00', self.bots)
+        spy.assert_not_called()
+        self.assertSummary(self.bots, 4, '10.00', '300.00')
+
+        # Уходит продукт с минимальной ценой — категория пересчитывается
+        with aggregate as spy:
+            Product.objects.get(name='Бот 10').delete()
+        spy.assert_called_once()
+        self.assertSummary(self.bots, 3, '100.00', '300.00')
+
+    def test_rebuild_command(self):
+        CategorySummary.objects.filter(pk=self.bots.pk).update(published_count=42, min_price=None)
+        CategorySummary.objects.filter(pk=self.mail.pk).delete()
+        out = StringIO()
+        call_command('rebuild_category_summaries', stdout=out)
+        self.assertIn('категорий с опубликованными продуктами: 2', out.getvalue())
+        self.assertSummary(self.bots, 3, '100.00', '300.00')
+        self.assertSummary(self.mail, 1, '500.00', '500.00')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CardFragmentsTest(TestCase):
+    """Карточки собираются из кеша одним get_many; своё у каждого пользователя в кеш не попадает."""
+
+    CARD = 'catalog/includes/inc_product_card.html'
+    COMPACT = 'catalog/includes/inc_product_card_compact.html'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@example.com', password='pass')
+        category = Category.objects.create(name='Рассылки')
+        Product.objects.bulk_create(
+            Product(name=f'Продукт {i}', price=Decimal('100.00'), category=category, owner=cls.owner,
+                    is_published=True)
+            for i in range(10)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def rows(self, **flags):
+        rows = listing.build_rows(Product.objects.order_by('pk'))
+        for row in rows:
+            for name, value in flags.items():
+                setattr(row, name, value)
+        return rows
+
+    def render(self, rows, template_name=CARD):
+        request = RequestFactory().get('/')
+        html = Template(
+            '{% load catalog_cards %}{% product_cards rows template_name %}'
+        ).render(Context({'request': request, 'rows': rows, 'template_name': template_name}))
+        return html, request.card_cache_stats
+
+    def test_one_get_many_per_page(self):
+        rows = self.rows()
+        with benchmark.CacheCallCounter() as cold:
+            self.render(rows)
+        # Промахи: один get_many и один set_many
+        self.assertEqual(cold.calls, 2)
+        with benchmark.CacheCallCounter() as warm:
+            self.render(rows)
+        self.assertEqual(warm.calls, 1)
+
+    def test_hit_miss_stats(self):
+        rows = self.rows()
+        before = dict(fragments.stats)
+        self.assertEqual(self.render(rows)[1], {'hits': 0, 'misses': 10})
+        self.assertEqual(self.render(rows)[1], {'hits': 10, 'misses': 0})
+        self.assertEqual(fragments.stats['hits'] - before['hits'], 10)
+        self.assertEqual(fragments.stats['misses'] - before['misses'], 10)
+
+    def test_only_changed_card_rerendered(self):
+        self.render(self.rows())
+        product = Product.objects.order_by('pk').first()
+        product.name = 'Переименованный'
+        product.save()
+
+        html, stats = self.render(self.rows())
+        self.assertEqual(stats, {'hits': 9, 'misses': 1})
+        self.assertIn('Переименованный', html)
+        self.assertNotIn('Продукт 0', html)
+
+    def test_fragment_per_permission_class(self):
+        viewer, moderator, owner = self.rows(), self.rows(can_delete=True), self.rows(can_edit=True, can_delete=True)
+        self.assertEqual(len({fragments.fragment_key(self.CARD, rows[0]) for rows in (viewer, moderator, owner)}), 3)
+
+        html, _ = self.render(owner)
+        self.assertIn('Редактировать', html)
+        html, stats = self.render(viewer)
+        # Карточка владельца не досталась читателю
+        self.assertEqual(stats, {'hits': 0, 'misses': 10})
+        self.assertNotIn('Редактировать', html)
+        self.assertNotIn('Удалить', html)
+        html, stats = self.render(moderator)
+        self.assertEqual(stats, {'hits': 0, 'misses': 10})
+        self.assertIn('Удалить', html)
+        self.assertNotIn('Редактировать', html)
+
+    def test_user_markers_replaced_and_not_cached(self):
+        rows = self.rows(can_edit=True)
+        tokens = set()
+        for _ in range(2):
+            html, _ = self.render(rows)
+            self.assertNotIn(CSRF_MARK, html)
+            tokens.add(re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', html).group(1))
+        # У каждого запроса свой токен, хотя вторая страница целиком из кеша
+        self.assertEqual(len(tokens), 2)
+        cached = cache.get(fragments.fragment_key(self.CARD, rows[0]))
+        self.assertIn(CSRF_MARK, cached)
+        self.assertFalse(any(token in cached for token in tokens))
+
+        rows = self.rows()
+        rows[0].views_total = 41
+        html, _ = self.render(rows, self.COMPACT)
+        self.assertIn('Просмотров: 41', html)
+        self.assertNotIn(VIEWS_MARK, html)
+        rows[0].views_total = 42
+        html, stats = self.render(rows, self.COMPACT)
+        self.assertEqual(stats['misses'], 0)
+        self.assertIn('Просмотров: 42', html)
+        self.assertIn(VIEWS_MARK, cache.get(fragments.fragment_key(self.COMPACT, rows[0])))
+
+
+class KeysetPaginationTest(TestCase):
+    """Постраничный вывод по (name, id): каждая строка ровно один раз в обе стороны, с границей диапазона."""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(email='owner@example.com', password='pass')
+        # Повторяющиеся имена: порядок внутри имени задаёт id
+        Product.objects.bulk_create(
+            Product(name=f'Продукт {i % 4}', price=Decimal('100.00'), owner=owner, is_published=True)
+            for i in range(17)
+        )
+        cls.expected = list(Product.objects.order_by('name', 'pk').values_list('pk', flat=True))
+
+    def fetch(self, cursor):
+        queryset = keyset_queryset(Product.objects.all(), cursor, page_size=5)
+        return queryset, make_page(list(queryset), cursor, page_size=5)
+
+    def test_walk_forward_and_back(self):
+        pages, cursor = [], None
+        while True:
+            _, page = self.fetch(cursor)
+            pages.append([product.pk for product in page])
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(sum(pages, []), self.expected)
+
+        back = [pages[-1]]
+        while page.has_previous:
+            _, page = self.fetch(page.prev_cursor)
+            back.insert(0, [product.pk for product in page])
+        self.assertEqual(back, pages)
+
+    def test_range_bound_on_leading_key(self):
+        _, first = self.fetch(None)
+        queryset, _ = self.fetch(first.next_cursor)
+        # Без «name >= ...» условие — один OR, и индекс читается с начала
+        self.assertIn('"catalog_product"."name" >=', str(queryset.query))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchTest(TestCase):
+    """Полнотекстовый поиск: релевантность, переиндексация массовых операций, удаление."""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(email='owner@example.com', password='pass')
+        cls.by_name, cls.by_description, cls.other = Product.objects.bulk_create([
+            Product(name='Рассылка писем', description='Отправка по базе', price=Decimal('100.00'),
+                    owner=owner, is_published=True),
+            Product(name='Бот', description='Умеет делать рассылка', price=Decimal('100.00'),
+                    owner=owner, is_published=True),
+            Product(name='Кофе', description='Зерновой', price=Decimal('100.00'), owner=owner, is_published=True),
+        ])
+
+    def found(self, text, **kwargs):
+        return [row.pk for row in search_products(text, **kwargs)]
+
+    def test_name_ranks_above_description(self):
+        self.assertEqual(self.found('рассылка'), [self.by_name.pk, self.by_description.pk])
+        # Префиксный поиск и курсор следующей страницы
+        page = search_products('рассыл', page_size=1)
+        self.assertEqual([row.pk for row in page], [self.by_name.pk])
+        self.assertEqual(self.found('рассыл', cursor=page.next_cursor, page_size=1), [self.by_description.pk])
+
+    def test_reindex_on_update_and_bulk_update(self):
+        Product.objects.filter(pk=self.other.pk).update(name='Кофе для рассылка')
+        self.assertIn(self.other.pk, self.found('рассылка'))
+
+        self.other.name = 'Чай'
+        Product.objects.bulk_update([self.other], ['name'])
+        self.assertEqual(self.found('чай'), [self.other.pk])
+        self.assertNotIn(self.other.pk, self.found('рассылка'))
+
+    def test_delete_removes_entry(self):
+        Product.objects.filter(pk=self.by_name.pk).delete()
+        self.assertEqual(self.found('рассылка'), [self.by_description.pk])
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM {search.FTS_TABLE} WHERE rowid = %s', [self.by_name.pk])
+                self.assertEqual(cursor.fetchone()[0], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BannedWordMatcherTest(TestCase):
+    """Общий matcher запрещённых слов для форм каталога и блога."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_inflected_forms(self):
+        matcher = moderation.BannedWordMatcher(moderation.BANNED_WORDS)
+        for text in ('Купите крипту', 'курс криптовалюты', 'на бирже', 'звоните в полицию', 'Казино рядом'):
+            with self.subTest(text=text):
+                self.assertTrue(matcher.contains(text))
+
+    def test_homoglyphs(self):
+        matcher = moderation.BannedWordMatcher(['казино'])
+        # Латинские «a» и «o» вместо кириллических
+        self.assertEqual(matcher.find('лучшее кaзинo города'), 'кaзинo')
+        self.assertTrue(matcher.contains('KAЗИНО'))
+
+    def test_legitimate_words_with_banned_stem(self):
+        matcher = moderation.BannedWordMatcher(moderation.BANNED_WORDS)
+        for text in ('Курс по криптографии', 'криптография', 'полицейский сериал', 'биржевой'):
+            with self.subTest(text=text):
+                self.assertFalse(matcher.contains(text))
+
+    def test_new_banned_word_without_restart(self):
+        self.assertFalse(moderation.contains_banned_word('Продаём спам-базы'))
+        BannedWord.objects.create(word='спам')
+        with mock.patch.object(moderation, 'RELOAD_CHECK_INTERVAL', 0):
+            self.assertTrue(moderation.contains_banned_word('Продаём спам-базы'))
+            form = ProductForm(data={'name': 'Спам по базе', 'description': '', 'price': '100'})
+            self.assertFalse(form.is_valid())
+            self.assertIn('name', form.errors)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductPageCacheTest(TestCase):
+    """Общая закешированная страница продукта: личные части не переходят между пользователями."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@example.com', password='pass')
+        cls.owner.user_permissions.add(
+            Permission.objects.get(codename='can_unpublish_product', content_type__app_label='catalog')
+        )
+        cls.other = User.objects.create_user(email='other@example.com', password='pass')
+        cls.product = Product.objects.create(
+            name='Рассылка писем', price=Decimal('100.00'), owner=cls.owner, is_published=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(counters, '_buffer', counters.LocalViewBuffer())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('catalog:product_detail', args=[self.product.pk])
+        self.edit_url = reverse('catalog:product_update', args=[self.product.pk])
+        self.clients = {'anon': Client(enforce_csrf_checks=True)}
+        for name, user in (('owner', self.owner), ('other', self.other)):
+            self.clients[name] = Client(enforce_csrf_checks=True)
+            self.clients[name].force_login(user)
+
+    def get(self, name):
+        response = self.clients[name].get(self.url)
+        self.assertEqual(response.status_code, 200)
+        html = response.content.decode()
+        for mark in (page_cache.ACTIONS_MARK, CSRF_MARK, VIEWS_MARK):
+            self.assertNotIn(mark, html)
+        return html
+
+    @staticmethod
+    def csrf_token(html):
+        match = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', html)
+        return match and match.group(1)
+
+    def test_personal_parts_are_not_shared(self):
+        # Первым страницу кеширует посторонний пользователь, затем владелец и аноним получают её из кеша
+        other = self.get('other')
+        self.assertIsNotNone(cache.get(page_cache.page_key(self.product.pk, 'auth')))
+        owner = self.get('owner')
+        anon = self.get('anon')
+
+        self.assertIn(self.edit_url, owner)
+        self.assertNotIn(self.edit_url, other)
+        self.assertNotIn(self.edit_url, anon)
+        self.assertIsNone(self.csrf_token(anon))
+
+        # CSRF-токен из общей страницы принадлежит владельцу: форма снятия с публикации работает
+        token = self.csrf_token(owner)
+        self.assertIsNotNone(token)
+        self.assertNotEqual(token, self.csrf_token(other))
+        unpublish = reverse('catalog:product_unpublish', args=[self.product.pk])
+        self.assertEqual(self.clients['other'].post(unpublish, {'csrfmiddlewaretoken': token}).status_code, 403)
+        self.assertEqual(self.clients['owner'].post(unpublish, {'csrfmiddlewaretoken': token}).status_code, 302)
+
+    def test_views_counter_is_current(self):
+        counts = [int(re.search(r'Просмотров: (\d+)', self.get(name)).group(1)) for name in ('anon', 'owner', 'other')]
+        # Каждый показ учтён, хотя тело страницы одно
+        self.assertEqual(counts, [counts[0], counts[0] + 1, counts[0] + 2])
+
+    def test_save_purges_page(self):
+        self.get('anon')
+        self.get('owner')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Рассылка SMS'
+            self.product.save()
+        for name in AUDIENCES:
+            self.assertIsNone(cache.get(page_cache.page_key(self.product.pk, name)))
+        self.assertIn('Рассылка SMS', self.get('anon'))
+        self.assertIn('Рассылка SMS', self.get('other'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTest(TestCase):
+    """ETag/Last-Modified страниц каталога: 304 без рендера, новые валидаторы после правок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@example.com', password='pass')
+        cls.moderator = User.objects.create_user(email='moderator@example.com', password='pass')
+        cls.moderator.user_permissions.add(
+            Permission.objects.get(codename='can_unpublish_product', content_type__app_label='catalog')
+        )
+        cls.category = Category.objects.create(name='Рассылки')
+        cls.product = Product.objects.create(
+            name='Рассылка писем', price=Decimal('100.00'), category=cls.category, owner=cls.owner, is_published=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(counters, '_buffer', counters.LocalViewBuffer())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def edit(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, value in fields.items():
+                setattr(self.product, name, value)
+            self.product.save()
+
+    def test_product_304_and_new_etag_after_edit(self):
+        url = reverse('catalog:product_detail', args=[self.product.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        # Валидатор взят из кеша страницы — без запросов к БД
+        self.assertEqual(len(queries), 0)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        self.edit(name='Рассылка SMS')
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Рассылка SMS')
+
+    def test_etag_depends_on_user(self):
+        url = reverse('catalog:product_detail', args=[self.product.pk])
+        anon_etag = self.client.get(url)['ETag']
+        self.client.force_login(self.owner)
+        # Кнопки владельца другие — 304 на страницу анонима не отдаётся
+        response = self.revalidate(url, anon_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], anon_etag)
+
+    def test_304_counts_as_view(self):
+        url = reverse('catalog:product_detail', args=[self.product.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        self.assertEqual(counters.pending_views(self.product.pk), 2)
+
+    def test_last_modified_only_for_anonymous(self):
+        url = reverse('catalog:product_detail', args=[self.product.pk])
+        response = self.client.get(url)
+        last_modified = response['Last-Modified']
+        self.assertIn('Cookie', response['Vary'])
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Cookie', response['Vary'])
+
+        # После входа на странице кнопки владельца — дата копии анонима её не подтверждает
+        self.client.force_login(self.owner)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertTrue(response.has_header('ETag'))
+        self.assertIn('Cookie', response['Vary'])
+        self.assertContains(response, 'Редактировать')
+
+    async def test_async_last_modified_only_for_anonymous(self):
+        view = vary_on_cookie(acondition(etag_func=aproduct_etag, last_modified_func=aproduct_last_modified)(
+            AsyncProductDetailView.as_view()
+        ))
+
+        async def get(user, headers=None):
+            request = AsyncRequestFactory().get('/', headers=headers)
+
+            async def auser():
+                return user
+
+            request.auser = auser
+            return await view(request, pk=self.product.pk)
+
+        response = await get(AnonymousUser())
+        last_modified = response['Last-Modified']
+        response = await get(AnonymousUser(), {'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Cookie', response['Vary'])
+
+        response = await get(self.owner, {'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_unpublished_product_has_no_validators(self):
+        self.edit(is_published=False)
+        self.client.force_login(self.moderator)
+        response = self.client.get(reverse('catalog:product_detail', args=[self.product.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_list_and_category_etag_follow_generation(self):
+        for url in (reverse('catalog:product_list'), reverse('catalog:product_category', args=[self.category.slug])):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.assertEqual(self.revalidate(url, etag).status_code, 304)
+
+                self.edit(price=Decimal('150.00'))
+                response = self.revalidate(url, etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PERF_SAMPLE_RATE=1)
+class PerfMiddlewareTest(TestCase):
+    """Профиль запроса из выборки: замеры ставятся на время запроса и снимаются."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@example.com', password='pass')
+        Product.objects.bulk_create(
+            Product(name=f'Продукт {i}', price=Decimal('100.00'), owner=cls.owner, is_published=True)
+            for i in range(3)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertUninstrumented(self):
+        from django.template.backends.django import Template
+
+        self.assertEqual(connection.execute_wrappers, [])
+        self.assertFalse(set(perf.CACHE_METHODS) & set(caches['default'].__dict__))
+        self.assertFalse(hasattr(Template.render, '__wrapped__'))
+
+    def assertProfiled(self, logs, response):
+        record = logs.records[-1].perf
+        self.assertGreater(record['db']['queries'], 0)
+        self.assertGreater(record['cache']['calls'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertIn(f'desc="{record["db"]["queries"]} queries"', response['Server-Timing'])
+
+    def test_sync_request(self):
+        self.assertUninstrumented()
+        with self.assertLogs('config.perf', 'INFO') as logs:
+            response = self.client.get(reverse('catalog:product_list'))
+        self.assertProfiled(logs, response)
+        self.assertUninstrumented()
+
+    async def test_async_request(self):
+        with self.assertLogs('config.perf', 'INFO') as logs:
+            response = await self.async_client.get(reverse('catalog:product_list'))
+        self.assertProfiled(logs, response)
+        await sync_to_async(self.assertUninstrumented)()
+
+    def test_unsampled_request(self):
+        with override_settings(PERF_SAMPLE_RATE=0), self.assertNoLogs('config.perf'):
+            response = Client().get(reverse('catalog:product_list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertUninstrumented()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AddTestProductsTest(TestCase):
+    """Генератор данных: одно зерно — одни данные, повторный запуск без --clear запрещён."""
+
+    OPTIONS = {'products': 60, 'categories': 4, 'users': 3, 'posts': 5}
+
+    def generate(self, **options):
+        call_command('add_test_products', **{**self.OPTIONS, **options}, stdout=StringIO())
+
+    def snapshot(self):
+        products = Product.objects.order_by('name').values_list(
+            'name', 'description', 'price', 'category__slug', 'owner__email', 'is_published', 'views_counter',
+        )
+        return list(products), list(BlogPost.objects.order_by('title').values_list('title', 'content'))
+
+    def test_same_seed_same_data(self):
+        # Чужая категория не должна попасть в выборку категорий генератора
+        Category.objects.create(name='Чужая', slug='chuzhaya-7')
+        self.generate(seed=7)
+        first = self.snapshot()
+        self.assertEqual(len(first[0]), 60)
+        seeded = set(Category.objects.exclude(name='Чужая').values_list('slug', flat=True))
+        self.assertEqual(len(seeded), 4)
+        self.assertLessEqual(set(Product.objects.values_list('category__slug', flat=True)), seeded)
+
+        self.generate(seed=7, clear=True)
+        self.assertEqual(self.snapshot(), first)
+        self.generate(seed=8, clear=True)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_second_run_without_clear_fails(self):
+        self.generate(seed=7)
+        with self.assertRaisesMessage(CommandError, 'Данные с зерном 7 уже есть'):
+            self.generate(seed=7)
+        self.assertEqual(Product.objects.count(), 60)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ExplainHotQueriesTest(TestCase):
+    """Планы горячих запросов: дальняя страница должна читать индекс с границы курсора."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('add_test_products', seed=1, products=300, categories=5, users=5, posts=0, stdout=StringIO())
+
+    def test_plans_pass(self):
+        out = StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        self.assertNotIn('❌', out.getvalue())
+
+    def test_unbounded_cursor_fails(self):
+        def without_leading_bound(queryset, cursor, page_size=PAGE_SIZE):
+            decoded = decode_cursor(cursor)
+            if decoded is None:
+                return keyset_queryset(queryset, cursor, page_size)
+            _, name, pk = decoded
+            return queryset.filter(Q(name__gt=name) | Q(name=name, pk__gt=pk)).order_by('name', 'pk')[:page_size + 1]
+
+        out = StringIO()
+        with mock.patch('catalog.hot_queries.keyset_queryset', without_leading_bound):
+            with self.assertRaises(CommandError):
+                call_command('explain_hot_queries', 'published_page_deep', 'category_page_deep', stdout=out)
+        self.assertIn('❌ published_page_deep: нет условия индекса по name', out.getvalue())
+        self.assertIn('❌ category_page_deep: нет условия индекса по name', out.getvalue())
+
+    def test_postgresql_filter_without_index_cond(self):
+        plan = (
+            "Limit  (cost=0.28..10.50 rows=25 width=100)\n"
+            "  ->  Index Scan using product_published_page_idx on catalog_product  (cost=0.28..500.00 rows=1000 width=100)\n"
+            "        Filter: ((name > 'x'::text) OR ((name = 'x'::text) AND (id > 5)))\n"
+            "        Rows Removed by Filter: 1800"
+        )
+        findings = explain_hot_queries.Command()._findings(plan, 'postgresql', set(), ('name',), 100)
+        self.assertEqual(len(findings), 2)
+
+        # С границей по имени фильтр отбрасывает только строки с тем же именем
+        bounded = plan.replace("        Filter:", "        Index Cond: (name >= 'x'::text)\n        Filter:")
+        self.assertEqual(explain_hot_queries.Command()._findings(
+            bounded.replace('Rows Removed by Filter: 1800', 'Rows Removed by Filter: 2'),
+            'postgresql', set(), ('name',), 100,
+        ), [])
+        self.assertEqual(len(explain_hot_queries.Command()._findings(bounded, 'postgresql', set(), ('name',), 100)), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LegacyCategoryRedirectTest(TestCase):
+    """Старые адреса категорий по имени навсегда ведут на адрес по слагу."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_name_redirects_to_slug(self):
+        category = Category.objects.create(name='Рассылки')
+        self.assertEqual(category.slug, 'rassylki')
+
+        response = self.client.get('/category/Рассылки/?cursor=abc')
+        self.assertRedirects(response, '/category/rassylki/?cursor=abc', status_code=301,
+                             fetch_redirect_response=False)
+        self.assertEqual(self.client.get('/category/rassylki/').status_code, 200)
+
+    def test_latin_name_falls_back_to_redirect(self):
+        # Такое имя подходит и под шаблон слага — представление категории само уходит на редирект
+        Category.objects.create(name='Bots')
+        self.assertRedirects(self.client.get('/category/BOTS/'), '/category/bots/', status_code=301,
+                             fetch_redirect_response=False)
+
+    def test_unknown_name_is_404(self):
+        self.assertEqual(self.client.get('/category/Нет такой/').status_code, 404)
+
+    def test_rename_keeps_slug(self):
+        category = Category.objects.create(name='Рассылки')
+        self.client.get('/category/Рассылки/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            category.name = 'Email-рассылки'
+            category.save()
+
+        category.refresh_from_db()
+        self.assertEqual(category.slug, 'rassylki')
+        self.assertContains(self.client.get('/category/rassylki/'), 'Email-рассылки')
+        self.assertRedirects(self.client.get('/category/Email-рассылки/'), '/category/rassylki/',
+                             status_code=301, fetch_redirect_response=False)
+        # Закешированное соответствие прежнего имени сброшено вместе с поколением категорий
+        self.assertEqual(self.client.get('/category/Рассылки/').status_code, 404)
+
+    def test_colliding_names_get_unique_slugs(self):
+        first = Category.objects.create(name='Рассылки')
+        second = Category.objects.create(name='Рассылки!')
+        third = Category.objects.create(name='Рассылки')
+        self.assertEqual([first.slug, second.slug, third.slug], ['rassylki', 'rassylki-2', 'rassylki-3'])
+
+        # Из одноимённых категорий старый адрес ведёт на созданную первой
+        self.assertRedirects(self.client.get('/category/Рассылки/'), '/category/rassylki/', status_code=301,
+                             fetch_redirect_response=False)
+
+
+@override_settings(CACHES={
+    **LOCMEM_CACHES,
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-shared'},
+})
+class TieredCacheTest(SimpleTestCase):
+    """Два воркера с общим «Redis» (locmem) и своими LRU в памяти процесса."""
+
+    def worker(self, name, **options):
+        self.addCleanup(tiered_cache._tiers.pop, name, None)
+        return tiered_cache.TieredCache(name, {'OPTIONS': {
+            'REMOTE': 'shared', 'CHANNEL_BACKEND': 'local', 'CHANNEL': self.id(), **options,
+        }})
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.a = self.worker('worker-a')
+        self.b = self.worker('worker-b')
+        self.key = make_key('products', 'published', 1)
+
+    def test_hot_keys_served_from_memory(self):
+        self.a.set(self.key, b'rows')
+        for _ in range(3):
+            self.assertEqual(self.b.get(self.key), b'rows')
+        stats = self.b.stats()
+        self.assertEqual(stats['remote']['hits'], 1)
+        self.assertEqual(stats['local']['hits'], 2)
+
+    def test_writes_invalidate_other_workers(self):
+        generation = make_key('gen', 'global')
+        self.a.set(self.key, b'old')
+        self.a.set(generation, 1)
+        self.assertEqual(self.b.get_many([self.key, generation]), {self.key: b'old', generation: 1})
+
+        self.a.set(self.key, b'new')
+        self.a.incr(generation)
+        self.assertEqual(self.b.get(self.key), b'new')
+        self.assertEqual(self.b.get(generation), 2)
+
+        self.a.delete(self.key)
+        self.assertIsNone(self.b.get(self.key))
+
+    def test_local_tier_is_bounded(self):
+        worker = self.worker('worker-small', MAX_ENTRIES=2)
+        keys = [make_key('products', 'published', n) for n in range(3)]
+        for key in keys:
+            worker.set(key, b'rows')
+        self.assertEqual(worker.stats()['local']['entries'], 2)
+        # Первый ключ вытеснен и читается из Redis
+        worker.get(keys[0])
+        self.assertEqual(worker.stats()['remote']['hits'], 1)
+
+    def test_local_entries_expire(self):
+        self.b.get(self.key)
+        self.a.set(self.key, b'rows')
+        self.assertEqual(self.b.get(self.key), b'rows')
+        # Сообщение об изменении потерялось — копия живёт не дольше LOCAL_TIMEOUT
+        caches['shared'].set(self.key, b'new')
+        self.assertEqual(self.b.get(self.key), b'rows')
+        with mock.patch('config.tiered_cache.time.monotonic', return_value=time.monotonic() + 60):
+            self.assertEqual(self.b.get(self.key), b'new')
+
+    def test_other_keys_bypass_memory(self):
+        self.a.set('catalog:views:flush_lock', 1)
+        self.b.get('catalog:views:flush_lock')
+        self.b.get('catalog:views:flush_lock')
+        self.assertEqual(self.b.stats()['remote']['hits'], 2)
+        self.assertEqual(self.b.stats()['local']['entries'], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CacheStampedeTest(TransactionTestCase):
+    """Сотня одновременных промахов или пересчётов после срока — один запрос продуктов к БД."""
+
+    CLIENTS = 100
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(email='owner@example.com', password='pass')
+        self.category = Category.objects.create(name='Рассылки')
+        Product.objects.bulk_create(
+            Product(name=f'Продукт {i}', price=Decimal('100.00'), category=self.category,
+                    owner=owner, is_published=True)
+            for i in range(20)
+        )
+
+    def run_parallel(self, func):
+        """Вызывает ``func`` из CLIENTS потоков разом; возвращает длины результатов и число SQL по продуктам."""
+        queries = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(self.CLIENTS)
+
+        def count(execute, sql, params, many, context):
+            if 'catalog_product' in sql:
+                with lock:
+                    queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def client(_):
+            try:
+                with connection.execute_wrapper(count):
+                    barrier.wait()
+                    return len(func())
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.CLIENTS) as pool:
+            lengths = list(pool.map(client, range(self.CLIENTS)))
+        return lengths, len(queries)
+
+    def expire(self, key):
+        # Срок записи вышел, но она ещё в кеше — как через CATALOG_CACHE_TIMEOUT
+        payload, _, delta = cache.get(key)
+        cache.set(key, (payload, time.time() - 1, delta))
+
+    def page_key(self, *parts):
+        return make_key('products', *parts, 'page', PAGE_SIZE, 'first') + f':p{PAYLOAD_VERSION}'
+
+    def assertOneComputePerGeneration(self, get_page, key, bump):
+        self.assertEqual(self.run_parallel(get_page), ([20] * self.CLIENTS, 1))
+
+        self.expire(key())
+        self.assertEqual(self.run_parallel(get_page), ([20] * self.CLIENTS, 1))
+        # Пересчитанная запись снова свежая
+        self.assertEqual(self.run_parallel(get_page), ([20] * self.CLIENTS, 0))
+
+        # Новое поколение — снова один запрос на всех
+        bump()
+        self.assertEqual(self.run_parallel(get_page), ([20] * self.CLIENTS, 1))
+
+    def test_published_page(self):
+        self.assertOneComputePerGeneration(
+            lambda: services.get_published_page(None).rows,
+            lambda: self.page_key('published', services.get_generation()),
+            bump_generation,
+        )
+
+    def test_category_page(self):
+        scope = category_scope(self.category.pk)
+        self.assertOneComputePerGeneration(
+            lambda: services.get_category_page(self.category.pk, None).rows,
+            lambda: self.page_key('category_id', self.category.pk, services.get_generation(scope)),
+            lambda: bump_generation(scope),
+        )
+
+    def test_lock_released_only_by_owner(self):
+        key = make_key('slow')
+        lock_key = caching.LOCK_PREFIX + key
+
+        def slow_compute():
+            # Пересчёт затянулся: блокировка истекла, и её взял другой процесс
+            cache.set(lock_key, 'other')
+            return 'value'
+
+        self.assertEqual(caching.get_or_compute(key, slow_compute), 'value')
+        self.assertEqual(cache.get(lock_key), 'other')
+
+        cache.delete(key)
+        cache.delete(lock_key)
+        self.assertEqual(caching.get_or_compute(key, lambda: 'value'), 'value')
+        self.assertIsNone(cache.get(lock_key))
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379',
+    }})
+    def test_late_release_keeps_reacquired_lock_on_redis(self):
+        backend = caches['default']
+        full_key = backend.make_and_validate_key(caching.LOCK_PREFIX + 'slow')
+        dumps = backend._cache._serializer.dumps
+        # Наша блокировка истекла, и её взял другой процесс
+        store = {full_key: dumps('other')}
+
+        def run_script(script, numkeys, key, token):
+            # То, что делает RELEASE_SCRIPT в Redis, — без сервера
+            self.assertEqual((script, numkeys), (caching.RELEASE_SCRIPT, 1))
+            if store.get(key) != token:
+                return 0
+            del store[key]
+            return 1
+
+        # Только eval: get и delete по отдельности оставили бы окно между ними
+        client = mock.Mock(spec=['eval'])
+        client.eval.side_effect = run_script
+        with mock.patch('django.core.cache.backends.redis.RedisCacheClient.get_client', return_value=client):
+            caching._release('slow', 'mine')
+            async_to_sync(caching._arelease)('slow', 'mine')
+            self.assertEqual(store, {full_key: dumps('other')})
+            caching._release('slow', 'other')
+        self.assertEqual(store, {})
+        self.assertEqual(client.eval.call_count, 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ListingPayloadTest(TestCase):
+    """Строки карточек переживают упаковку; нечитаемый payload — промах, а не ошибка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(email='owner@example.com', password='pass')
+        category = Category.objects.create(name='Рассылки')
+        Product.objects.bulk_create(
+            Product(name=f'Продукт {i}', description='Описание ' * 40, price=Decimal('1234.50'),
+                    category=category, owner=owner, is_published=True)
+            for i in range(20)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def page_key(self):
+        return make_key('products', 'published', services.get_generation(), 'page', PAGE_SIZE, 'first')
+
+    def store(self, payload):
+        caching.compute_and_store(self.page_key() + f':p{PAYLOAD_VERSION}', lambda: payload)
+
+    def test_round_trip_keeps_price_and_updated_at(self):
+        rows = listing.build_rows(Product.objects.order_by('pk'))
+        for compress in (False, listing.zstandard is not None):
+            with self.subTest(compress=compress), mock.patch.object(listing, 'COMPRESS', compress):
+                payload = listing.pack_rows(rows)
+                self.assertEqual(payload[:1], listing._ZSTD if compress else listing._RAW)
+                unpacked = listing.unpack_rows(payload)
+                self.assertEqual([row.as_tuple() for row in unpacked], [row.as_tuple() for row in rows])
+
+        product = Product.objects.order_by('pk').first()
+        row = listing.unpack_rows(listing.pack_rows(rows))[0]
+        self.assertEqual(Decimal(row.price), product.price)
+        self.assertEqual(datetime.fromisoformat(row.updated_at), product.updated_at)
+
+    def test_row_attributes_in_template(self):
+        row = listing.unpack_rows(listing.pack_rows(listing.build_rows(Product.objects.order_by('pk')[:1])))[0]
+        row.views_total = 7
+        html = Template('{{ product.name }}|{{ product.price }}|{{ product.views_total }}|{{ product.missing }}').render(
+            Context({'product': row})
+        )
+        self.assertEqual(html, 'Продукт 0|1234.50|7|')
+
+    def test_other_version_is_miss(self):
+        stale = listing._RAW + msgpack.packb([PAYLOAD_VERSION - 1, [('старый',)]], use_bin_type=True)
+        self.assertIsNone(listing.unpack_rows(stale))
+
+        self.store(stale)
+        self.assertEqual(len(services.get_published_page(None).rows), 20)
+        # Запись перезаписана текущей версией
+        with self.assertNumQueries(0):
+            self.assertEqual(len(services.get_published_page(None).rows), 20)
+
+    @skipUnless(listing.zstandard, 'нужен zstandard')
+    def test_corrupt_payload_recomputed(self):
+        with mock.patch.object(listing, 'COMPRESS', True):
+            payload = listing.pack_rows(listing.build_rows(Product.objects.all()))
+        self.assertEqual(payload[:1], listing._ZSTD)
+
+        for broken in (payload[:len(payload) // 2], payload[:3], listing._ZSTD + b'not zstd', b'\x07' + payload[1:]):
+            with self.subTest(broken=broken[:8]):
+                self.assertIsNone(listing.unpack_rows(broken))
+                self.store(broken)
+                self.assertEqual(len(services.get_published_page(None).rows), 20)
+                self.assertIsNotNone(listing.unpack_rows(cache.get(self.page_key() + f':p{PAYLOAD_VERSION}')[0]))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FacetedBrowseTest(TestCase):
+    """Фасеты просмотра каталога: верные счётчики одним агрегатным запросом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@example.com', password='pass')
+        cls.other = User.objects.create_user(email='other@example.com', password='pass')
+        cls.mailing = Category.objects.create(name='Рассылки')
+        cls.bots = Category.objects.create(name='Боты')
+        cls.hidden = Category.objects.create(name='Черновики')
+        Product.objects.bulk_create(
+            Product(name=f'Продукт {i}', price=Decimal(price), category=category, owner=owner, is_published=published)
+            for i, (price, category, owner, published) in enumerate([
+                ('100.00', cls.mailing, cls.owner, True),
+                ('600.00', cls.mailing, cls.owner, True),
+                ('1200.00', cls.mailing, cls.owner, True),
+                ('700.00', cls.mailing, cls.other, True),
+                ('100.00', cls.mailing, cls.owner, False),
+                ('50.00', cls.bots, cls.owner, True),
+                ('20000.00', cls.bots, cls.owner, True),
+                ('100.00', cls.hidden, cls.owner, False),
+                ('300.00', None, cls.owner, True),
+            ])
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def browse(self, **params):
+        response = self.client.get(reverse('catalog:product_browse'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    @staticmethod
+    def category_counts(facets):
+        return {category['slug']: (category['count'], category['selected']) for category in facets['categories']}
+
+    @staticmethod
+    def price_counts(facets):
+        return [price['count'] for price in facets['prices']]
+
+    def test_without_filters(self):
+        context = self.browse()
+        facets = context['facets']
+        self.assertEqual(self.category_counts(facets), {
+            self.mailing.slug: (4, False), self.bots.slug: (2, False),
+        })
+        self.assertEqual(self.price_counts(facets), [3, 2, 1, 0, 1])
+        self.assertEqual(facets['total'], 7)
+        self.assertEqual(len(context['products']), 7)
+
+    def test_categories_price_and_owner(self):
+        context = self.browse(category=[self.bots.slug, self.mailing.slug], price_min='500', owner=self.owner.pk)
+        facets = context['facets']
+        # Счётчик категории учитывает цену и владельца, но не выбор категорий
+        self.assertEqual(self.category_counts(facets), {
+            self.mailing.slug: (2, True), self.bots.slug: (1, True),
+        })
+        # Ценовые интервалы учитывают категории и владельца, но не диапазон цен
+        self.assertEqual(self.price_counts(facets), [2, 1, 1, 0, 1])
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(sorted(Decimal(p.price) for p in context['products']), [600, 1200, 20000])
+
+        facets = self.browse(category=self.bots.slug, price_max='999.99')['facets']
+        self.assertEqual(self.category_counts(facets), {
+            self.mailing.slug: (3, False), self.bots.slug: (1, True),
+        })
+        self.assertEqual(self.price_counts(facets), [1, 0, 0, 0, 1])
+        self.assertEqual(facets['total'], 1)
+
+    def test_links_toggle_filters(self):
+        facets = self.browse(category=self.mailing.slug, price_min='0', price_max='499.99')['facets']
+        links = {category['slug']: category['query'] for category in facets['categories']}
+        self.assertNotIn('category=', links[self.mailing.slug])
+        self.assertIn(f'category={self.bots.slug}', links[self.bots.slug])
+        self.assertIn(f'category={self.mailing.slug}', links[self.bots.slug])
+        selected = [price for price in facets['prices'] if price['selected']]
+        self.assertEqual([(p['min'], p['max']) for p in selected], [(Decimal('0'), Decimal('499.99'))])
+        self.assertEqual(selected[0]['query'], f'category={self.mailing.slug}')
+
+    def test_unknown_category_and_bad_values(self):
+        context = self.browse(category='net-takoy', price_min='abc', owner='-1')
+        self.assertEqual(context['facets']['total'], 0)
+        self.assertEqual(list(context['products']), [])
+        self.assertIsNone(context['filters'].price_min)
+        self.assertIsNone(context['filters'].owner_id)
+
+    def test_one_aggregate_query_cached_per_signature(self):
+        with CaptureQueriesContext(connection) as queries:
+            services.get_browse_facets(BrowseFilters(price_min=Decimal('500')))
+        self.assertEqual(len(queries), 1)
+        self.assertIn('GROUP BY', queries[0]['sql'])
+
+        # Выбор категорий строки фасетов не меняет — они из кеша
+        with self.assertNumQueries(0):
+            services.get_browse_facets(BrowseFilters(category_slugs=[self.bots.slug], price_min=Decimal('500')))
+        with self.assertNumQueries(1):
+            services.get_browse_facets(BrowseFilters(price_min=Decimal('600')))
+
+        # Изменение продуктов сменяет поколение — счётчики пересчитываются
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(category=self.bots).update(price=Decimal('900.00'))
+        facets = services.get_browse_facets(BrowseFilters(price_min=Decimal('500')))
+        self.assertEqual(self.category_counts(facets)[self.bots.slug], (2, False))
+
+
+class StaticFilesTest(SimpleTestCase):
+    """collectstatic пишет копии с хешем и сжатые копии, приложение отдаёт их по Accept-Encoding."""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings = override_settings(STATIC_ROOT=root.name, STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'config.staticfiles.CompressedManifestStaticFilesStorage'},
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['admin'])
+        self.url = static('css/bootstrap.min.css')
+        with staticfiles_storage.open('css/bootstrap.min.css') as file:
+            self.original = file.read()
+
+    def test_hashed_and_precompressed(self):
+        self.assertRegex(self.url, r'^/static/css/bootstrap\.min\.[0-9a-f]{12}\.css$')
+        hashed_name = self.url[len('/static/'):]
+        with staticfiles_storage.open(hashed_name + '.gz') as file:
+            self.assertEqual(gzip.decompress(file.read()), self.original)
+        self.assertTrue(staticfiles_storage.exists(hashed_name + '.zst'))
+
+    def test_served_by_accept_encoding(self):
+        for accept, encoding in [('gzip, deflate, br, zstd', 'zstd'), ('gzip', 'gzip'), ('zstd;q=0, gzip', 'gzip')]:
+            with self.subTest(accept=accept):
+                response = self.client.get(self.url, HTTP_ACCEPT_ENCODING=accept)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Encoding'], encoding)
+                self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+                self.assertLess(len(response.content), len(self.original) / 3)
+
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.original)
+        self.assertEqual(response['Content-Type'], 'text/css')
+
+    def test_unhashed_name_is_not_immutable(self):
+        response = self.client.get('/static/css/bootstrap.min.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        response = self.client.get(
+            '/static/css/bootstrap.min.css', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class CatalogUrlBudgetSmallTest(benchmark.UrlBudgetTestCase):
+    app_label = 'catalog'
+    size = 'small'
+
+
+class CatalogUrlBudgetLargeTest(benchmark.UrlBudgetTestCase):
+    app_label = 'catalog'
+    size = 'large'
@@ -1,25 +1,53 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path, include
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
 from catalog.apps import CatalogConfig
+from catalog.async_views import AsyncHomeView, AsyncProductCategoryView, AsyncProductDetailView, \
+    AsyncProductListView
+from catalog.conditional import category_etag, product_etag, product_last_modified, product_list_etag, \
+    acategory_etag, acondition, aproduct_etag, aproduct_last_modified, aproduct_list_etag
+from catalog.counters import count_views
 from catalog.views import ProductListView, ProductDetailView, ProductCreateView, ProductUpdateView, ProductDeleteView, \
-    ContactsView, HomeView, ProductUnpublishView, ProductCategoryView, CategoryListView
+    ContactsView, HomeView, ProductUnpublishView, ProductCategoryView, CategoryListView, ProductSearchView, \
+    LegacyCategoryRedirectView, ProductBrowseView
 
 app_name = CatalogConfig.name
 
+# ETag зависит от пользователя — и 304, и полный ответ помечаются Vary: Cookie
+if getattr(settings, 'CATALOG_ASYNC_VIEWS', False):
+    # ASGI: те же страницы без блокирующих обращений к кешу и БД
+    product_list_view = vary_on_cookie(acondition(etag_func=aproduct_list_etag)(AsyncProductListView.as_view()))
+    home_view = AsyncHomeView.as_view()
+    product_detail_view = vary_on_cookie(acondition(
+        etag_func=aproduct_etag, last_modified_func=aproduct_last_modified,
+    )(AsyncProductDetailView.as_view()))
+    product_category_view = vary_on_cookie(acondition(etag_func=acategory_etag)(AsyncProductCategoryView.as_view()))
+else:
+    product_list_view = vary_on_cookie(condition(etag_func=product_list_etag)(ProductListView.as_view()))
+    home_view = HomeView.as_view()
+    product_detail_view = vary_on_cookie(condition(
+        etag_func=product_etag, last_modified_func=product_last_modified,
+    )(ProductDetailView.as_view()))
+    product_category_view = vary_on_cookie(condition(etag_func=category_etag)(ProductCategoryView.as_view()))
+
 urlpatterns = [
-    path('', ProductListView.as_view(), name='product_list'),  # Главная — это список товаров
-    path('home/', HomeView.as_view(), name='home'),  # Дополнительно: /home/
+    path('', product_list_view, name='product_list'),  # Главная — это список товаров
+    path('home/', home_view, name='home'),  # Дополнительно: /home/
     path('contacts/', ContactsView.as_view(), name='contacts'),
-    path('product/<int:pk>/', cache_page(60)(ProductDetailView.as_view()), name='product_detail'),
+    path('product/<int:pk>/', count_views(product_detail_view), name='product_detail'),
     path('create/', ProductCreateView.as_view(), name='product_create'),
     path('<int:pk>/update/', ProductUpdateView.as_view(), name='product_update'),
     path('<int:pk>/delete/', ProductDeleteView.as_view(), name='product_delete'),
     path('unpublish/<int:pk>/', ProductUnpublishView.as_view(), name='product_unpublish'),
     path('users/', include('users.urls')),
+    path('search/', ProductSearchView.as_view(), name='product_search'),
+    path('browse/', ProductBrowseView.as_view(), name='product_browse'),
     path('category/', CategoryListView.as_view(), name='category_list'),
-    path('category/<str:category_name>/', ProductCategoryView.as_view(), name='product_category'),
+    path('category/<slug:slug>/', product_category_view, name='product_category'),
+    # Старые адреса по имени категории (кириллица, пробелы) — постоянный редирект на слаг
+    path('category/<str:category_name>/', LegacyCategoryRedirectView.as_view(), name='product_category_legacy'),
 ]
 
 if settings.DEBUG:
@@ -1,66 +1,86 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.http import Http404
+from django.urls import reverse, reverse_lazy
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
 from django.views import View
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView, View
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView, View, \
+    RedirectView
+from .facets import BrowseFilters
 from .forms import ProductForm
 from catalog.models import Product
-from django.core.cache import cache
-from .services import get_products_by_category
+from config.db_router import use_primary
+from .services import get_browse_facets, get_browse_page, get_category_page, get_category_slug_by_name, \
+    get_category_summaries, get_published_page, resolve_category
+from . import page_cache
+from .counters import attach_views_total, pending_views
+from .fragments import CSRF_MARK, VIEWS_MARK
+from .permissions import annotate_permissions
+from .search import search_products
 
 
-def get_products_from_cache():
-    """Получить опубликованные продукты из кеша или из БД"""
-    queryset = cache.get('published_products')
-    if not queryset:
-        queryset = Product.objects.filter(is_published=True)
-        cache.set('published_products', queryset, 60 * 15)  # кешируем на 15 минут
-    return queryset
-
 class ProductListView(ListView):
     model = Product
     template_name = 'catalog/product_list.html'
     context_object_name = 'object_list'
 
     def get_queryset(self):
-        return get_products_from_cache()
+        # Страница по курсору: без OFFSET и COUNT(*)
+        self.page = get_published_page(self.request.GET.get('cursor'))
+        return self.page.rows
 
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        for product in context['object_list']:
-            product.can_edit = user.is_authenticated and user == product.owner
-            product.can_delete = user.is_authenticated and (
-                user == product.owner or user.has_perm('catalog.delete_product')
-            )
+        context['page'] = self.page
+        annotate_permissions(self.request.user, context['object_list'])
         return context
 
 class ProductDetailView(DetailView):
     model = Product
     template_name = 'catalog/product_detail.html'
 
+    def get(self, request, *args, **kwargs):
+        # Общая часть страницы — из кеша, кнопки и CSRF-токен — свои у каждого
+        entry, views_base = page_cache.get_page(request, kwargs['pk'])
+        if entry is not None:
+            return page_cache.page_response(request, kwargs['pk'], entry, views_base)
+
+        # Страница попадёт в кеш — продукт читается не с реплики
+        with use_primary():
+            self.object = self.get_object()
+        context = self.get_context_data(object=self.object)
+        if not self.object.is_published:
+            # Неопубликованный продукт видят только модераторы — не кешируем
+            return self.render_to_response(context)
+
+        context.update(
+            actions=page_cache.ACTIONS_MARK,
+            views_total=VIEWS_MARK,
+            csrf_token=CSRF_MARK,
+        )
+        body = render_to_string(self.template_name, context, request)
+        entry = page_cache.store_page(request, self.object, request.user, body)
+        return page_cache.page_response(request, self.object.pk, entry, self.object.views_counter)
+
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
         if not obj.is_published and not self.request.user.has_perm('catalog.can_unpublish_product'):
             # Если не опубликован и пользователь не модератор — 404
             from django.http import Http404
             raise Http404("Продукт не опубликован и недоступен.")
-        obj.views_counter += 1
-        obj.save()
+        # Просмотр учитывает декоратор count_views в urls.py — без записи в БД
         return obj
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
         product = context['object']
-
-        # Добавляем флаги только для этого продукта
-        context['can_edit'] = user.is_authenticated and user == product.owner
-        context['can_delete'] = user.is_authenticated and (
-                user == product.owner or user.has_perm('catalog.delete_product')
-        )
+        context['views_total'] = product.views_counter + pending_views(product.pk)
+        # Кнопки только для этого продукта (без загрузки владельца)
+        context['actions'] = mark_safe(page_cache.render_actions(self.request, product.pk, product.owner_id))
         return context
 
 class ProductCreateView(LoginRequiredMixin, CreateView):
@@ -72,10 +92,8 @@ class ProductCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.owner = self.request.user
-        response = super().form_valid(form)  # ← сначала сохраняем
-        # Очищаем кеш категории
-        cache.delete(f'products_category_{self.object.category}')
-        return response
+        # Кеш каталога сбрасывается сигналом post_save (catalog/signals.py)
+        return super().form_valid(form)
 
 
 class ProductUpdateView(LoginRequiredMixin, UpdateView):
@@ -93,12 +111,6 @@ class ProductUpdateView(LoginRequiredMixin, UpdateView):
             raise PermissionDenied("Вы не можете редактировать этот продукт.")
         return obj
 
-    def form_valid(self, form):
-        response = super().form_valid(form)
-        # Очищаем кеш старой и новой категории (если изменилась)
-        cache.delete(f'products_category_{self.object.category}')
-        return response
-
 class ProductDeleteView(LoginRequiredMixin, DeleteView):
     model = Product
     template_name = 'catalog/product_confirm_delete.html'
@@ -113,26 +125,13 @@ class ProductDeleteView(LoginRequiredMixin, DeleteView):
             raise PermissionDenied("Вы не можете удалить этот продукт.")
         return obj
 
-    def delete(self, request, *args, **kwargs):
-        # Сохраняем категорию до удаления
-        category = self.get_object().category
-        response = super().delete(request, *args, **kwargs)
-        # Очищаем кеш категории
-        cache.delete(f'products_category_{category}')
-        return response
-
 class HomeView(TemplateView):
     template_name = "catalog/home.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['object_list'] = get_products_from_cache()  # ← из кеша
-        user = self.request.user
-        for product in context['object_list']:
-            product.can_edit = user.is_authenticated and user == product.owner
-            product.can_delete = user.is_authenticated and (
-                    user == product.owner or user.has_perm('catalog.delete_product')
-            )
+        context['page'] = get_published_page(self.request.GET.get('cursor'))  # ← из кеша
+        context['object_list'] = annotate_permissions(self.request.user, context['page'].rows)
         return context
 
 class ContactsView(TemplateView):
@@ -152,19 +151,74 @@ class ProductUnpublishView(LoginRequiredMixin, PermissionRequiredMixin, View):
 
 class ProductCategoryView(View):
     """
-    Отображает все продукты в указанной категории.
-    URL: /category/electronics/
+    Отображает продукты в указанной категории постранично.
+    URL: /category/rassylki/?cursor=...
     """
-    def get(self, request, category_name):
-        products = get_products_by_category(category_name)
-
-        if not products.exists():
-            # Можно показать, что товаров нет
-            pass
+    def get(self, request, slug):
+        category = resolve_category(slug)
+        if category is None:
+            # Латинское имя категории тоже похоже на слаг — пробуем старый адрес
+            return LegacyCategoryRedirectView.as_view()(request, category_name=slug)
+        page = get_category_page(category['id'], request.GET.get('cursor'))
 
         return render(request, 'catalog/product_category.html', {
-            'products': products,
-            'category_name': category_name.capitalize(),
+            'page': page,
+            'products': attach_views_total(page.rows),
+            'category_name': category['name'],
+        })
+
+class ProductBrowseView(View):
+    """
+    Просмотр каталога с фильтрами по категориям, цене и владельцу и
+    счётчиками продуктов по категориям и ценовым интервалам.
+    URL: /browse/?category=rassylki&category=boty&price_min=500&price_max=999.99&owner=3&cursor=...
+    """
+    def get(self, request):
+        filters = BrowseFilters.from_query(request.GET)
+        facets = get_browse_facets(filters)
+        page = get_browse_page(filters, facets, request.GET.get('cursor'))
+        query = filters.querystring()
+
+        return render(request, 'catalog/product_browse.html', {
+            'page': page,
+            'products': attach_views_total(page.rows),
+            'filters': filters,
+            'facets': facets,
+            # Ссылки пагинации должны сохранять фильтры
+            'extra_query': f'{query}&' if query else '',
+        })
+
+class LegacyCategoryRedirectView(RedirectView):
+    """
+    Старые адреса по имени категории: /category/Рассылки/ → /category/rassylki/.
+    Соответствие имени и слага берётся из кеша.
+    """
+    permanent = True
+
+    def get_redirect_url(self, category_name):
+        slug = get_category_slug_by_name(category_name)
+        if slug is None:
+            raise Http404("Категория не найдена.")
+        url = reverse('catalog:product_category', kwargs={'slug': slug})
+        # Курсор страницы сохраняется
+        query = self.request.META.get('QUERY_STRING', '')
+        return f'{url}?{query}' if query else url
+
+class ProductSearchView(View):
+    """
+    Полнотекстовый поиск по опубликованным продуктам.
+    URL: /search/?q=рассылка&cursor=...
+    """
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        page = search_products(query, request.GET.get('cursor'))
+
+        return render(request, 'catalog/product_search.html', {
+            'page': page,
+            'products': attach_views_total(page.rows),
+            'query': query,
+            # Ссылки пагинации должны сохранять поисковый запрос
+            'extra_query': f"{urlencode({'q': query})}&",
         })
 
 class CategoryListView(TemplateView):
@@ -172,10 +226,6 @@ class CategoryListView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Получаем все категории с опубликованными товарами
-        categories = Product.objects.filter(
-            is_published=True,
-            category__isnull=False
-        ).values_list('category__name', flat=True).distinct()
-        context['categories'] = categories
+        # Готовые сводки вместо DISTINCT по всем опубликованным продуктам
+        context['categories'] = get_category_summaries()
         return context
\ No newline at end of file
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+# Под ASGI каталог отдают асинхронные представления (catalog/async_views.py)
+os.environ.setdefault("CATALOG_ASYNC_VIEWS", "1")
 
 application = get_asgi_application()
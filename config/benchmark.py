@@ -0,0 +1,316 @@
+"""
+Бюджеты запросов и задержек для всех именованных URL проекта.
+
+Тесты ``UrlBudgetTestCase`` загружают синтетические данные
+(``add_test_products`` с фиксированным зерном) нескольких размеров и
+открывают каждый URL приложения от имени анонима, владельца продукта и
+модератора — сначала с пустым кешем, затем повторно. Для каждого запроса
+снимаются число SQL-запросов, время в БД, число обращений к кешу и полное
+время ответа; они сравниваются с бюджетами из ``perf_budgets.json``.
+
+Число запросов и обращений к кешу сравнивается точно: рост — это регрессия
+(чаще всего N+1). Время зависит от машины и её загрузки, поэтому по
+умолчанию только выводится в отчёте; сравнение с бюджетом (с запасом в
+``BENCH_TIME_TOLERANCE`` раз) включается переменной ``BENCH_CHECK_TIME=1``
+или настройкой ``BENCH_CHECK_TIME`` — на выделенной машине CI.
+
+Запуск (SQLite и locmem, без Postgres и Redis)::
+
+    python manage.py test catalog blog users --settings=config.settings_bench
+
+После осознанного изменения бюджеты перезаписываются::
+
+    BENCH_UPDATE_BUDGETS=1 python manage.py test catalog blog users --settings=config.settings_bench
+"""
+import gc
+import json
+import math
+import os
+import time
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase
+from django.urls import URLPattern, reverse
+
+from blog.models import BlogPost
+from catalog.models import Product
+from users.models import User
+
+BUDGETS_PATH = Path(__file__).with_name('perf_budgets.json')
+CHECK_TIME = bool(os.environ.get('BENCH_CHECK_TIME') or getattr(settings, 'BENCH_CHECK_TIME', False))
+TIME_TOLERANCE = float(os.environ.get('BENCH_TIME_TOLERANCE') or getattr(settings, 'BENCH_TIME_TOLERANCE', 3.0))
+# Нижняя граница бюджета времени: несколько миллисекунд — это шум, а не регрессия
+MIN_TIME_BUDGET_MS = 50
+# Метрики, которые записываются в бюджет; db_ms только выводится в отчёте
+BUDGET_FIELDS = ('status', 'queries', 'cache_calls', 'wall_ms')
+
+SEED = 2024
+SIZES = {
+    'small': {'products': 200, 'categories': 10, 'users': 20, 'posts': 30},
+    'large': {'products': 2000, 'categories': 40, 'users': 100, 'posts': 300},
+}
+ROLES = ('anon', 'owner', 'moderator')
+PHASES = ('cold', 'warm')
+MODERATOR_PERMISSIONS = ('delete_product', 'can_unpublish_product')
+
+# Как открыть каждый URL: метод, аргументы из набора данных и строка запроса
+URL_SPECS = {
+    'catalog': {
+        'product_list': ('get', None, ''),
+        'home': ('get', None, ''),
+        'contacts': ('get', None, ''),
+        'product_detail': ('get', 'product', ''),
+        'product_create': ('get', None, ''),
+        'product_update': ('get', 'product', ''),
+        'product_delete': ('get', 'product', ''),
+        'product_unpublish': ('post', 'product', ''),
+        'product_search': ('get', None, '?q=бот'),
+        'product_browse': ('get', None, '?price_min=100&price_max=4999.99'),
+        'category_list': ('get', None, ''),
+        'product_category': ('get', 'category', ''),
+        'product_category_legacy': ('get', 'category_name', ''),
+    },
+    'blog': {
+        'post_list': ('get', None, ''),
+        'post_detail': ('get', 'post', ''),
+        'post_create': ('get', None, ''),
+        'post_update': ('get', 'post', ''),
+        'post_delete': ('get', 'post', ''),
+    },
+    'users': {
+        'login': ('get', None, ''),
+        'logout': ('post', None, ''),
+        'register': ('get', None, ''),
+    },
+}
+
+
+def url_names(app_label):
+    """Имена URL из ``<app>.urls`` (без вложенных ``include``)."""
+    module = import_module(f'{app_label}.urls')
+    return {
+        pattern.name for pattern in module.urlpatterns
+        if isinstance(pattern, URLPattern) and pattern.name
+    }
+
+
+class CacheCallCounter:
+    """
+    Считает обращения к кешу по умолчанию. Вложенные вызовы (``get_many``
+    базового класса вызывает ``get`` на каждый ключ) за отдельные не считаются.
+    """
+    METHODS = (
+        'get', 'set', 'add', 'delete', 'touch', 'has_key', 'incr', 'decr',
+        'get_many', 'set_many', 'delete_many', 'get_or_set', 'clear',
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self._depth = 0
+        self._backend = None
+
+    def _wrap(self, method):
+        def counted(*args, **kwargs):
+            if not self._depth:
+                self.calls += 1
+            self._depth += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._depth -= 1
+        return counted
+
+    def __enter__(self):
+        self._backend = caches['default']
+        for name in self.METHODS:
+            setattr(self._backend, name, self._wrap(getattr(self._backend, name)))
+        return self
+
+    def __exit__(self, *exc_info):
+        for name in self.METHODS:
+            # Атрибуты экземпляра закрывают методы класса — удаляем их
+            self._backend.__dict__.pop(name, None)
+
+
+class QueryTimer:
+    """
+    Считает SQL-запросы и их суммарное время. В отличие от
+    ``CaptureQueriesContext``, время не округляется до миллисекунд.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def measure(client, method, url):
+    """Выполняет запрос и возвращает его метрики. Изменения в БД откатываются."""
+    queries = QueryTimer()
+    # Сборка мусора от предыдущих запросов не должна попасть в замер случайного URL
+    gc.collect()
+    with transaction.atomic():
+        with connection.execute_wrapper(queries), CacheCallCounter() as cache_calls:
+            started = time.perf_counter()
+            response = getattr(client, method)(url)
+            wall = time.perf_counter() - started
+        transaction.set_rollback(True)
+    return {
+        'status': response.status_code,
+        'queries': queries.count,
+        'cache_calls': cache_calls.calls,
+        'db_ms': queries.seconds * 1000,
+        'wall_ms': wall * 1000,
+    }
+
+
+def load_budgets():
+    if not BUDGETS_PATH.exists():
+        return {}
+    return json.loads(BUDGETS_PATH.read_text(encoding='utf-8'))
+
+
+def budget_key(url_name, role, phase):
+    return f'{url_name} {role} {phase}'
+
+
+def save_budgets(size, app_label, results):
+    """
+    Записывает результаты как новые бюджеты (время — с округлением вверх).
+    Один запрос — одна строка файла, чтобы изменения было легко читать в ревью.
+    """
+    budgets = load_budgets()
+    section = {
+        key: entry for key, entry in budgets.get(size, {}).items()
+        if not key.startswith(f'{app_label}:')
+    }
+    for (url_name, role, phase), metrics in results.items():
+        entry = {name: metrics[name] for name in BUDGET_FIELDS}
+        entry['wall_ms'] = max(MIN_TIME_BUDGET_MS, math.ceil(metrics['wall_ms']))
+        section[budget_key(url_name, role, phase)] = entry
+    budgets[size] = section
+    lines = []
+    for size_name, entries in sorted(budgets.items()):
+        rows = ',\n'.join(
+            f'    {json.dumps(key, ensure_ascii=False)}: {json.dumps(entry)}'
+            for key, entry in sorted(entries.items())
+        )
+        lines.append(f'  {json.dumps(size_name)}: {{\n{rows}\n  }}')
+    BUDGETS_PATH.write_text('{\n' + ',\n'.join(lines) + '\n}\n', encoding='utf-8')
+
+
+def compare(measured, budget):
+    """Список нарушений бюджета одного запроса."""
+    problems = []
+    if measured['status'] != budget['status']:
+        problems.append(f"код ответа {measured['status']} вместо {budget['status']}")
+    for name in ('queries', 'cache_calls'):
+        if measured[name] > budget[name]:
+            problems.append(f"{name} {measured[name]} > {budget[name]}")
+    if CHECK_TIME and measured['wall_ms'] > budget['wall_ms'] * TIME_TOLERANCE:
+        problems.append(f"wall_ms {measured['wall_ms']:.1f} > {budget['wall_ms']} × {TIME_TOLERANCE:g}")
+    return problems
+
+
+def format_report(results):
+    lines = [f"{'URL':32} {'роль':10} {'фаза':5} {'код':>4} {'SQL':>4} {'кеш':>4} {'БД, мс':>8} {'всего, мс':>10}"]
+    for (url_name, role, phase), m in results.items():
+        lines.append(
+            f"{url_name:32} {role:10} {phase:5} {m['status']:>4} {m['queries']:>4} "
+            f"{m['cache_calls']:>4} {m['db_ms']:>8.1f} {m['wall_ms']:>10.1f}"
+        )
+    return '\n'.join(lines)
+
+
+class UrlBudgetTestCase(TestCase):
+    """
+    Базовый класс: подклассы задают ``app_label`` (приложение, чьи URL
+    проверяются) и ``size`` (ключ ``SIZES``). Импортируйте модуль, а не
+    класс, иначе тестовый раннер запустит и сам базовый класс.
+    """
+    app_label = None
+    size = None
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('add_test_products', seed=SEED, stdout=StringIO(), **SIZES[cls.size])
+        cls.product = Product.objects.filter(is_published=True).select_related('category').order_by('pk').first()
+        cls.post = BlogPost.objects.filter(is_published=True).order_by('pk').first()
+        cls.owner = cls.product.owner
+        cls.moderator = User.objects.create_user(email='bench-moderator@example.com', password='bench')
+        cls.moderator.user_permissions.add(*Permission.objects.filter(
+            content_type__app_label='catalog', codename__in=MODERATOR_PERMISSIONS,
+        ))
+
+    def url_kwargs(self, source):
+        if source == 'product':
+            return {'pk': self.product.pk}
+        if source == 'category':
+            return {'slug': self.product.category.slug}
+        if source == 'category_name':
+            return {'category_name': self.product.category.name}
+        if source == 'post':
+            return {'pk': self.post.pk}
+        return {}
+
+    def login(self, role):
+        self.client.logout()
+        if role == 'owner':
+            self.client.force_login(self.owner)
+        elif role == 'moderator':
+            self.client.force_login(self.moderator)
+
+    def run_suite(self):
+        results = {}
+        for url_name, (method, source, query) in URL_SPECS[self.app_label].items():
+            full_name = f'{self.app_label}:{url_name}'
+            url = reverse(full_name, kwargs=self.url_kwargs(source)) + query
+            for role in ROLES:
+                cache.clear()
+                for phase in PHASES:
+                    # Вход перед каждым запросом: logout в наборе завершает сессию
+                    self.login(role)
+                    results[full_name, role, phase] = measure(self.client, method, url)
+        return results
+
+    def test_every_url_has_spec(self):
+        self.assertEqual(url_names(self.app_label), set(URL_SPECS[self.app_label]))
+
+    def test_budgets(self):
+        results = self.run_suite()
+        if os.environ.get('BENCH_UPDATE_BUDGETS'):
+            save_budgets(self.size, self.app_label, results)
+            print(f"\n{self.app_label} / {self.size}\n{format_report(results)}")
+            return
+
+        budgets = load_budgets().get(self.size, {})
+        failures = []
+        for (url_name, role, phase), metrics in results.items():
+            budget = budgets.get(budget_key(url_name, role, phase))
+            if budget is None:
+                failures.append(f"{url_name} {role} {phase}: нет бюджета")
+                continue
+            failures.extend(
+                f"{url_name} {role} {phase}: {problem}" for problem in compare(metrics, budget)
+            )
+        if failures:
+            self.fail(
+                'Превышены бюджеты ({} / {}):\n{}\n\n{}\n\nЕсли изменение осознанное, '
+                'перезапишите бюджеты с BENCH_UPDATE_BUDGETS=1.'.format(
+                    self.app_label, self.size, '\n'.join(failures), format_report(results),
+                )
+            )
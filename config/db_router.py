@@ -0,0 +1,177 @@
+"""
+Чтение с реплик и запись в основную базу.
+
+``PrimaryReplicaRouter`` отправляет запись в ``default``, а чтение — в
+случайную исправную реплику из ``DATABASE_REPLICAS`` (одну на весь
+запрос), но только внутри
+запроса, который ``DatabaseRoutingMiddleware`` (``config/middleware.py``)
+разрешил читать с реплик:
+
+* GET/HEAD без недавней записи. После POST (и других небезопасных методов),
+  который что-то записал, — создание, правка и снятие продукта с
+  публикации, правка статьи, вход — ставится cookie
+  ``DATABASE_STICKY_COOKIE``, и ещё ``DATABASE_STICKY_SECONDS`` секунд
+  чтения этого пользователя идут в основную базу: реплика могла не успеть
+  получить его изменения. Cookie, а не сессия — сессия сама читается из БД;
+* после записи внутри запроса (например, счётчик просмотров статьи)
+  дальнейшие чтения этого запроса идут в основную базу.
+
+Вне запросов (команды, воркеры) всё читается из основной базы.
+
+Выборки, которые надолго кладутся в кеш под поколением каталога,
+читаются из основной базы (``use_primary``): отстающая реплика закрепила
+бы в кеше устаревшие данные до следующей смены поколения.
+
+Миграции выполняются только вне реплик (``allow_migrate``): схему они
+получают репликацией из основной базы.
+
+Реплика проверяется не чаще раза в ``DATABASE_REPLICA_CHECK_INTERVAL``
+секунд (``SELECT 1``, на PostgreSQL — ещё и отставание не больше
+``DATABASE_REPLICA_MAX_LAG``) и до следующей успешной проверки не
+используется. Если исправных реплик нет, чтение идёт в основную базу.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = DEFAULT_DB_ALIAS
+
+# Отставание реплики PostgreSQL в секундах; 0, если всё полученное уже применено
+POSTGRES_LAG_SQL = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class RoutingState:
+    """
+    Маршрутизация текущего запроса: можно ли читать с реплик, была ли
+    запись и какая реплика выбрана.
+    """
+
+    def __init__(self, replicas_allowed):
+        self.replicas_allowed = replicas_allowed
+        self.wrote = False
+        # Выбирается при первом чтении и служит до конца запроса
+        self.replica = None
+
+
+_state = ContextVar('db_routing', default=None)
+_primary_only = ContextVar('db_primary_only', default=False)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+@contextmanager
+def routing(replicas_allowed):
+    """Делает ``RoutingState`` текущим на время запроса (см. ``DatabaseRoutingMiddleware``)."""
+    state = RoutingState(replicas_allowed)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Чтения внутри блока идут в основную базу."""
+    token = _primary_only.set(True)
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+
+class ReplicaHealth:
+    """Исправность реплик с периодической перепроверкой (одна на процесс)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = {}
+
+    def reset(self):
+        with self._lock:
+            self._status.clear()
+
+    def healthy(self):
+        return [alias for alias in replicas() if self.is_healthy(alias)]
+
+    def is_healthy(self, alias):
+        interval = getattr(settings, 'DATABASE_REPLICA_CHECK_INTERVAL', 5)
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked_at = self._status.get(alias, (True, None))
+            if checked_at is not None and now - checked_at < interval:
+                return healthy
+            # Остальные потоки до конца проверки пользуются прежним результатом
+            self._status[alias] = (healthy, now)
+        is_healthy = self.check(alias)
+        with self._lock:
+            self._status[alias] = (is_healthy, time.monotonic())
+        if is_healthy != healthy:
+            if is_healthy:
+                logger.info('Реплика %s снова используется', alias)
+            else:
+                logger.warning('Реплика %s исключена до следующей проверки', alias)
+        return is_healthy
+
+    def check(self, alias):
+        connection = connections[alias]
+        max_lag = getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 10)
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(POSTGRES_LAG_SQL)
+                    lag = cursor.fetchone()[0]
+                    return lag is not None and lag <= max_lag
+                cursor.execute('SELECT 1')
+                return True
+        except DatabaseError as exc:
+            logger.warning('Проверка реплики %s: %s', alias, exc)
+            # Сломанное соединение не должно достаться следующему запросу
+            connection.close()
+            return False
+
+
+health = ReplicaHealth()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replicas_allowed or state.wrote or _primary_only.get():
+            return PRIMARY
+        if state.replica is None:
+            # Одна реплика на запрос: чтения не прыгают между репликами с
+            # разным отставанием, исправность проверяется один раз
+            healthy = health.healthy()
+            state.replica = random.choice(healthy) if healthy else PRIMARY
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат ту же базу, что и основная
+        aliases = {PRIMARY, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики доступны только на чтение — их схема приходит из основной базы
+        return db not in replicas()
@@ -0,0 +1,35 @@
+"""
+Поколения кеша: счётчики, которые входят в ключи закешированных выборок.
+
+Изменение данных не удаляет ключи, а увеличивает поколение — старые записи
+перестают читаться и вытесняются по TTL. Ключи поколений у каждого
+приложения свои (``catalog.caching``, ``blog.services``).
+"""
+import time
+
+from django.core.cache import cache
+
+
+def initial_generation():
+    # Если ключ поколения вытеснен из кеша, счёт начинается не с 1,
+    # а с текущего времени — иначе можно снова попасть на старые записи
+    return int(time.time() * 1000)
+
+
+def get_generation(key):
+    """Текущее поколение под ключом ``key``; заводит его, если ключа нет."""
+    generation = cache.get(key)
+    if generation is None:
+        generation = initial_generation()
+        if not cache.add(key, generation, None):
+            generation = cache.get(key, generation)
+    return generation
+
+
+def bump_generation(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключа ещё нет (или он вытеснен) — заводим заново
+        cache.add(key, initial_generation(), None)
+        return cache.incr(key)
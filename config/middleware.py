@@ -0,0 +1,181 @@
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from config import db_router, perf, staticfiles
+
+logger = logging.getLogger('config.perf')
+
+
+class PerfMiddleware:
+    """
+    Профилирует долю запросов ``PERF_SAMPLE_RATE`` (0 — выключено, 1 — все).
+
+    Для попавших в выборку запросов добавляет заголовок ``Server-Timing``
+    (видно во вкладке Network браузера) и пишет строку лога ``config.perf``
+    в JSON: SQL, кеш, шаблоны, внешние вызовы. Если один и тот же SQL
+    повторился ``PERF_N_PLUS_ONE_THRESHOLD`` раз и больше, строка пишется
+    с уровнем WARNING. Замеры ставятся только на время запроса из выборки
+    (``config/perf.py``); остальные запросы проходят без накладных расходов.
+
+    Работает и под ASGI без перехода в поток: профиль передаётся через
+    ``ContextVar`` и виден асинхронным представлениям и ``sync_to_async``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.sample_rate = float(getattr(settings, 'PERF_SAMPLE_RATE', 0))
+        self.threshold = int(getattr(settings, 'PERF_N_PLUS_ONE_THRESHOLD', 5))
+        self.header = getattr(settings, 'PERF_SERVER_TIMING', True)
+
+    def sampled(self):
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        with perf.Profile(self.threshold) as profile, perf.instrument(profile), perf.watch_queries(profile):
+            request.perf = profile
+            response = self.get_response(request)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        with perf.Profile(self.threshold) as profile, perf.instrument(profile):
+            request.perf = profile
+            # ORM асинхронного представления работает в потоке sync_to_async
+            # со своими соединениями — обёртки SQL ставятся и снимаются там
+            queries = await sync_to_async(perf.watch_queries)(profile)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(queries.close)()
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        if self.header:
+            response['Server-Timing'] = profile.server_timing()
+        self.log(request, response, profile)
+        return response
+
+    def log(self, request, response, profile):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            **profile.summary(),
+        }
+        card_stats = getattr(request, 'card_cache_stats', None)
+        if card_stats:
+            record['cards'] = card_stats
+        tier_stats = getattr(cache, 'stats', None)
+        if tier_stats is not None:
+            # Попадания уровней двухуровневого кеша с запуска процесса
+            record['cache_tiers'] = tier_stats()
+        level = logging.WARNING if record['n_plus_one'] else logging.INFO
+        logger.log(level, json.dumps(record, ensure_ascii=False, default=str), extra={'perf': record})
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Разрешает читать с реплик GET/HEAD-запросам без недавней записи
+    (``config/db_router.py``) и ставит cookie «читать из основной базы»
+    после небезопасного запроса, который что-то записал.
+    """
+
+    sync_capable = True
+    async_capable = True
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = getattr(settings, 'DATABASE_STICKY_COOKIE', 'db_primary_until')
+        self.sticky_seconds = int(getattr(settings, 'DATABASE_STICKY_SECONDS', 15))
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def replicas_allowed(self, request):
+        if request.method not in self.SAFE_METHODS or not db_router.replicas():
+            return False
+        try:
+            sticky_until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            sticky_until = 0
+        return sticky_until <= time.time()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with db_router.routing(self.replicas_allowed(request)) as state:
+            response = self.get_response(request)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        with db_router.routing(self.replicas_allowed(request)) as state:
+            response = await self.get_response(request)
+        return self.finish(request, response, state)
+
+    def finish(self, request, response, state):
+        if state.wrote and request.method not in self.SAFE_METHODS and self.sticky_seconds > 0:
+            response.set_cookie(
+                self.cookie_name, str(int(time.time()) + self.sticky_seconds),
+                max_age=self.sticky_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class StaticFilesMiddleware:
+    """
+    Отдаёт собранную статику из ``STATIC_ROOT`` со сжатием по
+    ``Accept-Encoding`` и долгим кешированием (``config/staticfiles.py``).
+    Адреса, которых нет среди собранных файлов, идут дальше по цепочке.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else f'/{settings.STATIC_URL}'
+        self.index = staticfiles.StaticFileIndex(settings.STATIC_ROOT)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def find(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None
+        return self.index.get(request.path_info[len(self.prefix):])
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        static_file = self.find(request)
+        if static_file is None:
+            return self.get_response(request)
+        return staticfiles.serve(request, static_file)
+
+    async def __acall__(self, request):
+        static_file = self.find(request)
+        if static_file is None:
+            return await self.get_response(request)
+        # Чтение файла — не в цикле событий
+        return await sync_to_async(staticfiles.serve, thread_sensitive=False)(request, static_file)
@@ -0,0 +1,262 @@
+"""
+Профиль запроса: SQL, кеш, рендер шаблонов и внешние вызовы.
+
+``PerfMiddleware`` (``config/middleware.py``) создаёт ``Profile`` для доли
+запросов ``PERF_SAMPLE_RATE`` и делает его текущим (через ``ContextVar`` —
+он виден и в потоках ``sync_to_async``, поэтому профилируются и
+асинхронные представления). Замеры ставятся только на время такого
+запроса и снимаются после него:
+
+* SQL — ``connection.execute_wrapper`` на соединениях потока запроса
+  (``watch_queries``);
+* кеш — обёртки методов экземпляра кеша по умолчанию, а не его класса
+  (``instrument``);
+* шаблоны — обёртка ``Template.render``, пока идёт хотя бы один запрос из
+  выборки; запросы вне выборки она сразу передаёт оригиналу.
+
+Прочие внешние вызовы (SMTP, HTTP-клиенты и т. п.) оборачиваются в
+``external_call('имя')`` — так сделано в ``outbox.services.send_pending``.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import caches
+from django.db import connections
+
+_current = ContextVar('perf_profile', default=None)
+
+# Методы кеша: (чтение?) — у чтений считаются попадания и промахи
+CACHE_METHODS = {
+    'get': True, 'get_many': True, 'has_key': True,
+    'set': False, 'add': False, 'delete': False, 'touch': False, 'incr': False, 'decr': False,
+    'set_many': False, 'delete_many': False, 'get_or_set': False,
+}
+
+# Сколько запросов из выборки сейчас выполняется — пока их больше нуля,
+# рендер шаблонов обёрнут
+_template_lock = threading.Lock()
+_template_users = 0
+
+
+def current_profile():
+    return _current.get()
+
+
+class Profile:
+    def __init__(self, n_plus_one_threshold):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.started = time.perf_counter()
+        self.queries = Counter()
+        self.duplicates = Counter()
+        self.db_time = 0.0
+        self.cache = Counter()
+        self.cache_time = 0.0
+        self.template_time = 0.0
+        self.external = Counter()
+        self.external_time = 0.0
+        self._local = threading.local()
+        self._token = None
+
+    # --- Сбор ----------------------------------------------------------------
+
+    @property
+    def _depth(self):
+        # Вложенность считается по потокам: асинхронное представление
+        # обращается к кешу из нескольких потоков одновременно
+        depth = getattr(self._local, 'depth', None)
+        if depth is None:
+            depth = self._local.depth = Counter()
+        return depth
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+        self.total_time = time.perf_counter() - self.started
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка для ``connection.execute_wrapper``."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add_query(sql, params, time.perf_counter() - started)
+
+    def add_query(self, sql, params, elapsed):
+        self.db_time += elapsed
+        self.queries[sql] += 1
+        try:
+            self.duplicates[sql, repr(params)] += 1
+        except Exception:
+            pass
+
+    def cache_call(self, name, is_read, method, args, kwargs):
+        # get_many базового класса вызывает get на каждый ключ — считаем только внешний вызов
+        if self._depth['cache']:
+            return method(*args, **kwargs)
+        self._depth['cache'] += 1
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            self.cache_time += time.perf_counter() - started
+            self._depth['cache'] -= 1
+        self.cache[name] += 1
+        if is_read:
+            self._count_read(name, args, kwargs, result)
+        return result
+
+    def _count_read(self, name, args, kwargs, result):
+        if name == 'get_many':
+            keys = list(args[0] if args else kwargs.get('keys', ()))
+            self.cache['hits'] += len(result)
+            self.cache['misses'] += len(keys) - len(result)
+        elif name == 'get':
+            default = args[1] if len(args) > 1 else kwargs.get('default')
+            self.cache['hits' if result is not default else 'misses'] += 1
+        else:
+            self.cache['hits' if result else 'misses'] += 1
+
+    @contextmanager
+    def timing(self, kind):
+        """Замер вложенных вызовов одного рода учитывается один раз."""
+        if self._depth[kind]:
+            yield
+            return
+        self._depth[kind] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._depth[kind] -= 1
+            if kind == 'template':
+                self.template_time += elapsed
+            else:
+                self.external_time += elapsed
+
+    # --- Итоги ---------------------------------------------------------------
+
+    def n_plus_one(self):
+        """Самый частый SQL, если он повторился не меньше порога, иначе None."""
+        if not self.queries:
+            return None
+        sql, count = self.queries.most_common(1)[0]
+        return (sql, count) if count >= self.n_plus_one_threshold else None
+
+    def summary(self):
+        suspect = self.n_plus_one()
+        return {
+            'total_ms': round(self.total_time * 1000, 2),
+            'db': {
+                'queries': sum(self.queries.values()),
+                'ms': round(self.db_time * 1000, 2),
+                'duplicates': sum(count - 1 for count in self.duplicates.values() if count > 1),
+            },
+            'cache': {
+                'calls': sum(self.cache[name] for name in CACHE_METHODS),
+                'gets': self.cache['get'] + self.cache['get_many'] + self.cache['has_key'],
+                'sets': self.cache['set'] + self.cache['set_many'] + self.cache['add'],
+                'hits': self.cache['hits'],
+                'misses': self.cache['misses'],
+                'ms': round(self.cache_time * 1000, 2),
+            },
+            'template_ms': round(self.template_time * 1000, 2),
+            'external': {
+                'calls': dict(self.external),
+                'ms': round(self.external_time * 1000, 2),
+            },
+            'n_plus_one': {'sql': suspect[0], 'count': suspect[1]} if suspect else None,
+        }
+
+    def server_timing(self):
+        summary = self.summary()
+        db, cache = summary['db'], summary['cache']
+        parts = [
+            f'db;dur={db["ms"]};desc="{db["queries"]} queries"',
+            f'cache;dur={cache["ms"]};desc="{cache["hits"]} hits, {cache["misses"]} misses"',
+            f'tpl;dur={summary["template_ms"]}',
+        ]
+        if self.external:
+            parts.append(f'ext;dur={summary["external"]["ms"]};desc="{sum(self.external.values())} calls"')
+        parts.append(f'total;dur={summary["total_ms"]}')
+        return ', '.join(parts)
+
+
+@contextmanager
+def external_call(name):
+    """Учитывает внешний вызов (SMTP, HTTP) в профиле текущего запроса."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    profile.external[name] += 1
+    with profile.timing('external'):
+        yield
+
+
+def watch_queries(profile):
+    """
+    Учитывает SQL соединений текущего потока в профиле. Возвращает
+    ``ExitStack``: его закрытие (в том же потоке) снимает обёртки.
+    """
+    stack = ExitStack()
+    for conn in connections.all():
+        stack.enter_context(conn.execute_wrapper(profile.execute))
+    return stack
+
+
+def _timed_cache_method(profile, name, is_read, method):
+    def timed(*args, **kwargs):
+        return profile.cache_call(name, is_read, method, args, kwargs)
+    return timed
+
+
+def _timed_render(original):
+    def render(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return original(*args, **kwargs)
+        with profile.timing('template'):
+            return original(*args, **kwargs)
+    render.__wrapped__ = original
+    return render
+
+
+@contextmanager
+def _template_timing():
+    global _template_users
+    from django.template.backends.django import Template
+
+    with _template_lock:
+        if not _template_users:
+            Template.render = _timed_render(Template.render)
+        _template_users += 1
+    try:
+        yield
+    finally:
+        with _template_lock:
+            _template_users -= 1
+            if not _template_users:
+                Template.render = Template.render.__wrapped__
+
+
+@contextmanager
+def instrument(profile):
+    """Замеры кеша и шаблонов на время одного запроса из выборки."""
+    # Асинхронные методы кеша (aget и т. д.) вызывают эти же синхронные
+    backend = caches['default']
+    for name, is_read in CACHE_METHODS.items():
+        setattr(backend, name, _timed_cache_method(profile, name, is_read, getattr(backend, name)))
+    try:
+        with _template_timing():
+            yield profile
+    finally:
+        for name in CACHE_METHODS:
+            # Атрибуты экземпляра закрывают методы класса — удаляем их
+            backend.__dict__.pop(name, None)
@@ -50,11 +50,19 @@ INSTALLED_APPS = [
     "catalog",
     "blog",
     "users",
+    "outbox",
+    "renditions",
 ]
 
 AUTH_USER_MODEL = 'users.User'
 MIDDLEWARE = [
+    # Первым: в профиль попадают запросы сессий и пользователя
+    "config.middleware.PerfMiddleware",
+    # До сессий: их чтение тоже идёт с реплики, а запись делает ответ «липким»
+    "config.middleware.DatabaseRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # Собранная статика отдаётся до сессий и остальной обработки запроса
+    "config.middleware.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -99,6 +107,25 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения (config/db_router.py): хосты через запятую, остальные
+# параметры — как у основной базы
+DATABASE_REPLICAS = []
+for _number, _host in enumerate(filter(None, os.getenv('DATABASE_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica_{_number}'] = {
+        **DATABASES['default'],
+        'HOST': _host.strip(),
+        # Тесты не создают отдельных баз для реплик
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{_number}')
+
+DATABASE_ROUTERS = ['config.db_router.PrimaryReplicaRouter']
+# Сколько секунд после записи чтения пользователя идут в основную базу
+DATABASE_STICKY_SECONDS = 15
+# Как часто перепроверять реплику и какое отставание (секунды) допустимо
+DATABASE_REPLICA_CHECK_INTERVAL = 5
+DATABASE_REPLICA_MAX_LAG = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -141,6 +168,12 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = (BASE_DIR / "static",)
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic пишет копии с хешем в имени и сжатые .gz/.zst (config/staticfiles.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'config.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
@@ -160,9 +193,45 @@ CACHE_ENABLED = True
 
 if CACHE_ENABLED:
     CACHES = {
+        # Горячие ключи каталога и блога читаются из памяти процесса,
+        # остальное — из Redis (config/tiered_cache.py)
         'default': {
+            'BACKEND': 'config.tiered_cache.TieredCache',
+            'LOCATION': 'default',
+            'OPTIONS': {
+                'REMOTE': 'redis',
+                'CHANNEL': 'cache:invalidate',
+                'MAX_ENTRIES': int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', 2000)),
+                'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', 30)),
+            },
+        },
+        'redis': {
             'BACKEND': 'django.core.cache.backends.redis.RedisCache',
             'LOCATION': 'redis://127.0.0.1:6379'
-        }
+        },
     }
 
+# Буфер просмотров в памяти процесса (кеш без Redis) сбрасывает в БД фоновый
+# поток раз в столько секунд (catalog/counters.py); 0 — поток не запускается
+VIEW_COUNTER_LOCAL_FLUSH_INTERVAL = int(os.getenv('VIEW_COUNTER_LOCAL_FLUSH_INTERVAL', 60))
+
+# Асинхронные представления каталога (catalog/async_views.py); включает config/asgi.py,
+# под WSGI остаются синхронные
+CATALOG_ASYNC_VIEWS = os.getenv('CATALOG_ASYNC_VIEWS') == '1'
+
+# Профилирование запросов (config/middleware.py): доля запросов в выборке,
+# 0 — выключено. Итоги — в заголовке Server-Timing и в логе config.perf
+PERF_SAMPLE_RATE = float(os.getenv('PERF_SAMPLE_RATE', 0))
+# Сколько одинаковых SQL за запрос считать признаком N+1
+PERF_N_PLUS_ONE_THRESHOLD = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'config.perf': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -0,0 +1,55 @@
+"""
+Настройки для бюджетов запросов (``config/benchmark.py``): SQLite и
+locmem-кеш, чтобы тесты запускались без Postgres и Redis.
+
+    python manage.py test catalog blog users --settings=config.settings_bench
+"""
+from config.settings import *  # noqa: F401,F403
+
+
+class DisableMigrations(dict):
+    """Схема строится по моделям: быстрее и не зависит от истории миграций."""
+
+    def __contains__(self, item):
+        return True
+
+    def __getitem__(self, item):
+        return None
+
+
+SECRET_KEY = SECRET_KEY or 'bench'  # noqa: F405
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'bench.sqlite3',  # noqa: F405
+    },
+    # «Реплика» для тестов маршрутизатора (config/db_router.py); чтения
+    # идут в неё, только если тест добавит её в DATABASE_REPLICAS
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'bench_replica.sqlite3',  # noqa: F405
+    },
+}
+DATABASE_REPLICAS = []
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # Карточки и страницы большого набора данных не должны вытесняться
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    }
+}
+
+# {% static %} без collectstatic: хранилище с манифестом требует собранной статики
+STORAGES = {
+    **STORAGES,  # noqa: F405
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+MIGRATION_MODULES = DisableMigrations()
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Тесты и замеры сбрасывают буфер просмотров сами — фоновый поток не нужен
+VIEW_COUNTER_LOCAL_FLUSH_INTERVAL = 0
@@ -0,0 +1,193 @@
+"""
+Статика с хешами в именах и заранее сжатыми копиями.
+
+``CompressedManifestStaticFilesStorage`` — хранилище для ``collectstatic``:
+как ``ManifestStaticFilesStorage`` пишет копии с хешем содержимого в имени
+(``css/bootstrap.min.3f1c….css``) и ``staticfiles.json``, а рядом с каждым
+текстовым файлом — ``.gz`` и, если установлен ``zstandard``, ``.zst``.
+Сжатая копия не пишется, если она почти не меньше исходной. Ссылка на
+отсутствующую карту исходников (``sourceMappingURL``) не ломает сборку.
+
+``StaticFilesMiddleware`` (``config/middleware.py``) отдаёт файлы из
+``STATIC_ROOT`` сам, без веб-сервера: выбирает копию по ``Accept-Encoding``
+(zstd, затем gzip), а файлам с хешем в имени ставит
+``Cache-Control: immutable`` на год — их содержимое под этим именем не
+меняется. Список файлов читается при старте процесса, поэтому после
+``collectstatic`` процесс перезапускают.
+"""
+import gzip
+import json
+import mimetypes
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard необязателен
+    zstandard = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.xml', '.html', '.ico', '.ttf', '.otf')
+COMPRESS_MIN_SIZE = 512
+# Сжатая копия нужна, только если она заметно меньше
+COMPRESS_MAX_RATIO = 0.95
+GZIP_LEVEL = 9
+ZSTD_LEVEL = 19
+
+# Порядок предпочтения: (кодировка в Accept-Encoding, суффикс файла)
+ENCODINGS = [('zstd', '.zst'), ('gzip', '.gz')] if zstandard is not None else [('gzip', '.gz')]
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Файлы без хеша в имени (их ищут по старым ссылкам) кешируются ненадолго
+MUTABLE_MAX_AGE = getattr(settings, 'STATIC_MUTABLE_MAX_AGE', 60)
+# Файлы крупнее отдаются потоком, а не читаются целиком
+IN_MEMORY_MAX_SIZE = 1024 * 1024
+
+
+def compress(data):
+    """Сжатые копии ``data``: ``{'.gz': bytes, '.zst': bytes}`` — только выгодные."""
+    if len(data) < COMPRESS_MIN_SIZE:
+        return {}
+    variants = {'.gz': gzip.compress(data, GZIP_LEVEL, mtime=0)}
+    if zstandard is not None:
+        variants['.zst'] = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return {
+        suffix: compressed for suffix, compressed in variants.items()
+        if len(compressed) <= len(data) * COMPRESS_MAX_RATIO
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def convert(matchobj):
+            try:
+                return converter(matchobj)
+            except ValueError:
+                # Сборки Bootstrap в static/ ссылаются на .map, которых нет, — оставляем ссылку как есть
+                if 'sourceMappingURL' in matchobj['matched']:
+                    return matchobj['matched']
+                raise
+
+        return convert
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Сжимаются итоговые копии с хешем — на них ссылается {% static %}
+        for hashed_name in set(self.hashed_files.values()):
+            if not hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            with self.open(hashed_name) as file:
+                data = file.read()
+            for suffix, compressed in compress(data).items():
+                name = hashed_name + suffix
+                if self.exists(name):
+                    self.delete(name)
+                self._save(name, ContentFile(compressed))
+                yield name, name, True
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        self.path = path
+        self.immutable = immutable
+        self.mtime = path.stat().st_mtime
+        self.content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        # Кодировка -> путь к сжатой копии
+        self.encoded = {
+            encoding: path.with_name(path.name + suffix)
+            for encoding, suffix in ENCODINGS
+            if path.with_name(path.name + suffix).is_file()
+        }
+
+
+def accepted_encodings(header):
+    """Кодировки из ``Accept-Encoding`` с ненулевым q."""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class StaticFileIndex:
+    """Файлы ``STATIC_ROOT`` по адресу относительно ``STATIC_URL``."""
+
+    def __init__(self, root, manifest_name='staticfiles.json'):
+        self.files = {}
+        root = Path(root) if root else None
+        if root is None or not root.is_dir():
+            return
+        immutable = self._hashed_names(root / manifest_name)
+        for directory, _, names in os.walk(root):
+            for name in names:
+                path = Path(directory, name)
+                relative = path.relative_to(root).as_posix()
+                # Сжатые копии отдаются вместо исходного файла, а не по своему адресу
+                if name.endswith(('.gz', '.zst')) and path.with_suffix('').is_file():
+                    continue
+                self.files[relative] = StaticFile(path, relative in immutable)
+
+    def _hashed_names(self, manifest_path):
+        try:
+            manifest = json.loads(manifest_path.read_text())
+        except (OSError, ValueError):
+            return set()
+        return set(manifest.get('paths', {}).values())
+
+    def get(self, relative):
+        return self.files.get(relative)
+
+
+def serve(request, static_file):
+    """Ответ с копией файла, подходящей под ``Accept-Encoding`` запроса."""
+    if not static_file.immutable and not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'), int(static_file.mtime)
+    ):
+        return HttpResponseNotModified()
+
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    path, encoding = static_file.path, None
+    for name, _ in ENCODINGS:
+        if name in accepted and name in static_file.encoded:
+            path, encoding = static_file.encoded[name], name
+            break
+
+    size = path.stat().st_size
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=static_file.content_type)
+    elif size <= IN_MEMORY_MAX_SIZE:
+        response = HttpResponse(path.read_bytes(), content_type=static_file.content_type)
+    else:
+        response = FileResponse(
+            path.open('rb'), content_type=static_file.content_type, filename=static_file.path.name,
+        )
+    response['Content-Length'] = size
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if static_file.encoded:
+        response['Vary'] = 'Accept-Encoding'
+    if static_file.immutable:
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response['Cache-Control'] = f'public, max-age={MUTABLE_MAX_AGE}'
+        response['Last-Modified'] = http_date(static_file.mtime)
+    return response
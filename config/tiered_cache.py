@@ -0,0 +1,389 @@
+"""
+Двухуровневый кеш: LRU в памяти процесса перед Redis.
+
+``TieredCache`` — бэкенд кеша Django поверх другого настроенного кеша
+(``OPTIONS['REMOTE']``, обычно Redis). Ключи с префиксами
+``LOCAL_KEY_PREFIXES`` (выборки каталога и блога, поколения, карточки) после
+первого чтения отдаются из памяти процесса без сетевого обращения. Остальные
+ключи (буфер просмотров, блокировки) идут прямо в Redis.
+
+Локальный уровень ограничен числом записей (``MAX_ENTRIES``, вытесняются
+давно не читанные), размером значения (``MAX_VALUE_SIZE``) и временем жизни
+(``LOCAL_TIMEOUT``). Запись, удаление и ``incr`` сначала выполняются в Redis,
+затем имена ключей рассылаются остальным воркерам через pub/sub
+(``OPTIONS['CHANNEL']``), и те удаляют свои копии. Пока подписка не
+установлена (или после разрыва соединения), локальный уровень не
+используется и очищается. ``LOCAL_TIMEOUT`` ограничивает устаревание, если
+сообщение всё же потерялось.
+
+``LOCATION`` — имя локального уровня: кеши с одним ``LOCATION`` в процессе
+делят одну память, как у locmem. ``CHANNEL_BACKEND = 'local'`` заменяет
+Redis pub/sub каналом внутри процесса — для тестов, где несколько
+``LOCATION`` изображают несколько воркеров.
+
+Попадания и промахи каждого уровня — ``cache.stats()``; при профилировании
+(``PerfMiddleware``) они попадают в лог ``config.perf``.
+"""
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter, OrderedDict, defaultdict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCAL_KEY_PREFIXES = ('catalog:v1:', 'blog:')
+
+_MISSING = object()
+
+
+class LocalChannel:
+    """Канал инвалидации внутри процесса: все подписчики с тем же именем."""
+
+    _subscribers = defaultdict(list)
+    _lock = threading.Lock()
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def ready(self):
+        return True
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers[self.name].append(weakref.WeakMethod(callback))
+
+    def publish(self, message):
+        with self._lock:
+            subscribers = [ref() for ref in self._subscribers[self.name]]
+        for callback in subscribers:
+            if callback is not None:
+                callback(message)
+
+
+class RedisChannel:
+    """
+    Канал инвалидации через Redis pub/sub. Сообщения слушает фоновый поток
+    процесса; после ``fork`` он запускается заново в дочернем процессе.
+    """
+
+    RETRY_DELAY = 1
+
+    def __init__(self, name, get_client):
+        self.name = name
+        self.get_client = get_client
+        self._callback = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def ready(self):
+        if self._pid != os.getpid():
+            self._start()
+        return self._ready.is_set()
+
+    def subscribe(self, callback):
+        self._callback = callback
+        self._start()
+
+    def publish(self, message):
+        self.get_client().publish(self.name, json.dumps(message))
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._ready.clear()
+            threading.Thread(target=self._listen, name=f'cache-channel-{self.name}', daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.get_client().pubsub()
+                pubsub.subscribe(self.name)
+                for item in pubsub.listen():
+                    if item['type'] == 'subscribe':
+                        # Пока подписки не было, сообщения терялись — начинаем с пустого уровня
+                        self._callback({'origin': None, 'clear': True})
+                        self._ready.set()
+                    elif item['type'] == 'message':
+                        self._callback(json.loads(item['data']))
+            except Exception as exc:
+                logger.warning('Канал инвалидации кеша %s: %s', self.name, exc)
+            self._ready.clear()
+            time.sleep(self.RETRY_DELAY)
+
+
+class LocalTier:
+    """Ограниченный LRU в памяти процесса с временем жизни записей и статистикой."""
+
+    def __init__(self, max_entries, timeout, max_value_size):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.max_value_size = max_value_size
+        # Отличает сообщения этого процесса от сообщений других воркеров
+        self.origin = uuid.uuid4().hex
+        self.channel = None
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._stats = Counter()
+        # Растёт при каждой инвалидации: значение, прочитанное из Redis до
+        # неё, в локальный уровень уже не кладётся
+        self.epoch = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self._stats['local_misses'] += 1
+                return _MISSING
+            self._data.move_to_end(key)
+            self._stats['local_hits'] += 1
+        return pickle.loads(entry[1])
+
+    def store(self, key, value, timeout=None, epoch=None):
+        ttl = self.timeout if timeout is None else min(timeout, self.timeout)
+        # Значение хранится сериализованным: изменения вызывающего кода не портят кеш
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            if ttl <= 0 or len(pickled) > self.max_value_size:
+                self._data.pop(key, None)
+                return
+            self._data[key] = (time.monotonic() + ttl, pickled)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, keys):
+        with self._lock:
+            self.epoch += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._data.clear()
+
+    def receive(self, message):
+        if message['origin'] == self.origin:
+            return
+        if message.get('clear'):
+            self.clear()
+        else:
+            self.invalidate(message['keys'])
+
+    def broadcast(self, keys=None):
+        message = {'origin': self.origin, 'keys': keys} if keys is not None else {'origin': self.origin, 'clear': True}
+        try:
+            self.channel.publish(message)
+        except Exception as exc:
+            logger.warning('Не удалось разослать инвалидацию кеша: %s', exc)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._data)
+
+        def tier(prefix):
+            hits, misses = stats.get(f'{prefix}_hits', 0), stats.get(f'{prefix}_misses', 0)
+            total = hits + misses
+            return {'hits': hits, 'misses': misses, 'hit_rate': round(hits / total, 4) if total else None}
+
+        return {
+            'local': {**tier('local'), 'entries': entries, 'evictions': stats.get('evictions', 0)},
+            'remote': tier('remote'),
+        }
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._name = location or 'default'
+        self._remote_alias = options.get('REMOTE', 'redis')
+        self._prefixes = tuple(options.get('LOCAL_KEY_PREFIXES', DEFAULT_LOCAL_KEY_PREFIXES))
+        self._options = options
+
+    @property
+    def remote(self):
+        return caches[self._remote_alias]
+
+    @property
+    def tier(self):
+        # Экземпляр бэкенда у каждого потока свой, память уровня — общая на процесс
+        tier = _tiers.get(self._name)
+        if tier is None:
+            with _tiers_lock:
+                tier = _tiers.get(self._name)
+                if tier is None:
+                    tier = _tiers[self._name] = self._make_tier()
+        return tier
+
+    def _make_tier(self):
+        options = self._options
+        tier = LocalTier(
+            max_entries=int(options.get('MAX_ENTRIES', 1000)),
+            timeout=float(options.get('LOCAL_TIMEOUT', 30)),
+            max_value_size=int(options.get('MAX_VALUE_SIZE', 64 * 1024)),
+        )
+        channel_name = options.get('CHANNEL', 'cache:invalidate')
+        if options.get('CHANNEL_BACKEND', 'redis') == 'local':
+            tier.channel = LocalChannel(channel_name)
+        else:
+            remote_alias = self._remote_alias
+            tier.channel = RedisChannel(
+                channel_name, lambda: caches[remote_alias]._cache.get_client(write=True),
+            )
+        tier.channel.subscribe(tier.receive)
+        return tier
+
+    def stats(self):
+        return self.tier.stats()
+
+    # --- Ключи ---------------------------------------------------------------
+
+    def _is_local(self, key):
+        return key.startswith(self._prefixes) and self.tier.channel.ready
+
+    def _full_key(self, key, version):
+        return self.remote.make_and_validate_key(key, version=version)
+
+    def _remote_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.remote.default_timeout
+        return timeout
+
+    def _written(self, values, version, timeout=None, deleted=()):
+        """Обновляет локальный уровень после записи в Redis и рассылает инвалидацию."""
+        local = {self._full_key(key, version): value for key, value in values.items() if self._is_local(key)}
+        deleted = [self._full_key(key, version) for key in deleted if self._is_local(key)]
+        if not (local or deleted):
+            return
+        tier = self.tier
+        tier.invalidate([*local, *deleted])
+        for full_key, value in local.items():
+            tier.store(full_key, value, timeout)
+        tier.broadcast([*local, *deleted])
+
+    # --- Чтение --------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        if not self._is_local(key):
+            return self._remote_get(key, default, version)
+        tier = self.tier
+        full_key = self._full_key(key, version)
+        value = tier.get(full_key)
+        if value is not _MISSING:
+            return value
+        epoch = tier.epoch
+        value = self._remote_get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        tier.store(full_key, value, epoch=epoch)
+        return value
+
+    def _remote_get(self, key, default, version):
+        value = self.remote.get(key, _MISSING, version=version)
+        self.tier.count('remote_misses' if value is _MISSING else 'remote_hits')
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        tier = self.tier
+        found = {}
+        remote_keys = []
+        full_keys = {}
+        for key in keys:
+            if self._is_local(key):
+                full_keys[key] = self._full_key(key, version)
+                value = tier.get(full_keys[key])
+                if value is not _MISSING:
+                    found[key] = value
+                    continue
+            remote_keys.append(key)
+        if not remote_keys:
+            return found
+        epoch = tier.epoch
+        fetched = self.remote.get_many(remote_keys, version=version)
+        tier.count('remote_hits', len(fetched))
+        tier.count('remote_misses', len(remote_keys) - len(fetched))
+        for key, value in fetched.items():
+            if key in full_keys:
+                tier.store(full_keys[key], value, epoch=epoch)
+        found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        if self._is_local(key) and self.tier.get(self._full_key(key, version)) is not _MISSING:
+            return True
+        return self.remote.has_key(key, version=version)
+
+    # --- Запись --------------------------------------------------------------
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.remote.set(key, value, timeout, version=version)
+        self._written({key: value}, version, self._remote_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.remote.add(key, value, timeout, version=version)
+        if added:
+            self._written({key: value}, version, self._remote_timeout(timeout))
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.remote.set_many(data, timeout, version=version)
+        stored = {key: value for key, value in data.items() if key not in failed}
+        self._written(stored, version, self._remote_timeout(timeout), deleted=failed)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.remote.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.remote.incr(key, delta, version=version)
+        self._written({key: value}, version)
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        value = self.remote.decr(key, delta, version=version)
+        self._written({key: value}, version)
+        return value
+
+    def delete(self, key, version=None):
+        deleted = self.remote.delete(key, version=version)
+        self._written({}, version, deleted=[key])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.remote.delete_many(keys, version=version)
+        self._written({}, version, deleted=keys)
+
+    def clear(self):
+        self.remote.clear()
+        self.tier.clear()
+        self.tier.broadcast()
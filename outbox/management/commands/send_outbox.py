@@ -0,0 +1,29 @@
+# outbox/management/commands/send_outbox.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from outbox.services import send_pending
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди пакетами через одно SMTP-соединение'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Сколько писем отправлять за один проход')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Проверять очередь каждые N секунд (0 — один проход)')
+
+    def handle(self, *args, **options):
+        while True:
+            # Выбираем пакеты, пока очередь не опустеет
+            while True:
+                sent, failed = send_pending(batch_size=options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(f"✅ Отправлено: {sent}, с ошибкой: {failed}")
+                if not sent and not failed:
+                    break
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("outbox", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="outboxemail",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Ожидает отправки"),
+                    ("sending", "Отправляется"),
+                    ("sent", "Отправлено"),
+                    ("failed", "Ошибка"),
+                ],
+                default="pending",
+                max_length=10,
+                verbose_name="Статус",
+            ),
+        ),
+    ]
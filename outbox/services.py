@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from config.perf import external_call
+from outbox.models import OutboxEmail
+
+# Сколько раз пытаться отправить письмо, прежде чем пометить его ошибочным
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+# Задержка перед повтором: base * 2 ** (попытка - 1), но не больше max (секунды)
+RETRY_BASE_DELAY = getattr(settings, 'OUTBOX_RETRY_BASE_DELAY', 60)
+RETRY_MAX_DELAY = getattr(settings, 'OUTBOX_RETRY_MAX_DELAY', 60 * 60)
+BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+# Сколько письмо числится за забравшим его воркером (секунды)
+LEASE_SECONDS = getattr(settings, 'OUTBOX_LEASE_SECONDS', 10 * 60)
+
+
+def enqueue_email(subject, message, recipient_list, from_email=None):
+    """
+    Ставит письмо в очередь — один INSERT вместо обращения к SMTP в запросе.
+    """
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед следующей попыткой."""
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def claim_batch(batch_size=None):
+    """
+    Забирает пакет писем к отправке в короткой транзакции.
+
+    Письма получают статус «отправляется» и срок аренды ``LEASE_SECONDS``:
+    транзакция фиксируется до обращения к SMTP, а письмо упавшего воркера
+    по истечении срока заберёт другой.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=LEASE_SECONDS)
+    due = OutboxEmail.objects.filter(
+        status__in=[OutboxEmail.STATUS_PENDING, OutboxEmail.STATUS_SENDING],
+        next_attempt_at__lte=now,
+    ).order_by('next_attempt_at')
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            emails = list(due.select_for_update(skip_locked=True)[:batch_size])
+            OutboxEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                status=OutboxEmail.STATUS_SENDING, next_attempt_at=lease_until,
+            )
+        else:
+            # Без SKIP LOCKED письмо достаётся тому, чей условный UPDATE его изменил
+            emails = [
+                email for email in due[:batch_size]
+                if OutboxEmail.objects.filter(
+                    pk=email.pk, status=email.status, next_attempt_at=email.next_attempt_at,
+                ).update(status=OutboxEmail.STATUS_SENDING, next_attempt_at=lease_until)
+            ]
+    for email in emails:
+        email.status = OutboxEmail.STATUS_SENDING
+        email.next_attempt_at = lease_until
+    return emails
+
+
+def _record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = OutboxEmail.STATUS_FAILED
+    else:
+        email.status = OutboxEmail.STATUS_PENDING
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+
+
+def send_pending(batch_size=None):
+    """
+    Отправляет пакет писем из очереди через одно SMTP-соединение.
+
+    Возвращает пару (отправлено, с ошибкой). Письма забираются
+    ``claim_batch``, поэтому несколько воркеров не отправят одно письмо
+    дважды, а SMTP вызывается вне транзакции. Если соединение не
+    открылось, неудачной попыткой считается отправка всего пакета.
+    """
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    try:
+        # В профиле запроса (config.perf) SMTP-сессия видна как внешний вызов
+        with external_call('smtp'), get_connection() as mail_connection:
+            for email in emails:
+                message = EmailMessage(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email,
+                    to=email.recipients,
+                    connection=mail_connection,
+                )
+                try:
+                    message.send()
+                except Exception as e:
+                    _record_failure(email, e)
+                else:
+                    email.attempts += 1
+                    email.status = OutboxEmail.STATUS_SENT
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+    except Exception as e:
+        # Соединение не открылось или оборвалось: неотправленные письма ждут повтора
+        for email in emails:
+            if email.status == OutboxEmail.STATUS_SENDING:
+                _record_failure(email, e)
+
+    OutboxEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    sent = sum(email.status == OutboxEmail.STATUS_SENT for email in emails)
+    return sent, len(emails) - sent
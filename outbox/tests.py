@@ -0,0 +1,99 @@
+import time
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from config.middleware import PerfMiddleware
+from outbox import services
+from outbox.models import OutboxEmail
+
+
+class SendPendingTest(TestCase):
+    """Очередь писем: отправка вне транзакции, повторы с задержкой, аренда пакета."""
+
+    def enqueue(self, count=1):
+        return [
+            services.enqueue_email(f'Тема {i}', 'Текст', [f'user{i}@example.com'])
+            for i in range(count)
+        ]
+
+    def test_sends_batch(self):
+        self.enqueue(2)
+        self.assertEqual(services.send_pending(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            set(OutboxEmail.objects.values_list('status', 'attempts')), {(OutboxEmail.STATUS_SENT, 1)}
+        )
+        self.assertEqual(services.send_pending(), (0, 0))
+
+    def test_failed_send_schedules_retry(self):
+        email, = self.enqueue()
+        with mock.patch.object(EmailBackend, 'send_messages', side_effect=SMTPException('550')):
+            before = timezone.now()
+            self.assertEqual(services.send_pending(), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), (OutboxEmail.STATUS_PENDING, 1, '550'))
+        self.assertGreaterEqual(email.next_attempt_at, before + services.retry_delay(1))
+        # До срока повтора письмо не берётся
+        self.assertEqual(services.send_pending(), (0, 0))
+
+    def test_max_attempts_marks_failed(self):
+        email, = self.enqueue()
+        OutboxEmail.objects.filter(pk=email.pk).update(attempts=services.MAX_ATTEMPTS - 1)
+        with mock.patch.object(EmailBackend, 'send_messages', side_effect=SMTPException('550')):
+            self.assertEqual(services.send_pending(), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.STATUS_FAILED, services.MAX_ATTEMPTS))
+
+    def test_connection_failure_keeps_attempt(self):
+        self.enqueue(2)
+        with mock.patch.object(EmailBackend, 'open', side_effect=OSError('SMTP недоступен')):
+            self.assertEqual(services.send_pending(), (0, 2))
+
+        for email in OutboxEmail.objects.all():
+            self.assertEqual((email.status, email.attempts), (OutboxEmail.STATUS_PENDING, 1))
+            self.assertEqual(email.last_error, 'SMTP недоступен')
+            self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(mail.outbox, [])
+
+    def test_claimed_batch_is_leased(self):
+        self.enqueue(2)
+        self.assertEqual(len(services.claim_batch()), 2)
+        # Второй воркер не получает те же письма
+        self.assertEqual(services.claim_batch(), [])
+
+        # Воркер упал, аренда истекла — письма забирает другой
+        OutboxEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(services.send_pending(), (2, 0))
+
+    @override_settings(PERF_SAMPLE_RATE=1)
+    def test_sampled_request_reports_smtp(self):
+        self.enqueue(2)
+        send_messages = EmailBackend.send_messages
+
+        def slow_send(backend, messages):
+            time.sleep(0.01)
+            return send_messages(backend, messages)
+
+        def view(request):
+            services.send_pending()
+            return HttpResponse()
+
+        with mock.patch.object(EmailBackend, 'send_messages', slow_send), \
+                self.assertLogs('config.perf', 'INFO') as logs:
+            response = PerfMiddleware(view)(RequestFactory().get('/'))
+
+        external = logs.records[-1].perf['external']
+        # Одна SMTP-сессия на пакет, время — не меньше самих отправок
+        self.assertEqual(external['calls'], {'smtp': 1})
+        self.assertGreaterEqual(external['ms'], 20)
+        self.assertIn('ext;dur=', response['Server-Timing'])
+        self.assertEqual(len(mail.outbox), 2)
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import Rendition
+
+
+@admin.register(Rendition)
+class RenditionAdmin(admin.ModelAdmin):
+    list_display = ("source", "status", "attempts", "created_at", "processed_at")
+    list_filter = ("status",)
+    search_fields = ("source",)
+    readonly_fields = ("variants", "created_at", "processed_at", "last_error")
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class RenditionsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "renditions"
+    verbose_name = "Уменьшенные копии изображений"
+
+    def ready(self):
+        # Подписываемся на сохранение моделей с изображениями
+        from renditions import signals
+
+        signals.connect_image_fields()
@@ -0,0 +1,42 @@
+# renditions/management/commands/build_renditions.py
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from renditions.services import enqueue, process_pending
+from renditions.signals import IMAGE_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии (WebP/JPEG) загруженных изображений из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Сколько изображений обрабатывать за один проход')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Проверять очередь каждые N секунд (0 — один проход)')
+        parser.add_argument('--all', action='store_true',
+                            help='Сначала поставить в очередь все уже загруженные изображения')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            self._enqueue_existing()
+        while True:
+            # Выбираем пакеты, пока очередь не опустеет
+            while True:
+                ready, failed = process_pending(batch_size=options['batch_size'])
+                if ready or failed:
+                    self.stdout.write(f"✅ Готово: {ready}, с ошибкой: {failed}")
+                if not ready and not failed:
+                    break
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def _enqueue_existing(self):
+        for label, fields in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            for field in fields:
+                names = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                enqueue(names.values_list(field, flat=True).iterator())
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("renditions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="rendition",
+            name="rendition_due_idx",
+        ),
+        migrations.AddField(
+            model_name="rendition",
+            name="next_attempt_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, verbose_name="Следующая попытка"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="rendition",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Ожидает обработки"),
+                    ("processing", "Обрабатывается"),
+                    ("ready", "Готово"),
+                    ("failed", "Ошибка"),
+                ],
+                default="pending",
+                max_length=10,
+                verbose_name="Статус",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="rendition",
+            index=models.Index(
+                fields=["status", "next_attempt_at"], name="rendition_due_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Rendition(models.Model):
+    """
+    Уменьшенные копии одного загруженного изображения.
+
+    Запись создаётся при сохранении модели с картинкой, а сами файлы строит
+    команда ``manage.py build_renditions``. Пока копии не готовы, шаблоны
+    показывают оригинал.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Ожидает обработки'),
+        (STATUS_PROCESSING, 'Обрабатывается'),
+        (STATUS_READY, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    source = models.CharField(max_length=255, unique=True, verbose_name="Исходный файл")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус")
+    # Список [ширина, формат, имя файла] для каждой готовой копии
+    variants = models.JSONField(default=list, blank=True, verbose_name="Копии")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток обработки")
+    # У записей в обработке — срок, после которого воркер считается упавшим и запись забирает другой
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата обработки")
+
+    class Meta:
+        verbose_name = "Копии изображения"
+        verbose_name_plural = "Копии изображений"
+        ordering = ["created_at"]
+        indexes = [
+            # Выборка воркера: WHERE status IN ('pending', 'processing') AND next_attempt_at <= now()
+            models.Index(fields=["status", "next_attempt_at"], name="rendition_due_idx"),
+        ]
+
+    def __str__(self):
+        return self.source
@@ -0,0 +1,210 @@
+"""
+Построение и поиск уменьшенных копий изображений.
+
+Копии лежат рядом с оригиналом: для ``catalog/previews/tea.png`` это
+``catalog/previews/tea.400w.webp``, ``catalog/previews/tea.400w.jpeg`` и т.д.
+WebP отдаётся браузерам, которые его понимают, JPEG — остальным.
+"""
+import hashlib
+import io
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from renditions.models import Rendition
+
+# Ширины копий в пикселях: карточка каталога, страница продукта, экраны высокой плотности
+WIDTHS = tuple(getattr(settings, 'RENDITION_WIDTHS', (200, 400, 800)))
+FORMATS = ('webp', 'jpeg')
+QUALITY = getattr(settings, 'RENDITION_QUALITY', 80)
+MAX_ATTEMPTS = getattr(settings, 'RENDITION_MAX_ATTEMPTS', 3)
+BATCH_SIZE = getattr(settings, 'RENDITION_BATCH_SIZE', 20)
+# Задержка перед повтором: base * 2 ** (попытка - 1), но не больше max (секунды)
+RETRY_BASE_DELAY = getattr(settings, 'RENDITION_RETRY_BASE_DELAY', 60)
+RETRY_MAX_DELAY = getattr(settings, 'RENDITION_RETRY_MAX_DELAY', 60 * 60)
+# Сколько пакет числится за забравшим его воркером (секунды)
+LEASE_SECONDS = getattr(settings, 'RENDITION_LEASE_SECONDS', 10 * 60)
+CACHE_TIMEOUT = getattr(settings, 'RENDITION_CACHE_TIMEOUT', 60 * 60 * 24)
+
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+# Отправляется после пакета обработки со списком исходных файлов, чьи копии готовы
+renditions_ready = Signal()
+
+
+def rendition_name(source, width, fmt):
+    root, _ext = os.path.splitext(source)
+    return f'{root}.{width}w.{fmt}'
+
+
+def enqueue(names):
+    """
+    Ставит изображения в очередь на обработку. Уже известные файлы
+    пропускаются: хранилище даёт новой загрузке новое имя.
+    """
+    names = {name for name in names if name}
+    if names:
+        Rendition.objects.bulk_create(
+            [Rendition(source=name) for name in names], ignore_conflicts=True
+        )
+
+
+def _prepare(image, fmt):
+    if image.mode not in ('RGBA', 'LA', 'P'):
+        return image.convert('RGB')
+    image = image.convert('RGBA')
+    if fmt == 'webp':
+        return image
+    # У JPEG нет прозрачности — кладём картинку на белый фон
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _save(name, image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), quality=QUALITY, optimize=fmt == 'jpeg')
+    # Имя копии должно остаться предсказуемым, поэтому старый файл удаляется
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def build_variants(source):
+    """
+    Строит копии одного изображения. Копии шире оригинала не делаются;
+    если оригинал меньше всех ширин, список пуст и шаблон покажет оригинал.
+    """
+    with default_storage.open(source, 'rb') as f:
+        original = Image.open(f)
+        original = ImageOps.exif_transpose(original)
+    variants = []
+    for width in WIDTHS:
+        if width >= original.width:
+            break
+        height = round(original.height * width / original.width)
+        resized = original.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in FORMATS:
+            name = _save(rendition_name(source, width, fmt), _prepare(resized, fmt), fmt)
+            variants.append([width, fmt, name])
+    return variants
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед следующей попыткой."""
+    return timedelta(seconds=min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def claim_batch(batch_size=None):
+    """
+    Забирает пакет изображений в короткой транзакции, как очередь писем
+    (``outbox.services.claim_batch``): статус «обрабатывается» и срок аренды
+    ``LEASE_SECONDS``. Pillow работает уже после фиксации.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=LEASE_SECONDS)
+    due = Rendition.objects.filter(
+        status__in=[Rendition.STATUS_PENDING, Rendition.STATUS_PROCESSING],
+        next_attempt_at__lte=now,
+    ).order_by('next_attempt_at')
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            renditions = list(due.select_for_update(skip_locked=True)[:batch_size])
+            Rendition.objects.filter(pk__in=[rendition.pk for rendition in renditions]).update(
+                status=Rendition.STATUS_PROCESSING, next_attempt_at=lease_until,
+            )
+        else:
+            # Без SKIP LOCKED запись достаётся тому, чей условный UPDATE её изменил
+            renditions = [
+                rendition for rendition in due[:batch_size]
+                if Rendition.objects.filter(
+                    pk=rendition.pk, status=rendition.status, next_attempt_at=rendition.next_attempt_at,
+                ).update(status=Rendition.STATUS_PROCESSING, next_attempt_at=lease_until)
+            ]
+    for rendition in renditions:
+        rendition.status = Rendition.STATUS_PROCESSING
+        rendition.next_attempt_at = lease_until
+    return renditions
+
+
+def process_pending(batch_size=None):
+    """
+    Обрабатывает пакет изображений из очереди. Возвращает пару
+    (готово, с ошибкой). Пакет забирается ``claim_batch``, поэтому воркеров
+    можно запускать несколько, а картинки декодируются вне транзакции.
+    Неудачная попытка откладывает повтор на ``retry_delay``.
+    """
+    renditions = claim_batch(batch_size)
+    ready = failed = 0
+    for rendition in renditions:
+        rendition.attempts += 1
+        try:
+            rendition.variants = build_variants(rendition.source)
+        except Exception as e:
+            failed += 1
+            rendition.last_error = str(e)
+            if rendition.attempts >= MAX_ATTEMPTS:
+                rendition.status = Rendition.STATUS_FAILED
+            else:
+                rendition.status = Rendition.STATUS_PENDING
+                rendition.next_attempt_at = timezone.now() + retry_delay(rendition.attempts)
+        else:
+            ready += 1
+            rendition.status = Rendition.STATUS_READY
+            rendition.processed_at = timezone.now()
+            rendition.last_error = ''
+
+    if renditions:
+        Rendition.objects.bulk_update(
+            renditions, ['status', 'variants', 'attempts', 'next_attempt_at', 'last_error', 'processed_at']
+        )
+    sources = [r.source for r in renditions if r.status == Rendition.STATUS_READY]
+    if sources:
+        transaction.on_commit(lambda: renditions_ready.send(sender=Rendition, sources=sources))
+    return ready, failed
+
+
+def make_srcsets(variants):
+    """``{'webp': 'url 200w, url 400w', 'jpeg': ...}`` или None, если копий нет."""
+    srcsets = {}
+    for width, fmt, name in variants:
+        srcsets.setdefault(fmt, []).append(f'{default_storage.url(name)} {width}w')
+    return {fmt: ', '.join(items) for fmt, items in srcsets.items()} or None
+
+
+def _cache_key(source):
+    return 'renditions:' + hashlib.md5(source.encode()).hexdigest()
+
+
+def get_srcsets(sources):
+    """
+    Возвращает ``{исходный файл: srcsets}`` для файлов с готовыми копиями.
+
+    Готовые копии кешируются; неготовые не кешируются, чтобы страница
+    переключилась на копии сразу после обработки.
+    """
+    sources = {source for source in sources if source}
+    if not sources:
+        return {}
+    keys = {_cache_key(source): source for source in sources}
+    cached = cache.get_many(keys)
+    result = {keys[key]: srcsets for key, srcsets in cached.items()}
+    missing = sources - set(result)
+    if missing:
+        found = {}
+        for source, variants in Rendition.objects.filter(
+            source__in=missing, status=Rendition.STATUS_READY
+        ).values_list('source', 'variants'):
+            found[source] = make_srcsets(variants)
+        cache.set_many({_cache_key(source): srcsets for source, srcsets in found.items()}, CACHE_TIMEOUT)
+        result.update(found)
+    return {source: srcsets for source, srcsets in result.items() if srcsets}
@@ -0,0 +1,35 @@
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from renditions.services import enqueue
+
+# Модели и поля-картинки, для которых строятся копии
+IMAGE_FIELDS = getattr(settings, 'RENDITION_IMAGE_FIELDS', {
+    'catalog.Product': ('preview', 'image'),
+    'blog.BlogPost': ('preview',),
+    'users.User': ('avatar',),
+})
+
+
+def _make_handler(fields):
+    def enqueue_images(sender, instance, update_fields=None, **kwargs):
+        # Например, вход пользователя сохраняет только last_login
+        if update_fields is not None and not set(fields) & set(update_fields):
+            return
+        names = [getattr(instance, field).name for field in fields]
+        if any(names):
+            transaction.on_commit(lambda: enqueue(names))
+
+    return enqueue_images
+
+
+def connect_image_fields():
+    for label, fields in IMAGE_FIELDS.items():
+        post_save.connect(
+            _make_handler(fields),
+            sender=apps.get_model(label),
+            weak=False,
+            dispatch_uid=f'renditions:{label}',
+        )
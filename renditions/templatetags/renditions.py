@@ -0,0 +1,49 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from renditions.services import CONTENT_TYPES, get_srcsets
+
+register = template.Library()
+
+# Признак «srcset не передан — найти самостоятельно»
+_LOOKUP = object()
+
+
+@register.simple_tag
+def picture(image, srcset=_LOOKUP, sizes='100vw', **attrs):
+    """
+    Выводит ``<picture>`` с копиями изображения в WebP и JPEG::
+
+        {% picture object.preview sizes="(min-width: 768px) 50vw, 100vw" alt=object.name class="img-fluid" %}
+
+    ``image`` — файл модели или готовый URL. Для списков srcset лучше
+    подготовить заранее одним запросом и передать через ``srcset=``
+    (None — копий нет). Пока копии не построены, выводится обычный ``<img>``
+    с оригиналом.
+    """
+    if not image:
+        return ''
+    if hasattr(image, 'url'):
+        url = image.url
+        if srcset is _LOOKUP:
+            srcset = get_srcsets([image.name]).get(image.name)
+    else:
+        url = str(image)
+        if srcset is _LOOKUP:
+            srcset = None
+
+    attributes = format_html_join('', ' {}="{}"', attrs.items())
+    if not srcset:
+        return format_html('<img src="{}"{}>', url, attributes)
+
+    sources = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        ((CONTENT_TYPES[fmt], value, sizes) for fmt, value in srcset.items() if fmt != 'jpeg'),
+    )
+    fallback = srcset.get('jpeg')
+    if fallback:
+        img = format_html('<img src="{}" srcset="{}" sizes="{}"{}>', url, fallback, sizes, attributes)
+    else:
+        img = format_html('<img src="{}"{}>', url, attributes)
+    return format_html('<picture>{}{}</picture>', sources, img)
@@ -0,0 +1,90 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from renditions import services
+from renditions.models import Rendition
+
+
+class ProcessPendingTest(TestCase):
+    """Очередь копий: обработка вне транзакции, повторы с задержкой, сигнал готовности."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.ready_sources = []
+
+        def receiver(sender, sources, **kwargs):
+            self.ready_sources += sources
+
+        services.renditions_ready.connect(receiver)
+        self.addCleanup(services.renditions_ready.disconnect, receiver)
+
+    def upload(self, name, data):
+        name = default_storage.save(name, ContentFile(data))
+        services.enqueue([name])
+        return Rendition.objects.get(source=name)
+
+    def image(self, width=1000, height=500):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (width, height), (200, 30, 30, 128)).save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def process(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return services.process_pending()
+
+    def test_ready(self):
+        rendition = self.upload('catalog/previews/tea.png', self.image())
+        self.assertEqual(self.process(), (1, 0))
+
+        rendition.refresh_from_db()
+        self.assertEqual(rendition.status, Rendition.STATUS_READY)
+        self.assertEqual(
+            [(width, fmt) for width, fmt, _ in rendition.variants],
+            [(width, fmt) for width in services.WIDTHS for fmt in services.FORMATS],
+        )
+        for _, _, name in rendition.variants:
+            self.assertTrue(default_storage.exists(name))
+        self.assertEqual(self.ready_sources, [rendition.source])
+        self.assertEqual(set(services.get_srcsets([rendition.source])[rendition.source]), set(services.FORMATS))
+        # Очередь пуста
+        self.assertEqual(self.process(), (0, 0))
+
+    def test_broken_image_backs_off_then_fails(self):
+        rendition = self.upload('catalog/previews/broken.png', b'not an image')
+        before = timezone.now()
+        self.assertEqual(self.process(), (0, 1))
+
+        rendition.refresh_from_db()
+        self.assertEqual((rendition.status, rendition.attempts), (Rendition.STATUS_PENDING, 1))
+        self.assertGreaterEqual(rendition.next_attempt_at, before + services.retry_delay(1))
+        # До срока повтора запись не берётся — нет цикла по битой картинке
+        self.assertEqual(self.process(), (0, 0))
+
+        for attempt in range(2, services.MAX_ATTEMPTS + 1):
+            Rendition.objects.filter(pk=rendition.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(self.process(), (0, 1))
+        rendition.refresh_from_db()
+        self.assertEqual((rendition.status, rendition.attempts), (Rendition.STATUS_FAILED, services.MAX_ATTEMPTS))
+        self.assertEqual(self.ready_sources, [])
+
+    def test_claimed_batch_is_leased(self):
+        self.upload('catalog/previews/tea.png', self.image())
+        self.assertEqual(len(services.claim_batch()), 1)
+        self.assertEqual(services.claim_batch(), [])
+
+        # Воркер упал, аренда истекла — запись забирает другой
+        Rendition.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.process(), (1, 0))
@@ -1,3 +1,11 @@
-from django.test import TestCase
+from config import benchmark
 
-# Create your tests here.
+
+class UsersUrlBudgetSmallTest(benchmark.UrlBudgetTestCase):
+    app_label = 'users'
+    size = 'small'
+
+
+class UsersUrlBudgetLargeTest(benchmark.UrlBudgetTestCase):
+    app_label = 'users'
+    size = 'large'
@@ -1,10 +1,9 @@
-from django.conf import settings
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
 from users.forms import UserRegisterForm
 from users.models import User
+from outbox.services import enqueue_email
 
 
 class UserCreateView(CreateView):
@@ -20,18 +19,12 @@ class UserCreateView(CreateView):
         user = form.instance
         email = user.email
 
-        # Отправка письма
-        try:
-            send_mail(
-                subject='Добро пожаловать!',
-                message=f'Привет, {user.username}! Спасибо за регистрацию на нашем сайте.',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[email],
-                fail_silently=False,
-            )
-            # Опционально: показать сообщение
-            messages.success(self.request, 'Письмо с приветствием отправлено на ваш email.')
-        except Exception as e:
-            messages.error(self.request, f'Не удалось отправить письмо: {e}')
+        # Письмо уходит в очередь, отправляет его команда send_outbox
+        enqueue_email(
+            subject='Добро пожаловать!',
+            message=f'Привет, {user.username}! Спасибо за регистрацию на нашем сайте.',
+            recipient_list=[email],
+        )
+        messages.success(self.request, 'Письмо с приветствием будет отправлено на ваш email.')
 
         return response
\ No newline at end of file